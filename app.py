@@ -8,9 +8,28 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 from dsl.executor import DSLExecutor
+from dsl.registry import default_registry
+from dsl.reload import ScriptWatcher
 from llm.wrapper import LLMClient
 
 
+@st.cache_resource
+def start_script_watcher(script_dir):
+    """整个进程只启动一个脚本监视线程：修改脚本后当前会话自动切到新版本，不用重置"""
+    return ScriptWatcher(script_dir).start()
+
+
+@st.cache_resource
+def get_llm_client(use_stub):
+    """
+    每种模式整个进程共用一个客户端，并注册为脚本加载钩子 (加载脚本时预先构建匹配索引)
+    每次重置都新建客户端的话，注册表里的钩子会越积越多
+    """
+    client = LLMClient(use_stub=use_stub)
+    default_registry.add_load_hook(client.prepare_script)
+    return client
+
+
 # === 回调函数：状态重置 ===
 def reset_state():
     """当用户改变配置时，自动清空会话状态"""
@@ -36,6 +55,7 @@ with st.sidebar:
     script_dir = "scripts"
     if not os.path.exists(script_dir):
         os.makedirs(script_dir)
+    start_script_watcher(script_dir)
 
     files = [f for f in os.listdir(script_dir) if f.endswith('.rsl')]
     selected_script = st.selectbox(
@@ -73,7 +93,7 @@ if "executor" not in st.session_state and selected_script:
 
     try:
         # 传入 use_stub 参数
-        client = LLMClient(use_stub=use_stub)
+        client = get_llm_client(use_stub)
         executor = DSLExecutor(script_path, client)
 
         # 获取第一句开场白
@@ -0,0 +1,41 @@
+# 冷启动基准：完整解析 vs 磁盘缓存命中 (合成 50k 状态脚本)
+# 用法: python -m benchmarks.bench_cache [状态数]
+
+import os
+import sys
+import time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.cache import load_script
+from benchmarks.synthetic import generate_script
+
+
+def main():
+    num_states = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.rsl")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_script(num_states))
+
+        t0 = time.perf_counter()
+        load_script(path, use_cache=False)
+        parse = time.perf_counter() - t0
+
+        load_script(path)  # 写入缓存
+        t0 = time.perf_counter()
+        script = load_script(path)
+        warm = time.perf_counter() - t0
+
+    print(f"合成脚本: {len(script.states)} 个状态")
+    print(f"[完整解析] {parse:.3f}s")
+    print(f"[缓存命中] {warm:.3f}s   提升: {parse / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
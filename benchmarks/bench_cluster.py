@@ -0,0 +1,64 @@
+# 多进程扩展性压测：Stub 模式下 worker 数从 1 增加到 CPU 核数时，每秒推进的轮次如何变化
+# 每种配置启动一次 serve.py --stub --workers N，由多个客户端进程并发压测 (客户端也占 CPU，
+# 核数少的机器上压测客户端和前端进程会和 worker 抢核，结果只能看趋势)
+# 用法: python -m benchmarks.bench_cluster [最大 worker 数] [每种配置的压测秒数]
+
+import os
+import sys
+import time
+import asyncio
+import subprocess
+import multiprocessing
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.bench_server import http_worker, run_load, _free_port, _wait_for_port
+
+CONCURRENCY_PER_CLIENT = 50
+
+
+def _client(args):
+    port, seconds = args
+    rate, _, _ = asyncio.run(run_load(http_worker, port, CONCURRENCY_PER_CLIENT, seconds))
+    return rate
+
+
+def measure(workers, seconds, clients):
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(project_root, "serve.py"), "--stub",
+                               "--port", str(port), "--workers", str(workers)],
+                              stdout=subprocess.DEVNULL, cwd=project_root)
+    try:
+        _wait_for_port(port)
+        time.sleep(0.2)  # 等 worker 都起来
+        with multiprocessing.Pool(clients) as pool:
+            return sum(pool.map(_client, [(port, seconds)] * clients))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else max(2, cores)
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    print(f"CPU 核数: {cores}  每种配置压测 {seconds:.0f}s")
+    if cores < 2:
+        print("⚠️ 只有 1 个核，多个 worker 只会互相争抢，无法体现扩展性")
+
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        clients = max(1, workers)
+        rate = measure(workers, seconds, clients)
+        baseline = baseline or rate
+        print(f"[{workers:2d} worker] {rate:8.0f} 轮/秒   相对 1 worker: {rate / baseline:5.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
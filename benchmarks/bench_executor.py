@@ -0,0 +1,113 @@
+# DSLExecutor.step 单轮开销微基准
+# 对比：旧实现 (每轮重建 options_map / options_text + 按状态名查字典) vs 编译后的状态表
+# 用法: python -m benchmarks.bench_executor
+
+import os
+import sys
+import time
+import contextlib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.parser import parse_dsl_file
+from dsl.executor import DSLExecutor
+from llm.wrapper import LLMClient
+
+SCRIPT = os.path.join(project_root, "scripts", "telecom_dsl.rsl")
+TURNS = 200_000
+
+
+class FirstOptionLLM:
+    """永远选第一个候选项，用于隔离执行器自身的开销"""
+
+    def recognize_intent(self, user_input, choices):
+        for choice in choices:
+            return choice
+        return "unknown"
+
+
+class NeverLLM:
+    """永远识别失败，用于测量兜底回复分支"""
+
+    def recognize_intent(self, user_input, choices):
+        return "unknown"
+
+
+class LegacyExecutor:
+    """编译阶段引入之前的 step 实现 (原样保留，仅作对照)"""
+
+    def __init__(self, script_path, llm_client):
+        self.llm = llm_client
+        self.script = parse_dsl_file(script_path)
+        self.current_state_name = self.script.start_state
+        self.is_finished = False
+
+    def get_current_state(self):
+        return self.script.states.get(self.current_state_name)
+
+    def step(self, user_input):
+        if self.is_finished:
+            return "（会话已结束）"
+        current_node = self.get_current_state()
+        if not current_node: return "系统错误：状态丢失"
+        if current_node.is_end or not current_node.transitions:
+            self.is_finished = True
+            return "（流程结束）"
+        transitions = current_node.transitions
+        options_map = {t.description: t for t in transitions}
+        options_text = list(options_map.keys())
+        detected_intent = self.llm.recognize_intent(user_input, options_text)
+        if detected_intent in options_map:
+            trans = options_map[detected_intent]
+            self.current_state_name = trans.target_state
+            new_state = self.get_current_state()
+            if new_state.is_end:
+                self.is_finished = True
+            return new_state.response
+        else:
+            return f"抱歉，我没听懂。请参考以下内容回复：{' / '.join(options_text)}"
+
+
+def bench(executor, user_input, turns):
+    """在起始状态上反复执行 step (每轮回到 start)，返回每轮耗时 (微秒)"""
+    # 新实现的游标在 Session 上，旧实现直接在执行器上
+    cursor = executor if isinstance(executor, LegacyExecutor) else executor.session
+    name_attr = 'current_state_name' if cursor is executor else 'state'
+    start_value = getattr(cursor, name_attr)
+
+    t0 = time.perf_counter()
+    for _ in range(turns):
+        setattr(cursor, name_attr, start_value)
+        cursor.is_finished = False
+        executor.step(user_input)
+    elapsed = time.perf_counter() - t0
+    return elapsed / turns * 1e6
+
+
+def main():
+    print(f"脚本: {os.path.basename(SCRIPT)}, 轮数: {TURNS}")
+
+    # 1. 纯执行器开销
+    llm = FirstOptionLLM()
+    old = bench(LegacyExecutor(SCRIPT, llm), "我要升级套餐", TURNS)
+    new = bench(DSLExecutor(SCRIPT, llm), "我要升级套餐", TURNS)
+    print(f"[执行器开销]   旧: {old:.3f} us/轮   新: {new:.3f} us/轮   提升: {old / new:.1f}x")
+
+    # 2. 兜底分支 (没听懂，旧实现每轮还要 join 一次)
+    old = bench(LegacyExecutor(SCRIPT, NeverLLM()), "今天天气不错", TURNS)
+    new = bench(DSLExecutor(SCRIPT, NeverLLM()), "今天天气不错", TURNS)
+    print(f"[兜底回复]     旧: {old:.3f} us/轮   新: {new:.3f} us/轮   提升: {old / new:.1f}x")
+
+    # 3. 完整 Stub 模式 (含关键词匹配)
+    client = LLMClient(use_stub=True)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        old = bench(LegacyExecutor(SCRIPT, client), "我要升级套餐", TURNS // 4)
+        new = bench(DSLExecutor(SCRIPT, client), "我要升级套餐", TURNS // 4)
+    print(f"[Stub 整轮]    旧: {old:.3f} us/轮   新: {new:.3f} us/轮   提升: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# 词法分析基准：正则扫描器 vs 原来的逐字符实现，合成 50k 状态脚本
+# 用法: python -m benchmarks.bench_lexer [状态数]
+
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.lexer import Lexer, Token
+from benchmarks.synthetic import generate_script
+
+
+class LegacyLexer:
+    """正则扫描器之前的逐字符实现 (原样保留，仅作对照)"""
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.line = 1
+
+    def tokenize(self):
+        tokens = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char.isspace():
+                if char == '\n': self.line += 1
+                self.pos += 1
+                continue
+            if char == '#':
+                while self.pos < len(self.text) and self.text[self.pos] != '\n':
+                    self.pos += 1
+                continue
+            if char == ':':
+                tokens.append(Token('COLON', ':', self.line))
+                self.pos += 1
+                continue
+            if self.text[self.pos:self.pos + 2] == '->':
+                tokens.append(Token('ARROW', '->', self.line))
+                self.pos += 2
+                continue
+            if char == '"' or char == "'":
+                quote = char
+                self.pos += 1
+                val = ""
+                while self.pos < len(self.text) and self.text[self.pos] != quote:
+                    val += self.text[self.pos]
+                    self.pos += 1
+                self.pos += 1
+                tokens.append(Token('STRING', val, self.line))
+                continue
+            if char.isalpha() or char == '_':
+                start = self.pos
+                while self.pos < len(self.text) and (self.text[self.pos].isalnum() or self.text[self.pos] == '_'):
+                    self.pos += 1
+                word = self.text[start:self.pos]
+                if word == 'domain':
+                    tokens.append(Token('DOMAIN', word, self.line))
+                elif word == 'state':
+                    tokens.append(Token('STATE', word, self.line))
+                elif word == 'response':
+                    tokens.append(Token('RESPONSE', word, self.line))
+                elif word == 'transition':
+                    tokens.append(Token('TRANSITION', word, self.line))
+                elif word == 'end':
+                    tokens.append(Token('END', word, self.line))
+                else:
+                    tokens.append(Token('ID', word, self.line))
+                continue
+            self.pos += 1
+        return tokens
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def compare(title, text):
+    print(f"\n== {title}: {len(text) / 1e6:.1f} M 字符")
+
+    old_tokens, old = timed(lambda: LegacyLexer(text).tokenize())
+    new_tokens, new = timed(lambda: Lexer(text).tokenize())
+    _, lazy = timed(lambda: sum(1 for _ in Lexer(text).iter_tokens()))
+
+    same = [(t.type, t.value, t.line) for t in old_tokens] == [(t.type, t.value, t.line) for t in new_tokens]
+    print(f"Token 数: {len(new_tokens)}, 与旧实现一致: {same}")
+    print(f"[逐字符] {old:.3f}s")
+    print(f"[正则]   {new:.3f}s   提升: {old / new:.1f}x")
+    print(f"[惰性]   {lazy:.3f}s   (iter_tokens，不构造列表)")
+
+
+def main():
+    num_states = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    compare(f"{num_states} 个状态", generate_script(num_states))
+    # 超长回复：逐字符实现里 val += ch 的拼接开销会被放大
+    compare("2000 个状态 x 长回复", generate_script(2000, response_repeat=200))
+
+
+if __name__ == "__main__":
+    main()
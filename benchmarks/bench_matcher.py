@@ -0,0 +1,69 @@
+# 关键词匹配基准：原来的 split + in 循环 vs 多关键词索引
+# 用法: python -m benchmarks.bench_matcher
+
+import os
+import sys
+import time
+import random
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.matcher import get_matcher
+from llm.ngram import get_ngram_index
+from benchmarks.synthetic import WORDS
+
+ROUNDS = 100_000
+
+
+def legacy_match(user_input, choices):
+    """多关键词索引之前的 _local_stub_match (原样保留，仅作对照)"""
+    for choice in choices:
+        keywords = choice.split('/')
+        for kw in keywords:
+            if kw in user_input:
+                return choice
+        if user_input.isdigit() and ("订单" in choice or "单号" in choice):
+            return choice
+    return None
+
+
+def timed(fn, user_input, choices):
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(user_input, choices)
+    return (time.perf_counter() - t0) / ROUNDS * 1e6
+
+
+def compare(title, user_input, choices):
+    old = timed(legacy_match, user_input, choices)
+    new = timed(lambda u, c: get_matcher(c).match(u), user_input, choices)
+    print(f"[{title}] 旧: {old:.2f} us   新: {new:.2f} us   提升: {old / new:.1f}x")
+
+
+def main():
+    telecom = ("不需要/太贵/不感兴趣/不用/再见", "想办/办理/好/可以/不错/感兴趣")
+    compare("电信 2 个候选, 命中", "我对这个套餐感兴趣", telecom)
+    compare("电信 2 个候选, 未命中", "今天天气怎么样", telecom)
+
+    rng = random.Random(0)
+    vocab = [a + b for a in WORDS for b in WORDS if a != b]
+    large = tuple("/".join(rng.sample(vocab, 10)) for _ in range(30))
+    compare("30 个候选 x 10 关键词, 命中最后一个", "麻烦帮我" + large[-1].split('/')[-1], large)
+    compare("30 个候选 x 10 关键词, 未命中", "今天天气怎么样，我想随便聊聊", large)
+
+    # n-gram TF-IDF 相似度 (关键词没命中时的本地兜底)
+    for title, choices, user_input in (("IT 支持 3 个候选", ("蓝屏/死机", "无法上网/没网", "黑屏/开不了机"), "网络断了"),
+                                       ("30 个候选 x 10 关键词", large, "今天天气怎么样，我想随便聊聊")):
+        index = get_ngram_index(choices)
+        t0 = time.perf_counter()
+        for _ in range(ROUNDS // 10):
+            index.classify(user_input)
+        cost = (time.perf_counter() - t0) / (ROUNDS // 10) * 1e6
+        print(f"[n-gram {title}] {cost:.2f} us   词表: {len(index.vocab)}, 别名行数: {index.matrix.shape[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# 对话服务压测：Stub 模式下单进程 (单核) 每秒能推进多少轮对话
+# 服务端以子进程方式启动 (serve.py --stub)，压测客户端在本进程里用 asyncio 模拟大量并发会话；
+# 两者在同一台机器上运行，客户端也会占用 CPU，结果是服务端能力的下限
+# 用法: python -m benchmarks.bench_server [并发会话数] [每种模式的压测秒数]
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from server.websocket import connect
+
+SCRIPT = "ecommerce_dsl.rsl"
+DIALOGUES = [["我要退款", "我不想要了"], ["我要查快递", "123456"], ["我要退款", "质量有问题，坏了"]]
+
+
+class _KeepAliveClient:
+    """压测用的 keep-alive HTTP 客户端：一条连接上依次发请求"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def post(self, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.writer.write((f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+        await self.reader.readline()
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        return json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def http_worker(port, stop_at, latencies, index):
+    client = _KeepAliveClient("127.0.0.1", port)
+    try:
+        while time.perf_counter() < stop_at:
+            session = await client.post("/sessions", {"script": SCRIPT})
+            for user_input in DIALOGUES[index % len(DIALOGUES)]:
+                t0 = time.perf_counter()
+                await client.post(f"/sessions/{session['session_id']}/turns", {"input": user_input})
+                latencies.append(time.perf_counter() - t0)
+            index += 1
+    finally:
+        client.close()
+
+
+async def ws_worker(port, stop_at, latencies, index):
+    while time.perf_counter() < stop_at:
+        ws = await connect("127.0.0.1", port, f"/ws?script={SCRIPT}")
+        await ws.recv()  # 开场白
+        for user_input in DIALOGUES[index % len(DIALOGUES)]:
+            t0 = time.perf_counter()
+            await ws.send(user_input)
+            await ws.recv()
+            latencies.append(time.perf_counter() - t0)
+        await ws.close()
+        index += 1
+
+
+async def run_load(worker, port, concurrency, seconds):
+    latencies = []
+    stop_at = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(port, stop_at, latencies, i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("对话服务没有按时启动")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    port = _free_port()
+
+    # 服务端的 Stub 命中日志会拖慢压测，丢弃
+    server = subprocess.Popen([sys.executable, os.path.join(project_root, "serve.py"), "--stub", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, cwd=project_root)
+    try:
+        _wait_for_port(port)
+        print(f"并发会话: {concurrency}  每种模式压测 {seconds:.0f}s  CPU 核数: {os.cpu_count()}")
+        for name, worker in (("HTTP keep-alive", http_worker), ("WebSocket", ws_worker)):
+            rate, p50, p99 = asyncio.run(run_load(worker, port, concurrency, seconds))
+            print(f"[{name:<15}] {rate:8.0f} 轮/秒   p50 {p50 * 1000:6.2f}ms   p99 {p99 * 1000:6.2f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# 本地假的 OpenAI 兼容服务：不联网测试 LLMClient 的 HTTP 行为，也给压测 (benchmarks/suite.py、loadgen.py) 当后端
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 256  # 默认的 5 会让大量并发连接排队重试 SYN
+
+
+class FakeLLMServer:
+    def __init__(self, reply="OK", latency=0.0, status=200, token_delay=0.0, port=0):
+        """
+        :param reply: 固定回复文本，或 reply(请求体 dict) -> 回复文本
+        :param latency: 每个请求的人为延迟 (秒)
+        :param status: 返回的 HTTP 状态码
+        :param token_delay: 流式请求 (stream: true) 每个字之间的间隔 (秒)
+        :param port: 监听端口，默认随机
+        """
+        self.reply = reply
+        self.latency = latency
+        self.status = status
+        self.token_delay = token_delay
+        self.streams_completed = 0  # 完整发完 (含 [DONE]) 的流式响应数
+        self.requests = []  # 收到的请求体
+        self.client_ports = []  # 每个请求来自哪个客户端端口 (同一端口 = 复用了连接)
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持 keep-alive
+            disable_nagle_algorithm = True  # 头和正文分两次写，不关 Nagle 会撞上对端的延迟 ACK (每个请求多 40ms)
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests.append(body)
+                    server.client_ports.append(self.client_address[1])
+                if server.latency:
+                    time.sleep(server.latency)
+                server.handle(self, body)
+
+        self.httpd = _Server(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    def content_for(self, body):
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    def handle(self, handler, body):
+        if body.get("stream") and self.status == 200:
+            return self.handle_stream(handler, body)
+        payload = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": self.content_for(body)}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        }).encode("utf-8")
+        handler.send_response(self.status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def handle_stream(self, handler, body):
+        """按 SSE 格式逐字发送回复，chunked 编码"""
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(data):
+            event = f"data: {data}\n\n".encode("utf-8")
+            handler.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            handler.wfile.flush()
+
+        try:
+            for ch in self.content_for(body):
+                send(json.dumps({"choices": [{"index": 0, "delta": {"content": ch}}]}))
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+            send(json.dumps({"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}}))
+            send("[DONE]")
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True  # 客户端提前断开
+            return
+        with self._lock:
+            self.streams_completed += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def keyword_reply(body):
+    """
+    模拟一个 "听得懂" 的模型：回答第一个有关键词出现在用户输入里的候选项编号，都没有时回答 0
+    (按 llm.prompts.build_intent_messages 的格式解析提示词)
+    """
+    content = body["messages"][-1]["content"]
+    options, _, user_input = content.rpartition("\n用户输入: ")
+    for line in options.splitlines()[1:]:
+        index, _, label = line.partition(") ")
+        if any(kw and kw in user_input for kw in label.split("/")):
+            return index
+    return "0"
+
+
+if __name__ == "__main__":
+    # 单独启动，给 serve.py / 压测脚本当大模型用: LLM_BASE_URL=http://127.0.0.1:端口/v1
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地假的 OpenAI 兼容服务")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的人为延迟 (秒)")
+    args = parser.parse_args()
+
+    fake = FakeLLMServer(reply=keyword_reply, latency=args.latency, port=args.port)
+    print(f"假大模型服务: {fake.url}  延迟 {args.latency * 1000:.0f}ms")
+    try:
+        fake.httpd.serve_forever(0.05)
+    except KeyboardInterrupt:
+        pass
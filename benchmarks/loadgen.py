@@ -0,0 +1,411 @@
+# 对话负载生成器：模拟 N 个同时在线的用户，看系统在并发下的吞吐和延迟分布
+#
+# 对话来源：
+#   - 测试数据文件 (tests/test_data 里 "用户输入 ||| 期望关键词" 的格式，按 manifest.json 找到对应脚本)
+#   - 任意 .rsl 脚本的随机游走 (沿跳转图随机选分支，用分支的关键词造用户输入，可以混入听不懂的话)
+# 压测目标：
+#   - 进程内的 DSLExecutor (默认)：每轮耗时拆成 "匹配" (状态机 + 本地识别) 和 "大模型" (等模型回复) 两部分
+#   - 已经在运行的对话服务 (--url)：客户端测整轮耗时，服务端的拆分取自 /metrics 前后的差值
+# 到达方式：--rate 为 0 时是闭环 (同时保持 --concurrency 个对话，一个结束马上开始下一个)，
+#           否则按泊松过程每秒到达 --rate 个新对话，同时进行的对话数不超过 --concurrency
+# 完全离线可用：默认 Stub 模式；--fake-llm 延迟 会在进程内起一个假的 OpenAI 兼容服务
+#
+# 用法: python -m benchmarks.loadgen [--walk scripts/x.rsl] [--concurrency 100] [--rate 50]
+#                                    [--conversations 1000 | --duration 30] [--fake-llm 0.2] [--url http://...]
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import fnmatch
+import argparse
+import contextlib
+import contextvars
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.executor import DSLExecutor
+from dsl.registry import ScriptRegistry
+from llm.cascade import build_cascade
+from llm.cassette import CassetteMiss
+from llm.transport import AsyncHTTPTransport
+from llm.wrapper import LLMClient
+from metrics.log import setup_logging
+from regression.cases import discover
+from benchmarks.bench_server import _KeepAliveClient
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+DATA_DIR = os.path.join(project_root, "tests", "test_data")
+
+# 随机游走时包装关键词的说法，以及听不懂的话 (走兜底分支；真实模式下会去问大模型)
+_PHRASES = ("{}", "我想{}", "请问{}怎么办", "帮我看看{}的事", "{}，麻烦快一点")
+_NOISE = ("今天天气不错", "你是机器人吗", "嗯……我再想想", "能转人工吗", "刚才说到哪了")
+
+# 当前这一轮在大模型上花的时间 (每个对话是一个 asyncio 任务，各自有一份)
+_LLM_TIME = contextvars.ContextVar("loadgen_llm_time")
+
+
+class Dialogue:
+    __slots__ = ('script_path', 'turns')
+
+    def __init__(self, script_path, turns):
+        self.script_path = script_path
+        self.turns = turns  # [(用户输入, 期望回复里包含的关键词或 None)]
+
+
+def load_dialogues(script_dir=SCRIPT_DIR, data_dir=DATA_DIR, patterns=None):
+    """
+    测试数据文件 -> 对话
+    :param patterns: 只用文件名匹配这些通配符的测试数据，默认全部
+    """
+    cases, _ = discover(script_dir, data_dir)
+    dialogues = []
+    for case in cases:
+        if case.steps and (not patterns or any(fnmatch.fnmatch(case.name, p) for p in patterns)):
+            dialogues.append(Dialogue(case.script_path, [(s.user_input, s.expected) for s in case.steps]))
+    return dialogues
+
+
+def random_walks(script_path, count, registry, max_turns=20, noise=0.1, seed=0):
+    """
+    沿脚本的跳转图随机游走，生成 count 段对话 (不检查回复内容)
+    :param noise: 每一轮说一句听不懂的话的概率
+    """
+    script = registry.get(script_path)
+    rng = random.Random(seed)
+    dialogues = []
+    for _ in range(count):
+        state, turns = script.start_state, []
+        while not state.is_end and state.options and len(turns) < max_turns:
+            if rng.random() < noise:
+                turns.append((rng.choice(_NOISE), None))
+                continue
+            option = rng.choice(state.options)
+            keyword = rng.choice(option.split("/"))
+            turns.append((rng.choice(_PHRASES).format(keyword), None))
+            state = script.states[state.targets[option]]
+        dialogues.append(Dialogue(script_path, turns))
+    return dialogues
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+class LoadStats:
+    def __init__(self):
+        self.total = []  # 每轮整轮耗时 (秒)
+        self.llm = []  # 每轮等大模型的耗时；压测服务时为空
+        self.conversations = 0
+        self.mismatches = 0  # 回复里没有期望关键词的轮次
+        self.errors = 0  # 对话中途出错 (连接断开、服务端报错)
+        self.seconds = 0.0
+        self.server = None  # 压测服务时由 /metrics 差值算出的服务端拆分
+
+    def record(self, total, llm, reply, expected):
+        self.total.append(total)
+        if llm is not None:
+            self.llm.append(llm)
+        if expected is not None and expected not in (reply or ""):
+            self.mismatches += 1
+
+    def summary(self):
+        turns = len(self.total)
+        rows = {"turn": self.total} if self.total else {}
+        if self.llm:
+            rows["llm"] = self.llm
+            rows["match"] = [t - l for t, l in zip(self.total, self.llm)]
+        latency = {}
+        for name, samples in rows.items():
+            ordered = sorted(samples)
+            latency[name] = {"p50": percentile(ordered, 50), "p95": percentile(ordered, 95),
+                             "p99": percentile(ordered, 99), "mean": sum(ordered) / len(ordered)}
+        result = {"conversations": self.conversations, "turns": turns, "seconds": self.seconds,
+                  "turns_per_s": turns / self.seconds if self.seconds else 0.0,
+                  "conversations_per_s": self.conversations / self.seconds if self.seconds else 0.0,
+                  "mismatches": self.mismatches, "errors": self.errors, "latency": latency}
+        if self.server is not None:
+            result["server"] = self.server
+        return result
+
+
+# ---------- 压测目标 ----------
+class ExecutorTarget:
+    """进程内直接驱动 DSLExecutor.astep"""
+
+    def __init__(self, client, registry):
+        self.client = client
+        self.registry = registry
+        self._instrument(client)
+
+    @staticmethod
+    def _instrument(client):
+        """把 client.achat 的耗时记到当前对话任务的 _LLM_TIME 上"""
+        achat = client.achat
+
+        async def timed_achat(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await achat(*args, **kwargs)
+            finally:
+                spent = _LLM_TIME.get(None)
+                if spent is not None:
+                    spent[0] += time.perf_counter() - t0
+
+        client.achat = timed_achat
+
+    async def start(self):
+        pass
+
+    async def close(self, stats):
+        await self.client.aclose()
+
+    async def converse(self, dialogue, stats, think):
+        executor = DSLExecutor(dialogue.script_path, self.client, registry=self.registry)
+        executor.run()
+        for user_input, expected in dialogue.turns:
+            if executor.is_finished:
+                break
+            spent = [0.0]
+            token = _LLM_TIME.set(spent)
+            t0 = time.perf_counter()
+            reply = await executor.astep(user_input)
+            elapsed = time.perf_counter() - t0
+            _LLM_TIME.reset(token)
+            if executor.last_error is not None:
+                raise executor.last_error
+            stats.record(elapsed, spent[0], reply, expected)
+            if think:
+                await asyncio.sleep(think)
+
+
+class ServerTarget:
+    """压测已经在运行的对话服务 (python serve.py)，每个对话一条 keep-alive 连接"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        host_port = self.url.split("://", 1)[-1].split("/", 1)[0]
+        self.host, _, port = host_port.partition(":")
+        self.port = int(port or 80)
+        self._before = None
+
+    async def _metrics(self):
+        transport = AsyncHTTPTransport(self.url + "/metrics?format=json")
+        try:
+            _, _, data = await transport.request("GET")
+            return json.loads(data)
+        except (OSError, ValueError):
+            return None  # 旧版本服务没有 /metrics
+        finally:
+            await transport.close()
+
+    async def start(self):
+        self._before = await self._metrics()
+
+    async def close(self, stats):
+        after = await self._metrics()
+        if self._before is not None and after is not None:
+            stats.server = _server_split(self._before, after)
+
+    async def converse(self, dialogue, stats, think):
+        client = _KeepAliveClient(self.host, self.port)
+        try:
+            session = await client.post("/sessions", {"script": os.path.basename(dialogue.script_path)})
+            if "session_id" not in session:
+                raise ValueError(session.get("error", "创建会话失败"))
+            finished = session.get("finished")
+            for user_input, expected in dialogue.turns:
+                if finished:
+                    break
+                t0 = time.perf_counter()
+                response = await client.post(f"/sessions/{session['session_id']}/turns", {"input": user_input})
+                elapsed = time.perf_counter() - t0
+                if "reply" not in response:
+                    raise ValueError(response.get("error", "服务端没有返回回复"))
+                stats.record(elapsed, None, response["reply"], expected)
+                finished = response.get("finished")
+                if think:
+                    await asyncio.sleep(think)
+        finally:
+            client.close()
+
+
+def _timer_total(snapshot, name):
+    """计时器所有标签的 (次数, 总耗时)"""
+    samples = snapshot.get(name, {}).get("samples", [])
+    return sum(s[1] for s in samples), sum(s[2] for s in samples)
+
+
+def _server_split(before, after):
+    """两次 /metrics 快照之间服务端每轮的平均耗时拆分"""
+    def delta(name):
+        (n0, s0), (n1, s1) = _timer_total(before, name), _timer_total(after, name)
+        return n1 - n0, s1 - s0
+
+    turns, turn_seconds = delta("session_turn_seconds")
+    llm_calls, llm_seconds = delta("llm_http_seconds")
+    if not turns:
+        return None
+    return {"turns": turns, "turn_mean": turn_seconds / turns, "llm_mean": llm_seconds / turns,
+            "match_mean": (turn_seconds - llm_seconds) / turns, "llm_calls": llm_calls}
+
+
+# ---------- 调度 ----------
+async def run_load(target, dialogues, concurrency=50, rate=0.0, conversations=1000, duration=None, think=0.0,
+                   seed=0):
+    """
+    :param rate: 每秒到达的新对话数 (泊松过程)，0 表示闭环
+    :param conversations: 总对话数 (按顺序循环使用 dialogues)
+    :param duration: 压测时长 (秒)，到时不再开始新对话；设置后忽略 conversations
+    :param think: 每轮之间用户的思考时间 (秒)
+    """
+    stats = LoadStats()
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    stop_at = time.perf_counter() + duration if duration else None
+
+    def more(started):
+        return time.perf_counter() < stop_at if stop_at else started < conversations
+
+    async def one(dialogue):
+        try:
+            await target.converse(dialogue, stats, think)
+            stats.conversations += 1
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+        except CassetteMiss as e:
+            # 回放模式下磁带没覆盖这段对话：算作出错，只提示一次，不中断整个压测
+            if not stats.errors:
+                print(f"⚠️ 大模型回放未命中，对应的对话计为出错: {e}", file=sys.stderr)
+            stats.errors += 1
+        finally:
+            semaphore.release()
+
+    await target.start()
+    t0 = time.perf_counter()
+    tasks, started = [], 0
+    try:
+        while more(started):
+            await semaphore.acquire()  # 同时进行的对话数已满时，新到的对话排队
+            if not more(started):
+                semaphore.release()
+                break
+            tasks.append(asyncio.ensure_future(one(dialogues[started % len(dialogues)])))
+            started += 1
+            if rate > 0:
+                await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    finally:
+        stats.seconds = time.perf_counter() - t0
+        await target.close(stats)
+    return stats
+
+
+def print_report(summary, out=None):
+    out = out or sys.stdout
+    print(f"对话: {summary['conversations']}  轮次: {summary['turns']}  耗时: {summary['seconds']:.2f}s  "
+          f"吞吐: {summary['turns_per_s']:.0f} 轮/秒 ({summary['conversations_per_s']:.1f} 对话/秒)", file=out)
+    print(f"{'':<10}{'p50':>10}{'p95':>10}{'p99':>10}{'平均':>10}  (ms)", file=out)
+    for name, label in (("turn", "整轮"), ("match", "匹配"), ("llm", "大模型")):
+        row = summary["latency"].get(name)
+        if row:
+            print(f"{label:<10}" + "".join(f"{row[k] * 1000:10.3f}" for k in ("p50", "p95", "p99", "mean")), file=out)
+    server = summary.get("server")
+    if server:
+        print(f"服务端每轮平均: 整轮 {server['turn_mean'] * 1000:.3f}ms = 匹配 {server['match_mean'] * 1000:.3f}ms"
+              f" + 大模型 {server['llm_mean'] * 1000:.3f}ms ({server['llm_calls']} 次请求)", file=out)
+    if summary["mismatches"] or summary["errors"]:
+        print(f"⚠️ 回复不符合预期: {summary['mismatches']} 轮  对话出错: {summary['errors']} 个", file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="对话负载生成器")
+    source = parser.add_argument_group("对话来源 (默认使用 manifest.json 里的全部测试数据)")
+    source.add_argument("--dialogues", nargs="*", default=None, metavar="通配符",
+                        help="只用文件名匹配的测试数据，例如 'ecommerce_*'")
+    source.add_argument("--walk", action="append", default=[], metavar="脚本",
+                        help="对该脚本做随机游走 (可以重复)，代替测试数据")
+    source.add_argument("--walks", type=int, default=200, help="每个脚本预先生成的随机游走条数")
+    source.add_argument("--max-turns", type=int, default=20, help="随机游走的最大轮数")
+    source.add_argument("--noise", type=float, default=0.1, help="随机游走时说一句听不懂的话的概率")
+    source.add_argument("--scripts", default=SCRIPT_DIR, help="脚本目录")
+    source.add_argument("--data", default=DATA_DIR, help="测试数据目录 (含 manifest.json)")
+
+    load = parser.add_argument_group("负载")
+    load.add_argument("--concurrency", type=int, default=50, help="同时进行的对话数上限")
+    load.add_argument("--rate", type=float, default=0.0, help="每秒到达的新对话数 (泊松)，0 表示闭环")
+    load.add_argument("--conversations", type=int, default=1000, help="总对话数")
+    load.add_argument("--duration", type=float, default=None, help="压测时长 (秒)，设置后忽略 --conversations")
+    load.add_argument("--think", type=float, default=0.0, help="每轮之间的思考时间 (秒)")
+    load.add_argument("--seed", type=int, default=0)
+
+    target = parser.add_argument_group("压测目标 (默认进程内 DSLExecutor + Stub)")
+    target.add_argument("--url", default=None, help="压测已经在运行的对话服务，例如 http://127.0.0.1:8000")
+    target.add_argument("--llm-url", default=None, help="真实模式，请求这个 OpenAI 兼容地址 (例如 benchmarks/fake_llm.py)")
+    target.add_argument("--fake-llm", type=float, default=None, metavar="延迟",
+                        help="真实模式，在进程内启动假的大模型服务，每个请求延迟这么多秒")
+    target.add_argument("--llm-only", action="store_true",
+                        help="真实模式下关掉本地识别层和缓存，每一轮都请求大模型")
+    parser.add_argument("--json", default=None, help="把结果写成 JSON 文件")
+    parser.add_argument("--log-level", default="ERROR", help="日志级别 (降级等警告默认不输出，免得刷屏)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """:return: 结果汇总 dict"""
+    args = parse_args(argv)
+    setup_logging(args.log_level)
+    registry = ScriptRegistry()
+
+    if args.walk:
+        dialogues = []
+        for path in args.walk:
+            dialogues += random_walks(os.path.abspath(path), args.walks, registry, args.max_turns, args.noise,
+                                      args.seed)
+    else:
+        dialogues = load_dialogues(args.scripts, args.data, args.dialogues)
+    dialogues = [d for d in dialogues if d.turns]
+    if not dialogues:
+        raise SystemExit("没有可用的对话")
+
+    with contextlib.ExitStack() as stack:
+        if args.url:
+            target = ServerTarget(args.url)
+            mode = f"服务 {args.url}"
+        else:
+            llm_options = dict(intent_cache=False, cascade=build_cascade("")) if args.llm_only else {}
+            if args.fake_llm is not None:
+                from benchmarks.fake_llm import FakeLLMServer, keyword_reply
+                fake = stack.enter_context(FakeLLMServer(reply=keyword_reply, latency=args.fake_llm))
+                client = LLMClient(base_url=fake.url, api_key="loadgen", **llm_options)
+                mode = f"进程内 + 假大模型 ({args.fake_llm * 1000:.0f}ms)"
+            elif args.llm_url:
+                client = LLMClient(base_url=args.llm_url, **llm_options)
+                mode = f"进程内 + 大模型 {args.llm_url}"
+            else:
+                client = LLMClient(use_stub=True)
+                mode = "进程内 + Stub"
+            stack.callback(client.close)
+            target = ExecutorTarget(client, registry)
+
+        arrival = f"{args.rate:g} 对话/秒" if args.rate else "闭环"
+        amount = f"{args.duration:g}s" if args.duration else f"{args.conversations} 个对话"
+        print(f"目标: {mode}  并发上限: {args.concurrency}  到达: {arrival}  规模: {amount}  对话样本: {len(dialogues)}")
+        stats = asyncio.run(run_load(target, dialogues, args.concurrency, args.rate, args.conversations,
+                                     args.duration, args.think, args.seed))
+
+    summary = stats.summary()
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
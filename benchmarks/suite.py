@@ -0,0 +1,281 @@
+# 基准测试套件：把引擎的关键路径跑一遍，和保存的基线比较，退化超过阈值时退出码非 0
+#
+# - lex / parse: 合成脚本的词法分析、解析 + 编译吞吐
+# - match: Stub 模式关键词匹配 (_local_stub_match) 单次耗时
+# - stub: DSLExecutor.step 在 Stub 模式下的每秒轮次、p50 / p99 单轮耗时
+# - fake_real: 请求本地假的 OpenAI 兼容服务 (可配延迟)，多个会话并发 astep 的每秒轮次、p50 / p99
+#
+# 每项跑 --repeat 次取最好的一次 (少于 MIN_REPEAT 次时波动太大，只输出结果，不比较也不保存基线)；
+# 基线和机器相关，换机器后先 --save 一次
+# 用法: python -m benchmarks.suite [--save] [--threshold 百分比] [--only stub,parse] [--llm-latency 秒]
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.lexer import Lexer
+from dsl.parser import parse_code
+from dsl.compiler import compile_script
+from dsl.executor import DSLExecutor
+from dsl.registry import ScriptRegistry
+from llm.cascade import build_cascade
+from llm.wrapper import LLMClient
+from benchmarks.synthetic import generate_script
+from benchmarks.fake_llm import FakeLLMServer, keyword_reply
+
+BASELINE_PATH = os.path.join(current_dir, "baselines.json")
+MIN_REPEAT = 3  # 和基线比较 (或者保存基线) 至少需要的重复次数
+
+# 指标名 -> (单位, 越大越好?)
+METRICS = {
+    "lex_mchars_per_s": ("M 字符/秒", True),
+    "parse_states_per_s": ("状态/秒", True),
+    "match_us": ("us/次", False),
+    "stub_turns_per_s": ("轮/秒", True),
+    "stub_p50_us": ("us", False),
+    "stub_p99_us": ("us", False),
+    "fake_real_turns_per_s": ("轮/秒", True),
+    "fake_real_p50_ms": ("ms", False),
+    "fake_real_p99_ms": ("ms", False),
+}
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def _walk_inputs(script, seed=0):
+    """每个状态预先选一个跳转，用它的一个关键词当作用户输入 (压测时按当前状态取用)"""
+    rng = random.Random(seed)
+    inputs = {}
+    for state in script.states:
+        if state.options:
+            keyword = rng.choice(rng.choice(state.options).split("/"))
+            inputs[state.id] = f"我想问一下{keyword}的事"
+    return inputs
+
+
+def _open_executors(text, client, count):
+    """把合成脚本写到临时文件，建 count 个执行器 (共用一个注册表，脚本只编译一次)"""
+    registry = ScriptRegistry(use_cache=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.rsl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        executors = [DSLExecutor(path, client, registry=registry) for _ in range(count)]
+    for executor in executors:
+        executor.run()
+    return executors
+
+
+# ---------- 各项基准 ----------
+def bench_lex(options):
+    text = generate_script(options.states, charset=options.charset)
+    t0 = time.perf_counter()
+    Lexer(text).tokenize()
+    return {"lex_mchars_per_s": len(text) / 1e6 / (time.perf_counter() - t0)}
+
+
+def bench_parse(options):
+    text = generate_script(options.states, keywords=options.keywords, charset=options.charset)
+    t0 = time.perf_counter()
+    compile_script(parse_code(text))
+    return {"parse_states_per_s": options.states / (time.perf_counter() - t0)}
+
+
+def bench_match(options):
+    client = LLMClient(use_stub=True)
+    script = compile_script(parse_code(generate_script(50, branching=6, keywords=options.keywords,
+                                                       charset=options.charset)))
+    inputs = list(_walk_inputs(script).items())
+    rounds = 100_000
+    t0 = time.perf_counter()
+    for i in range(rounds):
+        state_id, user_input = inputs[i % len(inputs)]
+        client._local_stub_match(user_input, script.states[state_id].options)
+    return {"match_us": (time.perf_counter() - t0) / rounds * 1e6}
+
+
+def bench_stub(options):
+    text = generate_script(options.states, keywords=options.keywords, charset=options.charset)
+    executor, = _open_executors(text, LLMClient(use_stub=True), 1)
+    inputs = _walk_inputs(executor.script)
+    latencies = []
+    perf_counter = time.perf_counter
+    t_start = perf_counter()
+    while len(latencies) < options.turns:
+        if executor.is_finished:
+            executor.run()
+        user_input = inputs[executor.session.state.id]
+        t0 = perf_counter()
+        executor.step(user_input)
+        latencies.append(perf_counter() - t0)
+    elapsed = perf_counter() - t_start
+    return {"stub_turns_per_s": len(latencies) / elapsed,
+            "stub_p50_us": percentile(latencies, 50) * 1e6,
+            "stub_p99_us": percentile(latencies, 99) * 1e6}
+
+
+def bench_fake_real(options):
+    text = generate_script(options.states, keywords=options.keywords, charset=options.charset)
+    with FakeLLMServer(reply=keyword_reply, latency=options.llm_latency) as fake:
+        # 关掉本地识别层和缓存，每一轮都真的发 HTTP 请求
+        client = LLMClient(base_url=fake.url, api_key="bench", intent_cache=False, cascade=build_cascade(""))
+        executors = _open_executors(text, client, options.concurrency)
+        inputs = _walk_inputs(executors[0].script)
+        turns = max(options.turns // 20, options.concurrency * 4)
+        latencies = []
+
+        async def drive(executor):
+            while len(latencies) < turns:
+                if executor.is_finished:
+                    executor.run()
+                t0 = time.perf_counter()
+                await executor.astep(inputs[executor.session.state.id])
+                latencies.append(time.perf_counter() - t0)
+
+        async def main():
+            try:
+                t0 = time.perf_counter()
+                await asyncio.gather(*(drive(executor) for executor in executors))
+                return time.perf_counter() - t0
+            finally:
+                await client.aclose()
+
+        elapsed = asyncio.run(main())
+        client.close()
+    return {"fake_real_turns_per_s": len(latencies) / elapsed,
+            "fake_real_p50_ms": percentile(latencies, 50) * 1e3,
+            "fake_real_p99_ms": percentile(latencies, 99) * 1e3}
+
+
+BENCHMARKS = {
+    "lex": bench_lex,
+    "parse": bench_parse,
+    "match": bench_match,
+    "stub": bench_stub,
+    "fake_real": bench_fake_real,
+}
+
+
+def run(options):
+    """每项跑 options.repeat 次，每个指标取最好的一次"""
+    results = {}
+    for name in options.only:
+        for _ in range(options.repeat):
+            for metric, value in BENCHMARKS[name](options).items():
+                better_high = METRICS[metric][1]
+                if metric not in results or (value > results[metric]) == better_high:
+                    results[metric] = value
+    return results
+
+
+# ---------- 基线 ----------
+def compare(results, baseline, threshold):
+    """
+    :param threshold: 允许的退化百分比
+    :return: [(指标, 当前值, 基线值, 退化百分比, 是否超过阈值)]，基线里没有的指标不比较
+    """
+    rows = []
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        if not base:
+            continue
+        change = (base - value) / base if METRICS[metric][1] else (value - base) / base
+        rows.append((metric, value, base, change * 100, change * 100 > threshold))
+    return rows
+
+
+def _config(options):
+    return {"states": options.states, "keywords": options.keywords, "charset": options.charset,
+            "turns": options.turns, "concurrency": options.concurrency, "llm_latency": options.llm_latency}
+
+
+def load_baseline(path):
+    """:return: {"metrics": {指标: 值}, "config": 生成基线时的参数}"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"metrics": {}, "config": {}}
+
+
+def save_baseline(path, results, options):
+    baseline = load_baseline(path)
+    baseline["metrics"].update({metric: round(value, 3) for metric, value in results.items()})
+    baseline["config"] = _config(options)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DSL 引擎基准测试套件")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"要跑的基准，逗号分隔 (可选 {', '.join(BENCHMARKS)})")
+    parser.add_argument("--states", type=int, default=5000, help="合成脚本的状态数")
+    parser.add_argument("--keywords", type=int, default=3, help="每个跳转的关键词个数")
+    parser.add_argument("--charset", choices=("zh", "ascii", "mixed"), default="zh", help="合成脚本的文字")
+    parser.add_argument("--turns", type=int, default=50_000, help="Stub 模式的轮次 (fake_real 跑其 1/20)")
+    parser.add_argument("--concurrency", type=int, default=32, help="fake_real 模式同时进行的会话数")
+    parser.add_argument("--llm-latency", type=float, default=0.005, help="假大模型服务每个请求的延迟 (秒)")
+    parser.add_argument("--repeat", type=int, default=3, help=f"每项重复次数，取最好的一次 (少于 {MIN_REPEAT} 次时不比较基线)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件")
+    parser.add_argument("--threshold", type=float, default=25.0, help="允许的退化百分比")
+    parser.add_argument("--save", action="store_true", help="把本次结果写入基线 (不做比较)")
+    args = parser.parse_args(argv)
+    args.only = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in args.only if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    """:return: 退出码，有指标退化超过阈值时为 1"""
+    options = parse_args(argv)
+    results = run(options)
+
+    if options.save or options.repeat < MIN_REPEAT:
+        for metric, value in results.items():
+            print(f"{metric:<24} {value:12.2f} {METRICS[metric][0]}")
+        if options.repeat < MIN_REPEAT:
+            print(f"\n⚠️ --repeat 小于 {MIN_REPEAT}，单次结果噪声太大，不和基线比较，也不保存基线")
+            return 0
+        save_baseline(options.baseline, results, options)
+        print(f"\n基线已写入 {options.baseline}")
+        return 0
+
+    baseline = load_baseline(options.baseline)
+    if baseline["config"] and baseline["config"] != _config(options):
+        print(f"⚠️ 本次参数与生成基线时不同，比较结果仅供参考: {baseline['config']}")
+    rows = compare(results, baseline["metrics"], options.threshold)
+    compared = {row[0] for row in rows}
+    for metric, value, base, change, regressed in rows:
+        flag = "❌ 退化" if regressed else "✅"
+        print(f"{metric:<24} {value:12.2f} {METRICS[metric][0]:<8} 基线 {base:12.2f}  退化 {change:+6.1f}%  {flag}")
+    for metric in results:
+        if metric not in compared:
+            print(f"{metric:<24} {results[metric]:12.2f} {METRICS[metric][0]:<8} (没有基线)")
+
+    failed = [row[0] for row in rows if row[4]]
+    if failed:
+        print(f"\n❌ {len(failed)} 项指标退化超过 {options.threshold:.0f}%: {', '.join(failed)}")
+        return 1
+    print(f"\n✅ 没有超过 {options.threshold:.0f}% 的退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# 合成 .rsl 脚本生成器：用于压测词法/语法分析和执行器
+# 生成的脚本是一条主链 + 若干分支，所有跳转目标都存在，可以直接编译运行
+
+import random
+
+WORDS = ["查询", "物流", "退款", "订单", "升级", "套餐", "故障", "网络", "蓝屏", "重启",
+         "不需要", "感兴趣", "办理", "维修", "发票", "优惠", "地址", "客服", "账单", "密码"]
+
+ASCII_WORDS = ["query", "track", "refund", "order", "upgrade", "plan", "fault", "network", "reboot", "repair",
+               "invoice", "coupon", "address", "agent", "bill", "password", "cancel", "deliver", "return", "modem"]
+
+CHARSETS = ("zh", "ascii", "mixed")
+
+
+def _vocabulary(charset, keywords):
+    if charset not in CHARSETS:
+        raise ValueError(f"未知的字符集: {charset} (可选 {' / '.join(CHARSETS)})")
+    words = {"zh": WORDS, "ascii": ASCII_WORDS, "mixed": WORDS + ASCII_WORDS}[charset]
+    # 每个跳转要的关键词比词表还多时，加编号扩充词表
+    suffix = 2
+    base = list(words)
+    while len(words) < keywords:
+        words = words + [f"{w}{suffix}" for w in base]
+        suffix += 1
+    return words
+
+
+def generate_script(num_states, branching=3, seed=0, response_repeat=1, keywords=3, charset="zh"):
+    """
+    生成一份包含 num_states 个状态的脚本文本
+    :param branching: 每个非结束状态的跳转数
+    :param response_repeat: 回复文本重复的次数，用来制造超长字符串
+    :param keywords: 每个跳转的关键词个数
+    :param charset: 关键词和回复用的文字，"zh" 中文 / "ascii" 英文 / "mixed" 混合
+    """
+    rng = random.Random(seed)
+    words = _vocabulary(charset, keywords)
+    lines = ['domain "合成压测脚本"' if charset != "ascii" else 'domain "synthetic benchmark"', '']
+    for i in range(num_states):
+        name = "start" if i == 0 else f"s{i}"
+        lines.append(f"state {name}:")
+        if charset == "ascii":
+            response = f"This is state {i}, tell me about your {rng.choice(words)} question. " * response_repeat
+        else:
+            response = f"这是第 {i} 个状态的回复，{rng.choice(words)}相关的问题请告诉我。" * response_repeat
+        lines.append(f'    response "{response}"')
+        if i >= num_states - branching:
+            lines.append("    end")
+        else:
+            for b in range(branching):
+                target = f"s{min(num_states - 1, i + 1 + b)}"
+                lines.append(f'    transition intent_{i}_{b} "{"/".join(rng.sample(words, keywords))}" -> {target}')
+        lines.append("    # 自动生成")
+        lines.append("")
+    return "\n".join(lines)
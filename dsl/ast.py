@@ -18,6 +18,8 @@ class Script(Node):
         self.start_state = "start"
         # ====================================
 
+        self.source_hash = None  # 脚本内容的 sha256，由 dsl.cache.load_script 填写
+
     def __repr__(self):
         return f"<Script domain='{self.domain}' states={len(self.states)}>"
 
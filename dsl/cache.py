@@ -0,0 +1,97 @@
+# 解析结果的磁盘缓存：以 "文件内容哈希 + 解析器版本" 为键保存 Script AST
+# 命中时直接反序列化，完全跳过词法和语法分析；脚本内容或解析器版本变化后旧条目自动失效
+
+import os
+import time
+import glob
+import pickle
+import hashlib
+
+from metrics.registry import timer
+from .parser import parse_code, PARSER_VERSION
+
+_LOAD_TIME = timer("dsl_load_seconds", "读取脚本的耗时 (source=cache 命中磁盘缓存 / parse 重新解析)", ("source",))
+
+CACHE_DIR_NAME = "__rslcache__"
+
+
+def source_digest(data: bytes):
+    """脚本内容的哈希 (也作为脚本的版本标识使用)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_prefix(filepath):
+    """
+    同一个脚本所有缓存条目共同的文件名前缀：文件名 + 脚本绝对路径的哈希
+    (统一的缓存目录里，不同目录下的同名脚本互不覆盖、互不清理)
+    """
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    path_hash = hashlib.sha256(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:8]
+    return f"{stem}.{path_hash}"
+
+
+def cache_path_for(filepath, digest, cache_dir=None):
+    """
+    缓存文件路径：默认放在脚本旁边的 __rslcache__/ 目录，
+    可以用参数或环境变量 DSL_CACHE_DIR 指定统一的缓存目录
+    """
+    cache_dir = cache_dir or os.getenv("DSL_CACHE_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(filepath)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{_entry_prefix(filepath)}.v{PARSER_VERSION}.{digest[:16]}.pickle")
+
+
+def _read_cache(path, digest):
+    try:
+        with open(path, 'rb') as f:
+            version, cached_digest, script = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError, TypeError):
+        return None
+    # 文件名里只有哈希前缀，这里再做一次完整校验
+    if version != PARSER_VERSION or cached_digest != digest:
+        return None
+    return script
+
+
+def _write_cache(path, digest, script, prefix):
+    """
+    原子写入缓存，并清理同一脚本的旧条目；缓存目录不可写时静默跳过
+    :param prefix: 同一脚本的条目共同的文件名前缀 (_entry_prefix)
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((PARSER_VERSION, digest, script), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        for stale in glob.glob(os.path.join(os.path.dirname(path), glob.escape(prefix) + ".v*.pickle")):
+            if stale != path:
+                os.remove(stale)
+    except OSError:
+        pass
+
+
+def load_script(filepath, cache_dir=None, use_cache=True):
+    """
+    读取并解析脚本，优先使用磁盘缓存
+    返回的 Script 上带有 source_hash (脚本内容的 sha256)
+    """
+    t0 = time.perf_counter()
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    digest = source_digest(data)
+
+    path = cache_path_for(filepath, digest, cache_dir) if use_cache else None
+    script = _read_cache(path, digest) if path else None
+    if script is not None:
+        _LOAD_TIME.observe(time.perf_counter() - t0, "cache")
+        return script
+
+    # 与文本模式 open() 的通用换行处理保持一致
+    code = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    script = parse_code(code)
+    script.source_hash = digest
+    if path:
+        _write_cache(path, digest, script, _entry_prefix(filepath))
+    _LOAD_TIME.observe(time.perf_counter() - t0, "parse")
+    return script
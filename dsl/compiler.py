@@ -0,0 +1,91 @@
+# 编译阶段：把 parse_dsl_file 产出的 AST 转换为只读的状态表
+# 执行器在每一轮对话里只做查表，不再临时构造候选列表和映射字典
+
+from .ast import Script
+
+
+class CompiledState:
+    """编译后的状态记录 (只读)"""
+
+    __slots__ = ('id', 'name', 'response', 'is_end', 'options', 'targets', 'fallback_reply')
+
+    def __init__(self, id, name, response, is_end, options, targets, fallback_reply):
+        self.id = id  # 整数状态 ID (即在 CompiledScript.states 中的下标)
+        self.name = name  # 原始状态名
+        self.response = response  # 机器人回复的话
+        self.is_end = is_end  # 是否是结束状态 (脚本里写了 end)
+        self.options = options  # 元组: 交给意图识别的候选描述
+        self.targets = targets  # 字典: {描述: 目标状态 ID}
+        self.fallback_reply = fallback_reply  # 没听懂时的兜底回复 (预先拼好)
+
+    def __setattr__(self, key, value):
+        if hasattr(self, key):
+            raise AttributeError(f"CompiledState 是只读的，不能修改 {key}")
+        object.__setattr__(self, key, value)
+
+    def __repr__(self):
+        return f"<CompiledState id={self.id} name='{self.name}' is_end={self.is_end}>"
+
+
+class CompiledScript:
+    """编译后的整份脚本 (只读)"""
+
+    __slots__ = ('domain', 'states', 'index', 'start_id', 'source_hash')
+
+    def __init__(self, domain, states, index, start_id, source_hash=None):
+        self.domain = domain  # 领域名称
+        self.states = states  # 元组: 按 ID 排列的 CompiledState
+        self.index = index  # 字典: {状态名: 状态 ID}
+        self.start_id = start_id  # 起始状态 ID，脚本里没有 start 时为 None
+        self.source_hash = source_hash  # 脚本内容的 sha256 (未知时为 None)
+
+    def __setattr__(self, key, value):
+        if hasattr(self, key):
+            raise AttributeError(f"CompiledScript 是只读的，不能修改 {key}")
+        object.__setattr__(self, key, value)
+
+    @property
+    def start_state(self):
+        """起始状态对象"""
+        if self.start_id is None:
+            return None
+        return self.states[self.start_id]
+
+    def state(self, name):
+        """按名字查找状态，找不到返回 None"""
+        state_id = self.index.get(name)
+        return None if state_id is None else self.states[state_id]
+
+    def __repr__(self):
+        return f"<CompiledScript domain='{self.domain}' states={len(self.states)}>"
+
+
+def compile_script(script: Script):
+    """
+    把 Script AST 编译成 CompiledScript
+    :raises SyntaxError: 跳转目标指向了不存在的状态
+    """
+    index = {name: i for i, name in enumerate(script.states)}
+
+    states = []
+    for i, node in enumerate(script.states.values()):
+        # 与原来的 {t.description: t} 一致：描述重复时后出现的跳转生效
+        targets = {}
+        for t in node.transitions:
+            if t.target_state not in index:
+                raise SyntaxError(f"状态 {node.name} 的跳转 {t.intent} 指向了不存在的状态 {t.target_state}")
+            targets[t.description] = index[t.target_state]
+
+        options = tuple(targets)
+        states.append(CompiledState(
+            id=i,
+            name=node.name,
+            response=node.response,
+            is_end=node.is_end,
+            options=options,
+            targets=targets,
+            fallback_reply=f"抱歉，我没听懂。请参考以下内容回复：{' / '.join(options)}",
+        ))
+
+    return CompiledScript(script.domain, tuple(states), index, index.get(script.start_state),
+                          script.source_hash)
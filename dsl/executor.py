@@ -1,82 +1,94 @@
-from dsl.parser import parse_dsl_file
+import os
+
+from dsl.registry import default_registry
+from dsl.session import Session
+from llm.cassette import CassetteMiss
+from metrics.log import get_logger
+
+log = get_logger("dsl")
 
 
 class DSLExecutor:
-    def __init__(self, script_path, llm_client):
+    def __init__(self, script_path, llm_client, registry=None):
         """
         :param script_path: RSL 脚本文件的路径
         :param llm_client: 统一的大模型客户端 (可能是 Real 也可能是 Stub)
+        :param registry: 脚本注册表，默认使用进程内共享的 default_registry
         """
         self.llm = llm_client
+        self.registry = registry if registry is not None else default_registry
+        self.script_path = os.path.abspath(script_path)
+        self.stale = False  # 脚本热更新后当前状态已不存在，仍按旧版本脚本执行
+        self._rejected = None  # 切换失败的新版本脚本，同一个版本不再重复尝试
+        self.last_error = None  # 最近一轮没能完成的原因 (目前只有磁带回放未命中)，成功的轮次会清空
 
-        # 1. 解析脚本
+        # 1. 获取编译好的脚本 (同一个文件在进程内只解析一次)
         try:
-            self.script = parse_dsl_file(script_path)
-            # 2. 初始化指针
-            self.current_state_name = self.script.start_state
-            self.is_finished = False
+            self.script = self.registry.get(script_path)
+            # 2. 初始化会话游标
+            self.session = Session(self.script)
         except Exception as e:
-            print(f"❌ 脚本解析失败: {e}")
+            log.error("❌ 脚本解析失败: %s", e)
             self.script = None
-            self.is_finished = True
+            self.session = None
+
+    @property
+    def is_finished(self):
+        return self.session.is_finished if self.session else True
+
+    @property
+    def current_state_name(self):
+        state = self.session.state if self.session else None
+        return state.name if state else None
 
     def get_current_state(self):
         """获取当前状态对象"""
-        if not self.script: return None
-        return self.script.states.get(self.current_state_name)
+        return self.session.state if self.session else None
 
     def run(self):
         """启动会话，返回开场白"""
-        if not self.script: return "系统错误：脚本未加载"
-
-        self.current_state_name = self.script.start_state
-        self.is_finished = False
+        if not self.session: return "系统错误：脚本未加载"
+        return self.session.start()
+
+    def _refresh(self):
+        """脚本热更新过 (见 dsl.reload.ScriptWatcher) 的话切到新版本，当前状态在新脚本里不存在时继续用旧版本"""
+        script = self.registry.current(self.script_path)
+        if script is None or script is self.script or script is self._rejected:
+            return
+        if self.session.rebind(script):
+            self.script = script
+            self.stale = False
+        else:
+            self._rejected = script
+            self.stale = True
+            log.warning("⚠️ %s 热更新后当前状态已不存在，继续按旧版本执行", os.path.basename(self.script_path))
 
-        start_node = self.get_current_state()
-        return start_node.response if start_node else "Error: Start state not found."
+    def _replay_missed(self, e):
+        """磁带回放未命中：状态不动，返回提示，原因留在 last_error 里"""
+        self.last_error = e
+        log.error("❌ 大模型回放未命中，本轮没有执行: %s", e)
+        return "系统错误：大模型回放未命中 (磁带里没有这次调用)，请先录制"
 
     def step(self, user_input):
         """
         执行一步状态流转
         """
-        if self.is_finished:
-            return "（会话已结束）"
-
-        current_node = self.get_current_state()
-        if not current_node: return "系统错误：状态丢失"
-
-        # 1. 检查是否是结束状态
-        if current_node.is_end or not current_node.transitions:
-            self.is_finished = True
-            return "（流程结束）"
-
-        # 2. 准备候选项
-        transitions = current_node.transitions
-        # 构造映射表: { "中文描述": Transition对象 }
-        # 这样做是为了让 LLM 理解选项含义
-        options_map = {t.description: t for t in transitions}
-        options_text = list(options_map.keys())
-
-        # 3. 意图识别 (委托给 LLMClient，支持 Stub/Real 切换)
-        # print(f"   [Debug] 正在识别意图，候选: {options_text}")
-        detected_intent = self.llm.recognize_intent(user_input, options_text)
-
-        # 4. 状态跳转
-        if detected_intent in options_map:
-            # 找到对应的 Transition 对象
-            trans = options_map[detected_intent]
-
-            # 更新状态指针
-            self.current_state_name = trans.target_state
-
-            # 获取新状态
-            new_state = self.get_current_state()
-
-            # 检查新状态是否结束
-            if new_state.is_end:
-                self.is_finished = True
+        if not self.session: return "（会话已结束）"
+        self._refresh()
+        self.last_error = None
+        try:
+            return self.session.step(user_input, self.llm.recognize_intent)
+        except CassetteMiss as e:
+            return self._replay_missed(e)
 
-            return new_state.response
-        else:
-            # 兜底回复
-            return f"抱歉，我没听懂。请参考以下内容回复：{' / '.join(options_text)}"
\ No newline at end of file
+    async def astep(self, user_input):
+        """
+        step 的 asyncio 版本：等待大模型时让出事件循环，一个线程可以同时推进大量会话
+        """
+        if not self.session: return "（会话已结束）"
+        self._refresh()
+        self.last_error = None
+        try:
+            return await self.session.astep(user_input, self.llm.recognize_intent_async)
+        except CassetteMiss as e:
+            return self._replay_missed(e)
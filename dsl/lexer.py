@@ -2,6 +2,8 @@ import re
 
 
 class Token:
+    __slots__ = ('type', 'value', 'line')
+
     def __init__(self, type, value, line):
         self.type = type
         self.value = value
@@ -11,77 +13,60 @@ class Token:
         return f"Token({self.type}, {self.value})"
 
 
+# 关键词表：不在表里的单词都是 ID
+KEYWORDS = {
+    'domain': 'DOMAIN',
+    'state': 'STATE',
+    'response': 'RESPONSE',
+    'transition': 'TRANSITION',
+    'end': 'END',
+}
+
+# 主正则：各分支的顺序就是匹配优先级
+# 空白符和未知字符不需要单独的分支，finditer 找下一个匹配时会自动跳过它们
+TOKEN_PATTERN = re.compile(r'''
+    (?P<COMMENT>\#[^\n]*)           # # 注释，直到行尾
+  | (?P<COLON>:)
+  | (?P<ARROW>->)
+  | "(?P<DQ>[^"]*)"?                # 双引号字符串 (未闭合时吃到文件末尾)
+  | '(?P<SQ>[^']*)'?                # 单引号字符串
+  | (?P<WORD>[^\W\d]\w*)            # 关键词与 ID
+''', re.VERBOSE)
+
+
 class Lexer:
     def __init__(self, text):
         self.text = text
         self.pos = 0
         self.line = 1
 
-    def tokenize(self):
-        tokens = []
-        while self.pos < len(self.text):
-            char = self.text[self.pos]
-
-            # 1. 跳过空白符
-            if char.isspace():
-                if char == '\n': self.line += 1
-                self.pos += 1
-                continue
+    def iter_tokens(self):
+        """逐个产出 Token (惰性)，整个文本只用一条编译好的正则扫描一遍"""
+        text = self.text
+        keywords = KEYWORDS
+        line = self.line
+        last = self.pos
 
-            # 2. 【核心修复】支持 # 注释
-            # 遇到 # 就一直跳过，直到行尾
-            if char == '#':
-                while self.pos < len(self.text) and self.text[self.pos] != '\n':
-                    self.pos += 1
-                continue
+        for m in TOKEN_PATTERN.finditer(text, self.pos):
+            # 两个 Token 之间只可能是空白符、注释和未知字符
+            # 只统计这些间隙里的换行，字符串内部的换行不计入行号 (与逐字符实现保持一致)
+            line += text.count('\n', last, m.start())
+            last = m.end()
 
-            # 3. 符号解析
-            if char == ':':
-                tokens.append(Token('COLON', ':', self.line))
-                self.pos += 1
-                continue
+            kind = m.lastgroup
+            if kind == 'WORD':
+                word = m.group()
+                yield Token(keywords.get(word, 'ID'), word, line)
+            elif kind == 'DQ' or kind == 'SQ':
+                yield Token('STRING', m.group(kind), line)
+            elif kind == 'COLON':
+                yield Token('COLON', ':', line)
+            elif kind == 'ARROW':
+                yield Token('ARROW', '->', line)
+            # COMMENT 直接丢弃
 
-            # 解析 -> 箭头
-            if self.text[self.pos:self.pos + 2] == '->':
-                tokens.append(Token('ARROW', '->', self.line))
-                self.pos += 2
-                continue
+        self.pos = len(text)
+        self.line = line + text.count('\n', last)
 
-            # 4. 字符串解析 "..." 或 '...'
-            if char == '"' or char == "'":
-                quote = char
-                self.pos += 1  # 跳过开始的引号
-                val = ""
-                while self.pos < len(self.text) and self.text[self.pos] != quote:
-                    val += self.text[self.pos]
-                    self.pos += 1
-                self.pos += 1  # 跳过结束的引号
-                tokens.append(Token('STRING', val, self.line))
-                continue
-
-            # 5. 关键词与ID解析
-            if char.isalpha() or char == '_':
-                start = self.pos
-                while self.pos < len(self.text) and (self.text[self.pos].isalnum() or self.text[self.pos] == '_'):
-                    self.pos += 1
-                word = self.text[start:self.pos]
-
-                # 关键词匹配
-                if word == 'domain':
-                    tokens.append(Token('DOMAIN', word, self.line))
-                elif word == 'state':
-                    tokens.append(Token('STATE', word, self.line))
-                elif word == 'response':
-                    tokens.append(Token('RESPONSE', word, self.line))
-                elif word == 'transition':
-                    tokens.append(Token('TRANSITION', word, self.line))
-                elif word == 'end':
-                    tokens.append(Token('END', word, self.line))
-                else:
-                    tokens.append(Token('ID', word, self.line))
-                continue
-
-            # 其他未知字符跳过
-            self.pos += 1
-
-        return tokens
\ No newline at end of file
+    def tokenize(self):
+        return list(self.iter_tokens())
@@ -1,6 +1,9 @@
 from .lexer import Lexer
 from .ast import Script, State, Transition
 
+# 解析器版本：词法/语法规则或 AST 结构变化时递增，旧的磁盘缓存会随之失效
+PARSER_VERSION = 1
+
 
 class Parser:
     def __init__(self, tokens):
@@ -78,12 +81,16 @@ class Parser:
         return State(state_name, response_text, transitions, is_end)
 
 
-def parse_dsl_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        code = f.read()
-
+def parse_code(code):
     lexer = Lexer(code)
     tokens = lexer.tokenize()
 
     parser = Parser(tokens)
-    return parser.parse()
\ No newline at end of file
+    return parser.parse()
+
+
+def parse_dsl_file(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    return parse_code(code)
@@ -0,0 +1,117 @@
+# 脚本注册表：每个 .rsl 文件只解析、编译一次，之后所有会话共享同一份 CompiledScript
+
+import os
+import threading
+
+from .cache import load_script, source_digest
+from .compiler import compile_script
+from .session import Session
+
+
+class ScriptRegistry:
+    def __init__(self, cache_dir=None, use_cache=True):
+        """
+        :param cache_dir: 解析结果的磁盘缓存目录，默认放在脚本旁边的 __rslcache__/
+        :param use_cache: 是否使用磁盘缓存
+        """
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self._scripts = {}  # 字典: {脚本绝对路径: CompiledScript}
+        self._load_hooks = []  # 脚本加载完成后调用的钩子 hook(CompiledScript)
+        self._reload_hooks = []  # 脚本热更新后调用的钩子 hook(脚本路径, 旧 CompiledScript, 新 CompiledScript)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(script_path):
+        return os.path.abspath(script_path)
+
+    def get(self, script_path):
+        """
+        获取编译好的脚本，首次访问时解析并编译
+        :raises SyntaxError: 脚本有语法错误
+        """
+        key = self._key(script_path)
+        script = self._scripts.get(key)
+        if script is not None:
+            return script
+
+        with self._lock:
+            # 双重检查：等锁期间可能已经被别的线程加载过了
+            script = self._scripts.get(key)
+            if script is None:
+                script = compile_script(load_script(key, self.cache_dir, self.use_cache))
+                for hook in self._load_hooks:
+                    hook(script)
+                self._scripts[key] = script
+        return script
+
+    def current(self, script_path):
+        """已经加载的脚本的当前版本，没加载过返回 None (不会触发加载)"""
+        script = self._scripts.get(script_path)  # 传入的已经是绝对路径时省掉一次 abspath
+        return script if script is not None else self._scripts.get(self._key(script_path))
+
+    def reload(self, script_path):
+        """
+        重新加载已经加载过的脚本 (热更新)：解析、编译、校验并执行加载钩子，全部成功后才原子地替换
+        内容哈希没变 (例如编辑器的无改动保存) 或者脚本从未加载过时什么也不做
+        :return: 新的 CompiledScript，没有替换时返回 None
+        :raises SyntaxError: 新脚本解析或校验失败，旧版本继续生效
+        """
+        key = self._key(script_path)
+        old = self._scripts.get(key)
+        if old is None:
+            return None
+        with open(key, 'rb') as f:
+            if source_digest(f.read()) == old.source_hash:
+                return None
+
+        script = compile_script(load_script(key, self.cache_dir, self.use_cache))
+        if script.start_state is None:
+            raise SyntaxError("脚本缺少 start 状态")
+        for hook in self._load_hooks:
+            hook(script)
+
+        with self._lock:
+            self._scripts[key] = script
+            reload_hooks = list(self._reload_hooks)
+        for hook in reload_hooks:
+            hook(key, old, script)
+        return script
+
+    def add_reload_hook(self, hook):
+        """注册热更新钩子 hook(脚本路径, 旧 CompiledScript, 新 CompiledScript)，在替换完成后调用"""
+        with self._lock:
+            if hook not in self._reload_hooks:
+                self._reload_hooks.append(hook)
+
+    def remove_reload_hook(self, hook):
+        with self._lock:
+            if hook in self._reload_hooks:
+                self._reload_hooks.remove(hook)
+
+    def add_load_hook(self, hook):
+        """
+        注册脚本加载钩子 (例如预先构建意图识别索引)，已经加载过的脚本会立即补调一次
+        同一个钩子重复注册只生效一次
+        """
+        with self._lock:
+            if hook in self._load_hooks:
+                return
+            self._load_hooks.append(hook)
+            loaded = list(self._scripts.values())
+        for script in loaded:
+            hook(script)
+
+    def open_session(self, script_path, keep_history=False):
+        """为指定脚本创建一个新的会话"""
+        return Session(self.get(script_path), keep_history)
+
+    def __contains__(self, script_path):
+        return self._key(script_path) in self._scripts
+
+    def __len__(self):
+        return len(self._scripts)
+
+
+# 进程内默认注册表 (main.py / app.py / 批量测试共用)
+default_registry = ScriptRegistry()
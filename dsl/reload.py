@@ -0,0 +1,89 @@
+# 脚本热更新：后台线程轮询脚本目录，.rsl 文件变化后交给 ScriptRegistry.reload 重新加载
+# 轮询只看 (mtime, size)，真正是否替换由 reload 里的内容哈希决定 (编辑器的无改动保存不会触发替换)
+# 解析失败时旧版本继续生效；已经打开的会话由注册表的热更新钩子负责迁移 (见 SessionManager / DSLExecutor)
+
+import os
+import threading
+
+from metrics.log import get_logger
+from .registry import default_registry
+
+log = get_logger("dsl.reload")
+
+
+class ScriptWatcher:
+    def __init__(self, script_dir, registry=None, interval=1.0):
+        """
+        :param script_dir: 监视的脚本目录 (只看目录下的 .rsl 文件)
+        :param registry: 要热更新的脚本注册表，默认使用 default_registry
+        :param interval: 轮询间隔 (秒)
+        """
+        self.script_dir = os.path.abspath(script_dir)
+        self.registry = registry if registry is not None else default_registry
+        self.interval = interval
+
+        self._seen = self._scan()  # {脚本绝对路径: (mtime, size)}
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.failures = 0
+
+    def _scan(self):
+        files = {}
+        try:
+            entries = list(os.scandir(self.script_dir))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.name.endswith(".rsl") and entry.is_file():
+                try:
+                    stat = entry.stat()
+                except OSError:  # 扫描期间被删掉了
+                    continue
+                files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def check(self):
+        """
+        轮询一次：重新加载内容变化的脚本
+        :return: 本次替换成功的脚本路径列表
+        """
+        current = self._scan()
+        changed = [path for path, sig in current.items() if self._seen.get(path) != sig]
+        self._seen = current
+
+        reloaded = []
+        for path in changed:
+            try:
+                if self.registry.reload(path) is not None:
+                    reloaded.append(path)
+            except (SyntaxError, OSError, UnicodeDecodeError) as e:
+                self.failures += 1
+                log.error("❌ 脚本热更新失败，继续使用旧版本 %s: %s", os.path.basename(path), e)
+        if reloaded:
+            self.reloads += len(reloaded)
+            log.info("🔄 脚本已热更新: %s", ", ".join(os.path.basename(p) for p in reloaded))
+        return reloaded
+
+    # ---------- 后台线程 ----------
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rsl-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # 热更新钩子之类抛出的意外错误不能让监视线程退出 (日志按格式串限速)
+                self.failures += 1
+                log.exception("❌ 脚本目录轮询出错，下一轮继续")
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
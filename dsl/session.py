@@ -0,0 +1,174 @@
+# 会话游标：只记录当前所处的状态和结束标记
+# 脚本本身 (CompiledScript) 是只读的，由 ScriptRegistry 统一持有，所有会话共享同一份
+# 会话可以序列化成紧凑的快照 (脚本哈希 + 状态 ID + 结束标记 + 可选的对话历史)，用于落盘和重启后恢复
+
+import json
+import time
+
+from metrics.registry import counter, timer, FAST_BUCKETS
+
+SNAPSHOT_VERSION = 1
+
+_TRANSITIONS = counter("dsl_transitions_total", "状态跳转次数", ("script", "source", "target"))
+_FALLBACKS = counter("dsl_fallbacks_total", "没听懂 (给出兜底回复) 的次数", ("script", "state"))
+_STATE_TIME = timer("dsl_state_seconds", "每轮查表和状态流转的耗时 (不含意图识别)", buckets=FAST_BUCKETS)
+
+
+class SnapshotError(ValueError):
+    """快照无法恢复：格式不对，或者脚本改过之后快照所在的状态已经不存在"""
+
+
+class Session:
+    """一次对话的运行时状态 (几十个字节，可以同时存在成千上万个)"""
+
+    __slots__ = ('script', 'state', 'is_finished', 'history')
+
+    def __init__(self, script, keep_history=False):
+        """
+        :param script: 共享的 CompiledScript
+        :param keep_history: 是否记录对话历史 [(用户输入, 回复), ...]，默认不记录以节省内存
+        """
+        self.script = script  # 共享的 CompiledScript
+        self.state = script.start_state  # 当前 CompiledState
+        self.is_finished = False
+        self.history = [] if keep_history else None
+
+    def start(self):
+        """回到起始状态，返回开场白"""
+        self.state = self.script.start_state
+        self.is_finished = False
+        if self.history is not None:
+            self.history = []
+        return self.state.response if self.state else "Error: Start state not found."
+
+    def _check(self):
+        """轮次开始前的检查：会话已结束 / 状态丢失 / 到达结束状态时直接给出回复，否则返回 None"""
+        if self.is_finished:
+            return "（会话已结束）"
+
+        current_node = self.state
+        if not current_node: return "系统错误：状态丢失"
+
+        # 检查是否是结束状态
+        if current_node.is_end or not current_node.options:
+            self.is_finished = True
+            return "（流程结束）"
+        return None
+
+    def _advance(self, current_node, detected_intent):
+        """根据识别出的意图跳转；current_node 是发起识别时所在的状态"""
+        target_id = current_node.targets.get(detected_intent)
+        if target_id is None:
+            # 兜底回复
+            _FALLBACKS.inc(self.script.domain, current_node.name)
+            return current_node.fallback_reply
+
+        new_state = self.state = self.script.states[target_id]
+        _TRANSITIONS.inc(self.script.domain, current_node.name, new_state.name)
+
+        # 检查新状态是否结束
+        if new_state.is_end:
+            self.is_finished = True
+
+        return new_state.response
+
+    def step(self, user_input, recognize):
+        """
+        执行一步状态流转
+        :param recognize: 意图识别函数 recognize(user_input, options) -> 命中的描述
+        """
+        t0 = time.perf_counter()
+        reply = self._check()
+        if reply is None:
+            # 意图识别 (候选项和 {描述: 目标状态} 映射都在编译阶段准备好了)
+            current_node = self.state
+            t1 = time.perf_counter()
+            detected_intent = recognize(user_input, current_node.options)
+            t2 = time.perf_counter()
+            reply = self._advance(current_node, detected_intent)
+            _STATE_TIME.observe(t1 - t0 + time.perf_counter() - t2)
+        self._record(user_input, reply)
+        return reply
+
+    async def astep(self, user_input, recognize):
+        """
+        step 的 asyncio 版本
+        :param recognize: 异步意图识别函数 await recognize(user_input, options) -> 命中的描述
+        """
+        t0 = time.perf_counter()
+        reply = self._check()
+        if reply is None:
+            current_node = self.state
+            script = self.script
+            t1 = time.perf_counter()
+            detected_intent = await recognize(user_input, current_node.options)
+            t2 = time.perf_counter()
+            if self.script is not script:
+                # 等待识别期间脚本热更新了：会话已经切到新脚本里的同名状态，按新状态的跳转表走
+                current_node = self.state
+            reply = self._advance(current_node, detected_intent)
+            _STATE_TIME.observe(t1 - t0 + time.perf_counter() - t2)
+        self._record(user_input, reply)
+        return reply
+
+    def _record(self, user_input, reply):
+        if self.history is not None:
+            self.history.append((user_input, reply))
+
+    def rebind(self, script):
+        """
+        切换到新版本的脚本 (热更新)，停留在新脚本里的同名状态
+        :return: 是否切换成功；新脚本里没有当前状态时保持原脚本不变，返回 False
+        """
+        if self.state is None:
+            self.script = script
+            return True
+        state = script.state(self.state.name)
+        if state is None:
+            return False
+        self.script, self.state = script, state
+        return True
+
+    # ---------- 快照 ----------
+    def snapshot(self):
+        """
+        序列化成紧凑的 JSON：[版本, 脚本哈希, 状态 ID, 状态名, 是否结束, 历史]
+        状态名是脚本改动后 (哈希对不上、状态 ID 可能已经变了) 找回原状态用的
+        """
+        state = self.state
+        data = [SNAPSHOT_VERSION, self.script.source_hash, state.id if state else -1,
+                state.name if state else None, int(self.is_finished), self.history]
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def restore(cls, script, data):
+        """
+        从 snapshot() 的结果恢复会话
+        :param script: 会话所属脚本当前的 CompiledScript
+        :raises SnapshotError: 快照损坏，或者脚本改过之后原状态已经不存在
+        """
+        try:
+            version, source_hash, state_id, state_name, finished, history = json.loads(data)
+        except (ValueError, TypeError) as e:
+            raise SnapshotError(f"会话快照损坏: {e}")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"不支持的快照版本: {version}")
+
+        session = cls(script)
+        if state_name is None:
+            session.state = None
+        elif source_hash is not None and source_hash == script.source_hash:
+            session.state = script.states[state_id]
+        else:
+            # 脚本改过 (或哈希未知)：状态 ID 不再可信，按状态名找回
+            state = script.state(state_name)
+            if state is None:
+                raise SnapshotError(f"脚本已修改，状态 {state_name} 不存在")
+            session.state = state
+        session.is_finished = bool(finished)
+        session.history = [tuple(turn) for turn in history] if history is not None else None
+        return session
+
+    def __repr__(self):
+        state_name = self.state.name if self.state else None
+        return f"<Session state='{state_name}' finished={self.is_finished}>"
@@ -0,0 +1,299 @@
+# 会话存储：热会话放在进程内的 LRU 里，空闲或超出容量的会话序列化后落到 SQLite
+# 下一轮对话访问到落盘的会话时透明恢复；重启后只要数据库文件还在，会话也能接着聊
+# 进程内同时存在的 Session 对象不超过 max_live 个，内存占用与打开的会话总数无关
+# 会话总数是维护出来的计数 (内存里的会话数 + 只在磁盘上的会话数)，统计接口不查数据库
+
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from .registry import default_registry
+from .session import Session
+
+
+class StoredSession:
+    """存储里的一条会话：所属脚本路径 + 会话游标"""
+
+    __slots__ = ('id', 'script_path', 'session', 'last_active', 'pins', 'stale', 'on_disk', 'spilling')
+
+    def __init__(self, session_id, script_path, session, last_active=None, on_disk=False):
+        self.id = session_id
+        self.script_path = script_path
+        self.session = session
+        self.last_active = last_active if last_active is not None else time.time()
+        self.pins = 0  # 正在进行中的轮次数，大于 0 时不会被换出
+        self.stale = False  # 脚本热更新后当前状态已不存在，仍按旧版本脚本执行
+        self.on_disk = on_disk  # 磁盘上是否也有这个会话的快照 (可能是旧的)
+        self.spilling = False  # 正在写盘 (写完之后才从内存里移除)
+
+
+class SessionStore:
+    """
+    两把锁：_lock 保护内存里的 LRU 和计数，持有期间只做内存操作；_db 连接由 _db_lock 保护
+    磁盘读写都在 _lock 之外进行，事件循环只查内存时不会被落盘、恢复的线程卡住
+    """
+
+    def __init__(self, registry=None, max_live=10000, db_path=None):
+        """
+        :param registry: 恢复会话时用来加载脚本的注册表，默认使用 default_registry
+        :param max_live: 进程内最多保留多少个会话，超出后最久没活动的会话落盘
+        :param db_path: SQLite 文件路径；为 None 时使用内存数据库 (落盘的会话只是序列化成字节，重启后丢失)
+        """
+        self.registry = registry if registry is not None else default_registry
+        self.max_live = max_live
+        self.db_path = db_path
+
+        self._live = OrderedDict()  # {会话 ID: StoredSession}，按最近访问排序
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self.spills = 0
+        self.restores = 0
+
+        self._db = sqlite3.connect(db_path or ":memory:", timeout=5, check_same_thread=False, isolation_level=None)
+        if db_path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, script TEXT NOT NULL, "
+                         "snapshot BLOB NOT NULL, updated REAL NOT NULL)")
+        # 只在磁盘上、不在内存里的会话数
+        self._spilled = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    @property
+    def persistent(self):
+        return bool(self.db_path)
+
+    def _query_one(self, sql, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchone()
+
+    # ---------- 读写 ----------
+    def add(self, session_id, script_path, session):
+        """放入一个新会话 (内存里的会话优先于磁盘，同 ID 的旧快照在下次落盘时被覆盖)"""
+        with self._lock:
+            old = self._live.get(session_id)
+            on_disk = old.on_disk if old is not None else None
+        if on_disk is None:
+            on_disk = self._query_one("SELECT 1 FROM sessions WHERE id = ?", (session_id,)) is not None
+        with self._lock:
+            if session_id not in self._live:
+                self._spilled -= on_disk
+            self._live[session_id] = StoredSession(session_id, script_path, session, on_disk=on_disk)
+            self._live.move_to_end(session_id)
+            victims = self._overflow()
+        self._spill(victims)
+
+    def get_live(self, session_id):
+        """只查内存，不会读磁盘；会话不在内存里时返回 None"""
+        with self._lock:
+            entry = self._live.get(session_id)
+            if entry is not None:
+                self._live.move_to_end(session_id)
+            return entry
+
+    def get(self, session_id):
+        """
+        取出会话，落盘的会话会被恢复到内存里 (会读磁盘、可能加载脚本，不要在事件循环线程里调用)
+        :return: StoredSession，不存在时返回 None
+        :raises SnapshotError: 会话已落盘，但脚本改过之后无法恢复
+        :raises SyntaxError: 会话所属的脚本现在解析失败
+        """
+        entry = self.get_live(session_id)
+        if entry is not None:
+            return entry
+
+        row = self._query_one("SELECT script, snapshot, updated FROM sessions WHERE id = ?", (session_id,))
+        if row is None:
+            return None
+        script_path, data, updated = row
+        session = Session.restore(self.registry.get(script_path), data)
+        with self._lock:
+            entry = self._live.get(session_id)
+            if entry is not None:  # 别的线程同时恢复了同一个会话
+                self._live.move_to_end(session_id)
+                return entry
+            entry = self._live[session_id] = StoredSession(session_id, script_path, session, updated, on_disk=True)
+            self._spilled -= 1
+            self.restores += 1
+            victims = self._overflow()
+        self._spill(victims)
+        return entry
+
+    @contextmanager
+    def checkout(self, session_id, restore=True):
+        """
+        在一轮对话期间占用会话：期间不会被换出，结束后刷新活跃时间
+        with store.checkout(sid) as entry: ...   (会话不存在时 entry 为 None)
+        :param restore: 为 False 时只查内存，不在内存里的会话也得到 None
+        """
+        if restore:
+            self.get(session_id)  # 在锁外读盘恢复
+        with self._lock:
+            entry = self.get_live(session_id)
+            if entry is not None:
+                entry.pins += 1
+        try:
+            yield entry
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry.pins -= 1
+                    entry.last_active = time.time()
+
+    def delete(self, session_id):
+        """删除会话 (内存和磁盘)，返回会话是否存在"""
+        with self._lock:
+            existed = self._live.pop(session_id, None) is not None
+        with self._db_lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+        if not existed:
+            with self._lock:
+                self._spilled -= deleted
+        return existed or deleted > 0
+
+    def live(self):
+        """内存里的所有会话 (列表副本)"""
+        with self._lock:
+            return list(self._live.values())
+
+    def __contains__(self, session_id):
+        with self._lock:
+            if session_id in self._live:
+                return True
+        return self._query_one("SELECT 1 FROM sessions WHERE id = ?", (session_id,)) is not None
+
+    # ---------- 落盘 ----------
+    def _write(self, rows):
+        """一个事务里批量写入快照 rows = [(会话 ID, 脚本路径, 快照, 活跃时间)]"""
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sessions (id, script, snapshot, updated) VALUES (?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _persist(self, entries, evict):
+        """
+        三步：持锁序列化 → 不持锁写盘 → 持锁收尾
+        evict 为 True 时把写盘期间没被占用、也没再活动过的会话移出内存，返回移出数量
+        """
+        with self._lock:
+            batch = []
+            for entry in entries:
+                if entry.spilling or self._live.get(entry.id) is not entry or (evict and entry.pins):
+                    continue
+                entry.spilling = True
+                batch.append((entry, entry.last_active, entry.session.snapshot()))
+        if not batch:
+            return 0
+
+        written = False
+        try:
+            self._write([(e.id, e.script_path, data, last_active) for e, last_active, data in batch])
+            written = True
+        finally:
+            removed = 0
+            orphans = []
+            with self._lock:
+                for entry, last_active, _ in batch:
+                    entry.spilling = False
+                    if not written:
+                        continue
+                    if self._live.get(entry.id) is not entry:
+                        orphans.append((entry.id,))  # 写盘期间被删除或过期了，刚写的快照要删掉
+                        continue
+                    entry.on_disk = True
+                    if evict and entry.pins == 0 and entry.last_active == last_active:
+                        del self._live[entry.id]
+                        removed += 1
+                self._spilled += removed
+                self.spills += removed
+            if orphans:
+                with self._db_lock:
+                    self._db.executemany("DELETE FROM sessions WHERE id = ?", orphans)
+        return removed if evict else len(batch)
+
+    def _spill(self, entries):
+        return self._persist(entries, evict=True) if entries else 0
+
+    def _overflow(self):
+        """超出容量时挑出最久没活动的会话 (正在进行轮次或写盘的会话跳过)，调用方持有 _lock，在锁外落盘"""
+        overflow = len(self._live) - self.max_live
+        victims = []
+        if overflow <= 0:
+            return victims
+        for entry in self._live.values():
+            if entry.pins == 0 and not entry.spilling:
+                victims.append(entry)
+                if len(victims) >= overflow:
+                    break
+        return victims
+
+    def spill_idle(self, idle_seconds, chunk=500):
+        """
+        把空闲超过 idle_seconds 的会话落盘，返回落盘数量
+        每 chunk 个会话一个事务；写盘时不持有 _lock，其他线程 (事件循环) 只在序列化一批时短暂等待
+        """
+        cutoff = time.time() - idle_seconds
+        spilled = 0
+        while True:
+            with self._lock:
+                victims = []
+                for entry in self._live.values():
+                    if entry.pins == 0 and not entry.spilling and entry.last_active < cutoff:
+                        victims.append(entry)
+                        if len(victims) >= chunk:
+                            break
+            spilled += self._spill(victims)
+            if len(victims) < chunk:
+                return spilled
+
+    def checkpoint(self):
+        """把内存里的所有会话批量写入磁盘 (仍然留在内存里)，返回写入数量"""
+        return self._persist(self.live(), evict=False)
+
+    def expire(self, max_idle):
+        """彻底删除空闲超过 max_idle 秒的会话 (内存和磁盘)，返回删除数量"""
+        cutoff = time.time() - max_idle
+        with self._lock:
+            stale = {sid for sid, e in self._live.items()
+                     if e.pins == 0 and not e.spilling and e.last_active < cutoff}
+            for sid in stale:
+                del self._live[sid]
+        with self._db_lock:
+            rows = {sid for sid, in self._db.execute("SELECT id FROM sessions WHERE updated < ?", (cutoff,))}
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,))
+        # 还在内存里活跃的会话，磁盘上的旧快照也可能过期，这种只删快照不计数
+        removed = 0
+        with self._lock:
+            for sid in rows:
+                entry = self._live.get(sid)
+                if entry is not None:
+                    entry.on_disk = False
+                elif sid not in stale:
+                    removed += 1
+            self._spilled -= removed
+        return len(stale) + removed
+
+    def close(self, checkpoint=True):
+        """关闭存储；持久化到文件时默认先把内存里的会话全部写盘"""
+        if checkpoint and self.persistent:
+            self.checkpoint()
+        with self._lock:
+            self._live.clear()
+        with self._db_lock:
+            self._db.close()
+
+    # ---------- 统计 ----------
+    def __len__(self):
+        """会话总数 (内存 + 只在磁盘上的)"""
+        return len(self._live) + self._spilled
+
+    @property
+    def stats(self):
+        with self._lock:
+            live = len(self._live)
+        return {"sessions": len(self), "live": live, "spills": self.spills, "restores": self.restores}
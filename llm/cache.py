@@ -0,0 +1,165 @@
+# 意图识别结果缓存：(归一化后的用户输入, 候选元组) -> 命中的候选项
+# 进程内是带 TTL 的 LRU；可选再挂一个 SQLite 文件，重启后仍然有效，多个 worker 也能共享
+# 异步接口 (aget / aput) 只在事件循环上查进程内 LRU，SQLite 的读写放到默认线程池里
+
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# 归一化时去掉的首尾标点 (中英文)
+_PUNCT = " \t\r\n。，、！？!?.,;；:：~～…"
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_input(user_input):
+    """全角转半角、去首尾标点、合并空白、转小写：'我要退款！' 和 '我要退款' 视为同一句"""
+    text = unicodedata.normalize("NFKC", user_input).strip(_PUNCT)
+    return _SPACES.sub(" ", text).lower()
+
+
+class IntentCache:
+    def __init__(self, maxsize=1024, ttl=3600, db_path=None):
+        """
+        :param maxsize: 进程内 LRU 的容量
+        :param ttl: 条目有效期 (秒)，None 表示永不过期
+        :param db_path: SQLite 文件路径，为 None 时只用进程内缓存
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # {key: (intent, 写入时间)}
+        self._lock = threading.Lock()  # 保护 LRU 和计数，持有期间不碰磁盘
+        self._db_lock = threading.Lock()  # 保护 SQLite 连接
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS intents (key TEXT PRIMARY KEY, intent TEXT NOT NULL, created REAL NOT NULL)")
+
+    @staticmethod
+    def make_key(user_input, choices):
+        return normalize_input(user_input), tuple(choices)
+
+    @staticmethod
+    def _disk_key(key):
+        text, choices = key
+        return hashlib.sha1("\x1e".join((text,) + choices).encode("utf-8")).hexdigest()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, user_input, choices):
+        """返回缓存的候选项，未命中返回 None"""
+        key = self.make_key(user_input, choices)
+        now = time.time()
+        intent = self._lookup_memory(key, now)
+        if intent is not None:
+            return intent
+        return self._lookup_disk(key, now)
+
+    async def aget(self, user_input, choices):
+        """get 的 asyncio 版本：进程内 LRU 未命中时到线程池里查 SQLite，不阻塞事件循环"""
+        key = self.make_key(user_input, choices)
+        now = time.time()
+        intent = self._lookup_memory(key, now)
+        if intent is not None:
+            return intent
+        if self._db is None:
+            return self._lookup_disk(key, now)  # 只计一次未命中，不碰磁盘
+        return await asyncio.get_running_loop().run_in_executor(None, self._lookup_disk, key, now)
+
+    def _lookup_memory(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1], now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _lookup_disk(self, key, now):
+        """进程内 LRU 未命中之后：查 SQLite (没有挂 SQLite 时只计一次未命中)；读盘时不持有 _lock"""
+        row = None
+        with self._db_lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT intent, created FROM intents WHERE key = ?", (self._disk_key(key),)).fetchone()
+        with self._lock:
+            # 候选集变化后旧答案可能已经不在候选里了，这种条目当作未命中
+            if row is not None and not self._expired(row[1], now) and row[0] in key[1]:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, user_input, choices, intent):
+        key = self.make_key(user_input, choices)
+        now = time.time()
+        with self._lock:
+            self._remember(key, intent, now)
+        self._store(key, intent, now)
+
+    async def aput(self, user_input, choices, intent):
+        """put 的 asyncio 版本：进程内 LRU 立即更新，SQLite 在线程池里写"""
+        key = self.make_key(user_input, choices)
+        now = time.time()
+        with self._lock:
+            self._remember(key, intent, now)
+        if self._db is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._store, key, intent, now)
+
+    def _store(self, key, intent, created):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO intents (key, intent, created) VALUES (?, ?, ?)",
+                    (self._disk_key(key), intent, created))
+
+    def _remember(self, key, intent, created):
+        self._entries[key] = (intent, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM intents")
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,225 @@
+# 分层意图识别：先用本地的便宜手段，只有在前面各层都拿不准时才请求大模型
+#
+#   keyword     关键词索引，输入里只出现一个候选的关键词时直接采用
+#   cache       之前大模型对同一说法给出的答案 (IntentCache)
+#   ngram       (可选) 字符 n-gram TF-IDF 相似度，NumPy 矩阵运算 (llm/ngram.py)
+#   similarity  (可选) difflib 文本相似度
+#   llm         大模型 (由 LLMClient 负责调用，这里只做统计)
+#
+# 每一层返回 (候选项, 置信度)，置信度达到该层的阈值才算命中；每层的调用次数、命中率和耗时都有统计。
+
+import time
+import difflib
+import threading
+
+from metrics.registry import timer
+from .matcher import get_matcher
+
+_TIER_TIME = timer("intent_tier_seconds", "分层识别中每一层的耗时 (result=hit 命中 / miss 没把握)", ("tier", "result"))
+
+
+class KeywordTier:
+    """关键词层：只命中一个候选时置信度为 1，同时命中多个候选 (例如 "好的，不感兴趣") 时视为有歧义"""
+
+    name = "keyword"
+
+    def __init__(self, threshold=0.9, ambiguous_confidence=0.5):
+        self.threshold = threshold
+        self.ambiguous_confidence = ambiguous_confidence
+
+    def prepare(self, choices):
+        get_matcher(choices)
+
+    def classify(self, user_input, choices):
+        matcher = get_matcher(choices)
+        hits = matcher.hits(user_input)
+        if len(hits) == 1:
+            return hits[0], 1.0
+        if hits:
+            return hits[0], self.ambiguous_confidence
+
+        if matcher.digit_choice is not None and user_input.isdigit():
+            return matcher.digit_choice, 1.0
+        return None, 0.0
+
+
+class CacheTier:
+    """缓存层：复用大模型之前给出的答案"""
+
+    name = "cache"
+
+    def __init__(self, intent_cache, threshold=1.0):
+        self.intent_cache = intent_cache
+        self.threshold = threshold
+
+    def classify(self, user_input, choices):
+        cached = self.intent_cache.get(user_input, choices)
+        return (cached, 1.0) if cached is not None else (None, 0.0)
+
+    async def aclassify(self, user_input, choices):
+        cached = await self.intent_cache.aget(user_input, choices)
+        return (cached, 1.0) if cached is not None else (None, 0.0)
+
+
+class NgramTier:
+    """
+    n-gram 层：字符 n-gram TF-IDF 余弦相似度，每个状态的矩阵在脚本加载时 (prepare) 构建
+    最高分和次高分太接近时置信度只取两者的差距 (TF-IDF 分数整体偏低，按差距打折的结果仍可能越过阈值)
+    """
+
+    name = "ngram"
+
+    def __init__(self, threshold=0.25, min_margin=0.1, ngram_range=(1, 2)):
+        # NumPy 只有启用这一层时才需要
+        from .ngram import get_ngram_index
+        self._get_index = get_ngram_index
+        self.threshold = threshold
+        self.min_margin = min_margin
+        self.ngram_range = ngram_range
+
+    def prepare(self, choices):
+        self._get_index(choices, self.ngram_range)
+
+    def classify(self, user_input, choices):
+        choice, top, margin = self._get_index(choices, self.ngram_range).classify(user_input)
+        confidence = top if margin >= self.min_margin else margin
+        return choice, confidence
+
+
+class SimilarityTier:
+    """
+    相似度层：用 difflib 比较输入和每个 "/" 分隔的别名，取每个候选的最高分
+    最高分和次高分太接近时按差距打折，避免在两个候选之间硬选一个
+    """
+
+    name = "similarity"
+
+    def __init__(self, threshold=0.6, min_margin=0.15):
+        self.threshold = threshold
+        self.min_margin = min_margin
+
+    def classify(self, user_input, choices):
+        scores = []
+        for choice in choices:
+            best = 0.0
+            for alias in choice.split('/'):
+                if alias:
+                    best = max(best, difflib.SequenceMatcher(None, alias, user_input).ratio())
+            scores.append(best)
+        if not scores:
+            return None, 0.0
+
+        ranked = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        top = scores[ranked[0]]
+        margin = top - scores[ranked[1]] if len(ranked) > 1 else top
+        confidence = top if margin >= self.min_margin else top * margin / self.min_margin
+        return choices[ranked[0]], confidence
+
+
+class TierStats:
+    __slots__ = ('calls', 'hits', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.calls if self.calls else 0.0,
+            "avg_ms": self.seconds / self.calls * 1000 if self.calls else 0.0,
+        }
+
+
+class IntentCascade:
+    def __init__(self, tiers):
+        """
+        :param tiers: 按顺序尝试的本地识别层
+        """
+        self.tiers = list(tiers)
+        self._stats = {tier.name: TierStats() for tier in self.tiers}
+        self._stats.setdefault("llm", TierStats())
+        self._lock = threading.Lock()
+
+    def classify(self, user_input, choices):
+        """
+        依次尝试各个本地层
+        :return: (候选项, 命中的层名)；都拿不准时返回 (None, None)，由调用方请求大模型
+        """
+        for tier in self.tiers:
+            t0 = time.perf_counter()
+            choice, confidence = tier.classify(user_input, choices)
+            hit = choice is not None and confidence >= tier.threshold
+            self.record(tier.name, hit, time.perf_counter() - t0)
+            if hit:
+                return choice, tier.name
+        return None, None
+
+    async def aclassify(self, user_input, choices):
+        """classify 的 asyncio 版本：有 aclassify 的层 (要读磁盘的缓存层) 不阻塞事件循环"""
+        for tier in self.tiers:
+            t0 = time.perf_counter()
+            if hasattr(tier, "aclassify"):
+                choice, confidence = await tier.aclassify(user_input, choices)
+            else:
+                choice, confidence = tier.classify(user_input, choices)
+            hit = choice is not None and confidence >= tier.threshold
+            self.record(tier.name, hit, time.perf_counter() - t0)
+            if hit:
+                return choice, tier.name
+        return None, None
+
+    def prepare_script(self, script):
+        """脚本加载时为每个状态预先构建各层需要的索引，避免第一轮对话时才构建"""
+        preparers = [tier.prepare for tier in self.tiers if hasattr(tier, "prepare")]
+        for state in script.states:
+            if state.options:
+                for prepare in preparers:
+                    prepare(state.options)
+
+    def record(self, tier_name, hit, seconds):
+        _TIER_TIME.observe(seconds, tier_name, "hit" if hit else "miss")
+        with self._lock:
+            stats = self._stats.get(tier_name)
+            if stats is None:
+                stats = self._stats[tier_name] = TierStats()
+            stats.calls += 1
+            stats.hits += hit
+            stats.seconds += seconds
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {name: s.as_dict() for name, s in self._stats.items()}
+
+
+TIER_TYPES = {
+    "keyword": KeywordTier,
+    "ngram": NgramTier,
+    "similarity": SimilarityTier,
+}
+
+
+def build_cascade(spec, intent_cache=None, thresholds=None):
+    """
+    按配置字符串构建，例如 "keyword,cache,ngram"
+    :param thresholds: {层名: 置信度阈值}，覆盖各层的默认值
+    """
+    thresholds = thresholds or {}
+    tiers = []
+    for name in (part.strip() for part in spec.split(",")):
+        if not name:
+            continue
+        if name == "cache":
+            if intent_cache is not None:
+                tiers.append(CacheTier(intent_cache))
+        elif name in TIER_TYPES:
+            tier = TIER_TYPES[name]()
+            if thresholds.get(name) is not None:
+                tier.threshold = thresholds[name]
+            tiers.append(tier)
+        else:
+            raise ValueError(f"未知的识别层: {name}")
+    return IntentCascade(tiers)
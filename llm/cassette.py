@@ -0,0 +1,109 @@
+# 大模型调用的录制 / 回放 ("磁带")
+# 以 (模型, messages, max_tokens) 为键保存每次 chat 的回复，回放时直接返回录好的回复、不发网络请求，
+# 真实模式的回归测试可以离线、以接近测试桩的速度重放模型真实做出的判断
+#
+# 磁带文件是 JSON Lines，每行一次调用，只追加写 (同一个键重复录制时后写的生效)，方便 review 和 diff
+#
+# 三种模式：
+#   record      - 每次都请求大模型，并把回复录下来 (覆盖旧的)
+#   replay      - 只回放，磁带里没有的调用抛 CassetteMiss
+#   passthrough - 有就回放，没有的请求大模型并补录
+
+import os
+import json
+import hashlib
+import threading
+
+from metrics.registry import counter
+
+MODES = ("record", "replay", "passthrough")
+
+_CALLS = counter("llm_cassette_total", "经过磁带的大模型调用数 "
+                 "(result=hit 回放命中 / miss 回放未命中 / recorded 新录制)", ("result",))
+
+
+class CassetteMiss(LookupError):
+    """回放模式下磁带里没有这次调用"""
+
+
+def cassette_key(data):
+    """
+    :param data: chat completions 的请求体
+    :return: 请求体里决定回复内容的部分 (模型、messages、max_tokens) 的摘要
+    """
+    fields = [data["model"], data["messages"], data.get("max_tokens")]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path, mode="replay"):
+        """
+        :param path: 磁带文件 (.jsonl)，不存在时在第一次录制时创建
+        :param mode: record / replay / passthrough
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的磁带模式: {mode} (可选 {' / '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self._entries = {}  # {key: 回复文本}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, data):
+        """
+        :return: 录好的回复；需要请求大模型时返回 None
+        :raises CassetteMiss: replay 模式下没有录过这次调用
+        """
+        if self.mode == "record":
+            return None
+        key = cassette_key(data)
+        response = self._entries.get(key)
+        if response is not None:
+            self.hits += 1
+            _CALLS.inc("hit")
+            return response
+        self.misses += 1
+        _CALLS.inc("miss")
+        if self.mode == "replay":
+            prompt = data["messages"][-1]["content"]
+            raise CassetteMiss(f"磁带 {os.path.basename(self.path)} 里没有这次调用 "
+                               f"(模型 {data['model']}，提示词: {prompt[:80]!r})，先用 record / passthrough 模式录制")
+        return None
+
+    def record(self, data, response):
+        """录下一次成功的调用 (失败的调用不录，回放时同样会走降级)"""
+        if self.mode == "replay" or response is None:
+            return
+        key = cassette_key(data)
+        line = json.dumps({"key": key, "model": data["model"], "messages": data["messages"],
+                           "max_tokens": data.get("max_tokens"), "response": response}, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+        _CALLS.inc("recorded")
+
+    @property
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def cassette_from_env():
+    """LLM_CASSETTE 指向磁带文件时按 LLM_CASSETTE_MODE (默认 replay) 打开，否则返回 None"""
+    path = os.getenv("LLM_CASSETTE")
+    if not path:
+        return None
+    return Cassette(path, os.getenv("LLM_CASSETTE_MODE", "replay").lower())
@@ -0,0 +1,235 @@
+# 对冲请求：第一个请求在 "近期延迟的第 p 百分位" 内还没返回时，再发一个相同的请求
+# (可以发往备用地址/备用模型)，谁先给出能映射到候选项的答案就用谁，另一个取消。
+# 用少量额外请求换取更短的长尾延迟；发出的对冲请求数和胜出次数都有统计，用于调整百分位。
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+
+from .transport import CancelToken
+
+
+class LatencyTracker:
+    """最近 N 次请求的延迟，用于估计对冲的触发时间"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgePolicy:
+    def __init__(self, percentile=95, initial_delay=1.0, min_delay=0.05, min_samples=20):
+        """
+        :param percentile: 主请求超过近期延迟的这个百分位还没返回时发出对冲请求
+        :param initial_delay: 样本不足时使用的固定触发时间 (秒)
+        :param min_delay: 触发时间的下限 (秒)，避免延迟很低时几乎每个请求都被对冲
+        :param min_samples: 至少积累多少个样本后才按百分位计算
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+
+        self.calls = 0  # 经过对冲逻辑的调用数
+        self.hedges_sent = 0  # 额外发出的对冲请求数
+        self.hedge_wins = 0  # 对冲请求先给出有效答案的次数
+        self.primary_wins = 0  # 已经发出对冲、但主请求仍然先给出有效答案的次数
+
+    def delay(self):
+        if len(self.latency) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    @property
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "extra_request_rate": self.hedges_sent / self.calls if self.calls else 0.0,
+            "delay": self.delay(),
+        }
+
+
+class _Timer:
+    """一个后台线程按时间执行回调 (对冲请求的触发)，不必每次调用都占一个线程等待"""
+
+    def __init__(self):
+        self._heap = []  # [执行时间, 序号, 回调]，取消时把回调置为 None
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay, fn):
+        entry = [time.monotonic() + delay, next(self._seq), fn]
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():  # fork 之后线程不存在了
+                self._thread = threading.Thread(target=self._run, name="llm-hedge-timer", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+        return entry
+
+    @staticmethod
+    def cancel(entry):
+        entry[2] = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                wait_for = self._heap[0][0] - time.monotonic()
+                if wait_for > 0:
+                    self._cond.wait(wait_for)
+                    continue
+                fn = heapq.heappop(self._heap)[2]
+            if fn is not None:
+                fn()
+
+
+_timer = _Timer()
+
+
+class _SyncRace:
+    """一次同步的对冲：主请求在调用线程里执行，对冲请求 (如果发出) 在线程池里执行"""
+
+    __slots__ = ('is_valid', 'primary_token', 'hedge_token', 'hedge', '_lock', '_decided', '_primary_done')
+
+    def __init__(self, is_valid):
+        self.is_valid = is_valid
+        self.primary_token = CancelToken()
+        self.hedge_token = CancelToken()
+        self.hedge = None  # 对冲请求的 Future
+        self._lock = threading.Lock()
+        self._decided = False  # 已经有一方给出了有效答案
+        self._primary_done = False
+
+    def decide(self):
+        """给出有效答案的一方调用：返回自己是否是第一个"""
+        with self._lock:
+            first, self._decided = not self._decided, True
+        return first
+
+    def send_hedge(self, policy, executor, secondary):
+        """触发时间到了 (在定时线程里调用)：主请求还没返回就发出对冲请求"""
+        with self._lock:
+            if self._decided or self._primary_done:
+                return
+            policy.count("hedges_sent")
+            self.hedge = executor.submit(self._run_hedge, secondary)
+
+    def _run_hedge(self, secondary):
+        result = secondary(self.hedge_token)
+        if self.is_valid(result) and self.decide():
+            self.primary_token.cancel()  # 关闭主请求的连接，调用线程随即返回
+        return result
+
+    def primary_done(self):
+        """主请求返回了：不再发出对冲请求，返回已经发出的那个 (没有时为 None)"""
+        with self._lock:
+            self._primary_done = True
+            return self.hedge
+
+
+def hedged_call(policy, executor, primary, secondary, is_valid):
+    """
+    同步版本：主请求直接在调用线程里执行，超过触发时间还没返回时才把对冲请求提交到线程池，
+    绝大多数不需要对冲的调用不经过线程池
+    一方先给出有效答案后，另一方的连接被关闭 (线程里的阻塞读取随即出错返回)
+    :param primary: primary(cancel) -> 结果，cancel 是 CancelToken
+    :param secondary: secondary(cancel) -> 结果
+    """
+    policy.count("calls")
+    race = _SyncRace(is_valid)
+    timer = _timer.call_later(policy.delay(), lambda: race.send_hedge(policy, executor, secondary))
+    t0 = time.perf_counter()
+    try:
+        result = primary(race.primary_token)
+    except BaseException:
+        race.decide()
+        race.hedge_token.cancel()
+        raise
+    finally:
+        _timer.cancel(timer)
+        hedge = race.primary_done()
+    if not race.primary_token.cancelled:
+        # 被取消的主请求不计入样本，否则延迟估计会偏低
+        policy.latency.add(time.perf_counter() - t0)
+    if hedge is None:
+        return result
+
+    if is_valid(result) and race.decide():
+        race.hedge_token.cancel()
+        policy.count("primary_wins")
+        return result
+    hedge_result = hedge.result()
+    if is_valid(hedge_result):
+        policy.count("hedge_wins")
+        return hedge_result
+    return result or hedge_result
+
+
+async def hedged_call_async(policy, primary, secondary, is_valid):
+    """
+    asyncio 版本：落败的请求会被取消，它占用的连接直接关闭
+    :param primary: 无参协程函数
+    :param secondary: 无参协程函数
+    """
+    policy.count("calls")
+
+    async def timed_primary():
+        t0 = time.perf_counter()
+        result = await primary()
+        # 被取消的主请求不计入样本，否则延迟估计会偏低
+        policy.latency.add(time.perf_counter() - t0)
+        return result
+
+    first = asyncio.ensure_future(timed_primary())
+    pending = {first}
+    fallback = None
+    # 调用方被取消 (或者出错) 时，还没结束的请求一并取消，不留下孤儿任务
+    try:
+        done, _ = await asyncio.wait(pending, timeout=policy.delay())
+        if done:
+            return first.result()
+
+        policy.count("hedges_sent")
+        second = asyncio.ensure_future(secondary())
+        pending.add(second)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if is_valid(result):
+                    policy.count("hedge_wins" if task is second else "primary_wins")
+                    return result
+                fallback = fallback or result
+        return fallback
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,23 +1,39 @@
 # llm/intent_recognizer.py
 from .wrapper import get_llm_client
+from .prompts import build_intent_messages, parse_index_answer
 
 class IntentRecognizer:
     def __init__(self, llm_client=None):
         self.client = llm_client if llm_client else get_llm_client()
 
-    def recognize(self, user_input, candidates):
-        if self.client.__class__.__name__ == 'LLMStub':
-            return self.client.chat(user_input)
+    @staticmethod
+    def _prompt(user_input, candidates):
+        # 大模型模式：候选项编号列出并附上描述，模型只回答编号
+        labels = [f"{c['intent']}：{c['desc']}" for c in candidates]
+        return build_intent_messages(user_input, labels)
 
-        # 大模型模式：加入详细描述
-        options = "\n".join([f"- {c['intent']}: {c['desc']}" for c in candidates])
-        prompt = (
-            f"你是一个意图识别专家。用户输入: \"{user_input}\"\n"
-            f"候选列表:\n{options}\n"
-            f"请只返回最匹配的意图代码单词。不匹配返回 'unknown'。"
-        )
-        res = self.client.chat(prompt)
+    @staticmethod
+    def _parse(res, candidates):
+        if not res: return "unknown"
+        match = parse_index_answer(res, [c['intent'] for c in candidates])
+        if match is not None: return match
+        # 模型没有按编号作答时，退回到在回复里找意图代码
         clean_res = res.lower().strip().replace("'", "").replace('"', "")
         for c in candidates:
             if c['intent'].lower() in clean_res: return c['intent']
-        return "unknown"
\ No newline at end of file
+        return "unknown"
+
+    def recognize(self, user_input, candidates):
+        if self.client.__class__.__name__ == 'LLMStub':
+            return self.client.chat(user_input)
+
+        res = self.client.chat(self._prompt(user_input, candidates), max_tokens=self.client.intent_max_tokens)
+        return self._parse(res, candidates)
+
+    async def recognize_async(self, user_input, candidates):
+        """recognize 的 asyncio 版本"""
+        if self.client.__class__.__name__ == 'LLMStub':
+            return await self.client.achat(user_input)
+
+        res = await self.client.achat(self._prompt(user_input, candidates), max_tokens=self.client.intent_max_tokens)
+        return self._parse(res, candidates)
\ No newline at end of file
@@ -0,0 +1,99 @@
+# 关键词多模式索引：替代 _local_stub_match 里 "逐个候选 split + 逐个关键词 in" 的循环
+#
+# 每组候选项 (一个状态的全部跳转描述) 只构建一次索引：把所有 "/" 分隔的关键词
+# 合并成一棵前缀树，再展开成一条正则。匹配时只扫描输入一遍，返回最左、最长的命中，
+# 所以 "不感兴趣" 不会被它的子串 "感兴趣" 抢走。
+# (纯 Python 写的 Aho-Corasick 自动机在这里反而比 C 实现的正则引擎慢 3 倍左右)
+
+import re
+from functools import lru_cache
+
+
+def _trie_pattern(node):
+    """把前缀树展开成正则：同一层的分支首字符互不相同，可选的后缀用贪婪的 ?，天然是最长匹配"""
+    terminal = '' in node
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if terminal:
+        # 已经是一个完整关键词：后缀可选，先尝试更长的
+        return '(?:' + body + ')?' if len(branches) == 1 else body + '?'
+    return body
+
+
+class KeywordMatcher:
+    """一组候选项的关键词索引 (只读，可以在线程之间共享)"""
+
+    __slots__ = ('choices', 'owner', 'pattern', 'digit_choice')
+
+    def __init__(self, choices):
+        self.choices = tuple(choices)
+
+        # 关键词 -> 候选项；同一个关键词出现在多个候选里时，排在前面的候选优先
+        self.owner = {}
+        for choice in self.choices:
+            for kw in choice.split('/'):
+                if kw:
+                    self.owner.setdefault(kw, choice)
+
+        trie = {}
+        for kw in self.owner:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.pattern = re.compile(_trie_pattern(trie)) if self.owner else None
+
+        # 数字特判：纯数字输入 (例如订单号) 归到第一个和订单相关的候选
+        self.digit_choice = next((c for c in self.choices if "订单" in c or "单号" in c), None)
+
+    def find(self, user_input):
+        """
+        返回最左最长的关键词命中 (候选项, 起点, 终点)，没有命中返回 None
+        """
+        if self.pattern is None:
+            return None
+        m = self.pattern.search(user_input)
+        if m is None:
+            return None
+        return self.owner[m.group()], m.start(), m.end()
+
+    def hits(self, user_input):
+        """
+        输入中命中的所有候选项 (按命中位置排序，去重)
+        匹配互不重叠，所以 "不感兴趣" 只算一次命中，不会顺带算上 "感兴趣"
+        """
+        if self.pattern is None:
+            return []
+        owner = self.owner
+        return list(dict.fromkeys(owner[m.group()] for m in self.pattern.finditer(user_input)))
+
+    def match(self, user_input):
+        """返回命中的候选项，没有命中返回 None"""
+        if self.pattern is not None:
+            m = self.pattern.search(user_input)
+            if m is not None:
+                return self.owner[m.group()]
+
+        if self.digit_choice is not None and user_input.isdigit():
+            return self.digit_choice
+        return None
+
+    def __repr__(self):
+        return f"<KeywordMatcher choices={len(self.choices)} keywords={len(self.owner)}>"
+
+
+@lru_cache(maxsize=4096)
+def _cached_matcher(choices):
+    return KeywordMatcher(choices)
+
+
+def get_matcher(choices):
+    """
+    获取候选项对应的索引 (按候选元组缓存，同一个状态只构建一次)
+    编译后的脚本传进来的本来就是元组，列表会先转换一下
+    """
+    if not isinstance(choices, tuple):
+        choices = tuple(choices)
+    return _cached_matcher(choices)
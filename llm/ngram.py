@@ -0,0 +1,114 @@
+# 字符 n-gram TF-IDF 相似度索引 (NumPy)
+#
+# 每组候选项 (一个状态的全部跳转描述) 构建一个矩阵：每行是一个 "/" 分隔的别名的 TF-IDF 向量，已做 L2 归一化。
+# 运行时把用户输入转成同一词表下的向量，一次矩阵-向量乘法得到所有别名的余弦相似度，
+# 再按候选取最大值。可以在没有关键词命中时接住 "网络断了" -> "无法上网/没网" 这类改写。
+
+import math
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from .cache import normalize_input
+
+# 单字 n-gram 里不计入的虚词，它们几乎不携带意图信息
+STOP_CHARS = frozenset("的了吗呢吧啊呀哦嘛我你他她它是在")
+_SKIP_CHARS = frozenset(" \t\r\n。，、！？!?.,;；:：~～…\"'“”‘’()（）")
+
+# 词表外的 n-gram 仍然计入输入向量的模长 (权重 1)，否则只要沾上一个字就会得到很高的分数
+OOV_WEIGHT = 1.0
+
+
+def char_ngrams(text, ngram_range=(1, 2)):
+    """
+    :return: Counter {n-gram: 次数}
+    """
+    text = "".join(ch for ch in normalize_input(text) if ch not in _SKIP_CHARS)
+    grams = Counter()
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            if n == 1 and gram in STOP_CHARS:
+                continue
+            grams[gram] += 1
+    return grams
+
+
+class NgramIndex:
+    """一组候选项的 TF-IDF 矩阵 (只读，可以在线程之间共享)"""
+
+    __slots__ = ('choices', 'ngram_range', 'vocab', 'idf', 'matrix', 'offsets')
+
+    def __init__(self, choices, ngram_range=(1, 2)):
+        self.choices = tuple(choices)
+        self.ngram_range = ngram_range
+
+        # 每个候选展开成若干别名文档，offsets[i] 是第 i 个候选的第一行
+        docs, offsets = [], []
+        for choice in self.choices:
+            offsets.append(len(docs))
+            aliases = [alias for alias in choice.split('/') if alias] or [choice]
+            docs.extend(char_ngrams(alias, ngram_range) for alias in aliases)
+        self.offsets = np.array(offsets, dtype=np.intp)
+
+        df = Counter(gram for doc in docs for gram in doc)
+        self.vocab = {gram: i for i, gram in enumerate(df)}
+        # 平滑 IDF：ln((1 + N) / (1 + df)) + 1
+        self.idf = np.array([math.log((1 + len(docs)) / (1 + df[g])) + 1 for g in self.vocab])
+
+        matrix = np.zeros((len(docs), len(self.vocab)))
+        for row, doc in enumerate(docs):
+            for gram, count in doc.items():
+                matrix[row, self.vocab[gram]] = count
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+    def scores(self, user_input):
+        """每个候选的相似度 (取该候选所有别名中的最高分)"""
+        if not self.choices:
+            return np.zeros(0)
+
+        query = np.zeros(len(self.vocab))
+        oov = 0.0
+        for gram, count in char_ngrams(user_input, self.ngram_range).items():
+            col = self.vocab.get(gram)
+            if col is None:
+                oov += (count * OOV_WEIGHT) ** 2
+            else:
+                query[col] = count * self.idf[col]
+        norm = math.sqrt(float(query @ query) + oov)
+        if norm == 0:
+            return np.zeros(len(self.choices))
+
+        alias_scores = self.matrix @ query / norm
+        return np.maximum.reduceat(alias_scores, self.offsets)
+
+    def classify(self, user_input):
+        """
+        :return: (最相似的候选, 分数, 与第二名的差距)
+        """
+        scores = self.scores(user_input)
+        if scores.size == 0:
+            return None, 0.0, 0.0
+        best = int(scores.argmax())
+        top = float(scores[best])
+        if scores.size == 1:
+            return self.choices[best], top, top
+        second = float(np.partition(scores, -2)[-2])
+        return self.choices[best], top, top - second
+
+
+@lru_cache(maxsize=4096)
+def _cached_index(choices, ngram_range):
+    return NgramIndex(choices, ngram_range)
+
+
+def get_ngram_index(choices, ngram_range=(1, 2)):
+    """获取候选项对应的索引 (按候选元组缓存，同一个状态只构建一次)"""
+    if not isinstance(choices, tuple):
+        choices = tuple(choices)
+    return _cached_index(choices, ngram_range)
@@ -0,0 +1,92 @@
+# 意图识别的提示词构造、答案解析与 token 统计
+#
+# - 候选项编号列出，模型只需要回答一个编号，输出长度用 max_tokens 卡在几个 token 以内；
+# - 固定不变的说明放在 system 消息里、候选项在前、用户输入在最后，同一状态的请求前缀完全相同，
+#   服务商的前缀缓存 (prompt caching) 可以命中；
+# - 每次调用的 usage (含缓存命中的 token 数) 累计到 TokenStats 里。
+
+import re
+import threading
+
+INTENT_SYSTEM_PROMPT = (
+    "你是对话系统的意图分类器。根据用户输入，从编号候选中选出最匹配的一项，"
+    "只回答该项的编号数字；都不匹配时回答 0。不要输出任何其他内容。"
+)
+
+# 单条意图识别的输出上限：一个编号只需要一两个 token，留一点余量
+INTENT_MAX_TOKENS = 4
+
+# 编号后面允许跟的一个标点，"2" "2." "2、" "2)" "2。" 都算只回答了编号
+INDEX_SUFFIXES = ".、)）。"
+# 整个回复基本上只有一个编号时才按编号解析，候选项原文里的数字 ("升级5G套餐") 不会被当成编号
+_INDEX = re.compile(rf"\s*(\d+)\s*[{re.escape(INDEX_SUFFIXES)}]?\s*")
+
+
+def format_options(labels):
+    """['查快递', '退货'] -> '1) 查快递\n2) 退货'"""
+    return "\n".join(f"{i}) {label}" for i, label in enumerate(labels, 1))
+
+
+def build_intent_messages(user_input, labels, system_prompt=INTENT_SYSTEM_PROMPT):
+    """
+    :param labels: 展示给模型的候选项文字 (与解析时的候选项一一对应)
+    :return: chat completions 的 messages 列表
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"候选:\n{format_options(labels)}\n用户输入: {user_input}"},
+    ]
+
+
+def parse_index_answer(reply, choices):
+    """
+    把模型回答的编号映射回候选项
+    回复不是单独一个编号 (模型没按要求作答，或者复述了候选项)、或者编号越界时，退回到在回复里查找候选项原文
+    :return: 候选项；回答 0 或者什么都没找到时返回 None
+    """
+    if not reply:
+        return None
+    m = _INDEX.fullmatch(reply)
+    if m is not None:
+        index = int(m.group(1))
+        if index == 0:
+            return None
+        if index <= len(choices):
+            return choices[index - 1]
+    return next((choice for choice in choices if choice in reply), None)
+
+
+class TokenStats:
+    """累计每次大模型调用的 token 用量 (多个线程 / 协程共用一个实例)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # 命中服务商前缀缓存的提示词 token 数
+
+    def record(self, usage):
+        """
+        :param usage: 响应里的 usage 字段，服务商没返回时为 None
+        """
+        usage = usage or {}
+        details = usage.get("prompt_tokens_details") or {}
+        # OpenAI 放在 prompt_tokens_details.cached_tokens，DeepSeek 用 prompt_cache_hit_tokens
+        cached = details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+            self.cached_tokens += cached
+
+    @property
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "avg_prompt_tokens": self.prompt_tokens / self.calls if self.calls else 0.0,
+            "avg_completion_tokens": self.completion_tokens / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,247 @@
+# 调用大模型前的限流：请求数 / token 数两个令牌桶 + 按优先级排队
+#
+# 服务商按每分钟请求数 (RPM) 和 token 数 (TPM) 限额。以前每轮对话直接发请求，突发流量换来一串 429，
+# 再进入重试循环。现在同一地址的所有客户端 (同一进程内) 共用一个限流器：
+# - 令牌桶按配额匀速补充，桶里不够时请求在本地排队，而不是打到服务端被拒；
+# - 队列按优先级出队，线上对话 (INTERACTIVE) 总是排在批量回归 (BATCH) 前面，同优先级先来先服务；
+# - 请求结束后按响应里的实际 token 用量校正预估值；收到 429 时按 Retry-After 暂停放行。
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+
+class RateLimitExceeded(Exception):
+    """排队超时或者队列已满，请求被限流器拒绝"""
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'level', 'updated')
+
+    def __init__(self, per_minute, burst=None):
+        """
+        :param per_minute: 每分钟补充的令牌数
+        :param burst: 桶容量 (允许的突发量)，默认 5 秒的配额
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1.0, self.rate * 5))
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        """还要等多久才够取出 amount 个令牌；超过桶容量的请求只要求桶是满的"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount):
+        # 允许透支，透支的部分由后面的请求等待补齐
+        self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'tokens', 'event', 'loop', 'cancelled')
+
+    def __init__(self, priority, seq, tokens, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = loop  # 异步等待者所在的事件循环
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            # 可能在别的线程里被唤醒
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_queue=256):
+        """
+        :param requests_per_minute: 每分钟请求数配额，0 表示不限
+        :param tokens_per_minute: 每分钟 token 数配额，0 表示不限
+        :param max_queue: 最多排队的请求数，再多直接拒绝
+        """
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_queue = max_queue
+        self._queue = []  # 等待者的小顶堆 (优先级, 到达顺序)
+        self._depth = 0  # 排队中 (未取消) 的等待者数
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.blocked_until = 0.0  # 收到 429 后暂停放行到这个时间点
+
+        self.granted = 0
+        self.rejected = 0  # 队列已满或者排队超时被拒绝的请求数
+        self.throttled = 0  # 服务端仍然返回 429 的次数
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ---------- 排队 ----------
+    def _enqueue(self, priority, tokens, loop):
+        with self._lock:
+            if self._depth >= self.max_queue:
+                self.rejected += 1
+                raise RateLimitExceeded(f"限流队列已满 ({self.max_queue})")
+            waiter = _Waiter(priority, next(self._seq), tokens, loop)
+            heapq.heappush(self._queue, waiter)
+            self._depth += 1
+            return waiter
+
+    def _head(self):
+        # _head / _try_grant 需要在持有 self._lock 时调用
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0] if self._queue else None
+
+    def _try_grant(self, waiter):
+        """
+        :return: 0 表示已放行；正数表示排在队首但还要等这么久；None 表示前面还有人
+        """
+        if self._head() is not waiter:
+            return None
+        now = time.monotonic()
+        wait = self.blocked_until - now
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(waiter.tokens, now))
+        if wait > 0:
+            return wait
+
+        if self._requests is not None:
+            self._requests.take(1)
+        if self._tokens is not None:
+            self._tokens.take(waiter.tokens)
+        heapq.heappop(self._queue)
+        self._depth -= 1
+        head = self._head()
+        if head is not None:
+            head.wake()
+        return 0
+
+    def _granted(self, waited):
+        with self._lock:
+            self.granted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def _abandon(self, waiter, reject=True):
+        with self._lock:
+            was_head = self._head() is waiter
+            waiter.cancelled = True
+            self._depth -= 1
+            if reject:
+                self.rejected += 1
+            if was_head:
+                head = self._head()
+                if head is not None:
+                    head.wake()
+
+    @staticmethod
+    def _sleep_time(wait, remaining):
+        """下一次等待多久：排在队首时等令牌补足，否则等前面的人唤醒；不会超过剩余的排队时间"""
+        if remaining is None:
+            return wait
+        return remaining if wait is None else min(wait, remaining)
+
+    # ---------- 对外接口 ----------
+    def acquire(self, priority=INTERACTIVE, tokens=0, timeout=None):
+        """
+        阻塞直到放行
+        :param tokens: 这次请求预计消耗的 token 数
+        :param timeout: 最多排队多久 (秒)，None 表示一直等
+        :return: 实际排队时间 (秒)
+        :raise RateLimitExceeded: 队列已满，或者在 timeout 内等不到
+        """
+        t0 = time.monotonic()
+        waiter = self._enqueue(priority, tokens, None)
+        while True:
+            with self._lock:
+                wait = self._try_grant(waiter)
+            if wait == 0:
+                return self._granted(time.monotonic() - t0)
+            remaining = None if timeout is None else t0 + timeout - time.monotonic()
+            # 排在队首、而且已经知道在剩余时间内等不到的，直接放弃
+            if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                self._abandon(waiter)
+                raise RateLimitExceeded(f"排队超过 {timeout:.2f}s")
+            waiter.event.wait(self._sleep_time(wait, remaining))
+            waiter.event.clear()
+
+    async def acquire_async(self, priority=INTERACTIVE, tokens=0, timeout=None):
+        """acquire 的 asyncio 版本，排队时不占用线程"""
+        t0 = time.monotonic()
+        waiter = self._enqueue(priority, tokens, asyncio.get_running_loop())
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_grant(waiter)
+                if wait == 0:
+                    return self._granted(time.monotonic() - t0)
+                remaining = None if timeout is None else t0 + timeout - time.monotonic()
+                if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                    self._abandon(waiter)
+                    raise RateLimitExceeded(f"排队超过 {timeout:.2f}s")
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), self._sleep_time(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except asyncio.CancelledError:
+            self._abandon(waiter, reject=False)
+            raise
+
+    def settle(self, estimated, actual):
+        """请求结束后，用响应里的实际 token 数校正放行时的预估值"""
+        if self._tokens is None or actual is None:
+            return
+        with self._lock:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated - actual)
+
+    def penalize(self, retry_after=None):
+        """服务端仍然返回了 429：在 Retry-After (默认 1 秒) 内不再放行任何请求"""
+        with self._lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + (retry_after or 1.0))
+
+    @property
+    def stats(self):
+        return {
+            "queue_depth": self._depth,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+# 同一个服务端地址的所有客户端共用一个限流器 (配额是按账号/地址算的)
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_url, requests_per_minute=0, tokens_per_minute=0):
+    """两个配额都为 0 时不限流，返回 None"""
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(api_url)
+        if limiter is None:
+            limiter = _limiters[api_url] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return limiter
@@ -0,0 +1,136 @@
+# 调用大模型的容错策略：单轮时间预算、指数退避 + 抖动、可重试/致命错误区分、熔断器
+#
+# 服务商故障时，原来的 "固定 1.5s 间隔重试 3 次、每次 60s 超时" 会让一轮对话卡住数分钟。
+# 现在每轮有总的时间预算；连续失败达到阈值后熔断器打开，后续请求直接走本地匹配，
+# 冷却期过后放行一个探测请求，成功则恢复，失败则继续熔断。
+
+import time
+import random
+import asyncio
+import threading
+import http.client
+
+from .transport import HTTPStatusError
+
+# 这些状态码说明服务端暂时不可用，值得重试；其余 4xx (鉴权失败、参数错误等) 重试也没用
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+def is_retryable(error):
+    """区分可重试错误 (超时、连接问题、限流、5xx) 和致命错误 (鉴权失败、响应格式不对等)"""
+    if isinstance(error, HTTPStatusError):
+        return error.status in RETRYABLE_STATUS or error.status >= 500
+    # OSError 覆盖了超时、连接被拒/被重置、TLS 错误等；EOFError 是连接中途断开
+    return isinstance(error, (OSError, EOFError, asyncio.TimeoutError, http.client.HTTPException))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.25, max_delay=4.0):
+        """
+        :param max_attempts: 最多尝试次数 (含第一次)
+        :param base_delay: 第一次重试前的退避上限 (秒)，之后每次翻倍
+        :param max_delay: 单次退避的最大值 (秒)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        """第 attempt 次重试前等待的时间 (attempt 从 1 开始)，full jitter：在 [0, 上限] 内均匀随机"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class Deadline:
+    """一轮对话的总时间预算"""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, budget):
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        """
+        :param failure_threshold: 连续失败多少次后熔断
+        :param recovery_timeout: 熔断多久之后放行一个探测请求 (秒)
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.rejected = 0  # 熔断期间被直接拒绝的请求数
+        self.trips = 0  # 熔断次数
+
+    def allow_request(self):
+        """当前是否可以请求服务端；半开状态下只放行一个探测请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """
+        请求没有得出结论就结束了 (被取消，例如对冲请求里输掉的一方)：归还探测名额，
+        否则半开状态会一直认为有探测请求在路上，之后的请求全部被拒绝
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self._probe_in_flight = False
+
+    @property
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected, "trips": self.trips}
+
+
+# 同一个服务端地址的所有客户端共用一个熔断器
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(api_url, failure_threshold=5, recovery_timeout=30.0):
+    with _breakers_lock:
+        breaker = _breakers.get(api_url)
+        if breaker is None:
+            breaker = _breakers[api_url] = CircuitBreaker(failure_threshold, recovery_timeout)
+        return breaker
@@ -0,0 +1,108 @@
+# 流式 (stream: true) chat completions 的解析与提前结束判断
+#
+# OpenAI 兼容接口的流式响应是 SSE：每个事件是一行 "data: {json}"，事件之间空一行，最后是 "data: [DONE]"。
+# 意图识别只关心模型选了哪一项，累计的文本一旦只可能对应一个候选项 (或者明确回答了 0)，
+# 就不再等后续 token，直接断开连接。
+
+import re
+import json
+
+from .prompts import INDEX_SUFFIXES
+
+# 以编号开头的回复 (与 prompts.parse_index_answer 的规则一致)：编号，以及它后面紧跟的第一个字符
+_LEADING_INDEX = re.compile(r"\s*(\d+)(\S?)")
+
+
+def parse_sse_line(line):
+    """
+    解析 SSE 的一行
+    :param line: bytes 或 str
+    :return: data 字段的内容；不是 data 行 (注释、event/id 字段、空行) 时返回 None
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.rstrip("\r\n")
+    if not line.startswith("data:"):
+        return None
+    data = line[5:]
+    return data[1:] if data.startswith(" ") else data
+
+
+def parse_stream_event(data):
+    """
+    :param data: 一个 data 字段的内容
+    :return: (本次增量文本, usage)；流结束标记 [DONE] 返回 None
+    """
+    if data.strip() == "[DONE]":
+        return None
+    event = json.loads(data)
+    choices = event.get("choices") or [{}]
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or "", event.get("usage")
+
+
+def is_decided(text, choices):
+    """
+    累计的回复文本是否已经能确定答案，确定后就可以停止读取
+    - 编号：回复以编号开头，后面已经出现了编号结尾的标点，或者编号在范围内、再多一位就越界 (例如只有 3 个候选时的 "2")；
+      回答 0 也算确定 (都不匹配)。编号后面紧跟其他文字 ("5G套餐") 时不是编号，按原文判断；
+      只有数字、但有候选项以这串数字开头 ("1号线路") 时还不能确定
+    - 原文：回复里恰好出现了一个候选项，并且结尾不是其他候选项的开头 (避免 "退货" 之后接着 "退货退款")
+    """
+    m = _LEADING_INDEX.match(text)
+    if m is not None:
+        digits, after = m.groups()
+        if after:
+            if after in INDEX_SUFFIXES:
+                return True
+        elif not any(choice.startswith(digits) for choice in choices):
+            # 只有数字：编号在范围内并且不可能再多一位时才确定；有候选项以这串数字开头 ("5G套餐") 时继续读
+            index = int(digits)
+            return index <= len(choices) and (digits.startswith("0") or index * 10 > len(choices))
+        else:
+            return False
+
+    found = [choice for choice in choices if choice in text]
+    if len(found) != 1:
+        return False
+    for choice in choices:
+        if choice is found[0] or choice in text:
+            continue
+        if any(text.endswith(choice[:k]) for k in range(1, len(choice))):
+            return False
+    return True
+
+
+class StreamAccumulator:
+    """逐行喂入 SSE 响应，累计回复文本，并判断是否可以提前结束"""
+
+    __slots__ = ('until', 'text', 'usage', 'cut_short')
+
+    def __init__(self, until=None):
+        """
+        :param until: until(累计文本) 为真时停止读取；None 表示读完整个流
+        """
+        self.until = until
+        self.text = ""
+        self.usage = None
+        self.cut_short = False  # 是否在流结束之前就确定了答案
+
+    def feed(self, line):
+        """
+        :return: 是否应该停止读取
+        """
+        data = parse_sse_line(line)
+        if data is None:
+            return False
+        event = parse_stream_event(data)
+        if event is None:
+            # [DONE] 之后服务端很快就会结束响应，继续读完可以让连接回到连接池
+            return False
+        delta, usage = event
+        self.usage = usage or self.usage
+        if delta:
+            self.text += delta
+            if self.until is not None and self.until(self.text):
+                self.cut_short = True
+                return True
+        return False
@@ -1,107 +1,513 @@
 import os
-import json
-import urllib.request
-import urllib.error
-import socket
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from metrics.log import get_logger
+from metrics.registry import counter, timer
+from .matcher import get_matcher
+from .cache import IntentCache
+from .cassette import cassette_from_env
+from .cascade import build_cascade
+from .transport import HTTPTransport, AsyncHTTPTransport, HTTPStatusError
+from .resilience import RetryPolicy, Deadline, get_breaker, is_retryable
+from .hedging import HedgePolicy, hedged_call, hedged_call_async
+from .prompts import INTENT_MAX_TOKENS, TokenStats, build_intent_messages, parse_index_answer
+from .streaming import StreamAccumulator, is_decided
+from .ratelimit import PRIORITIES, RateLimitExceeded, get_rate_limiter
+
+log = get_logger("llm")
+
+_INTENT_TIME = timer("intent_recognition_seconds", "意图识别的耗时，按最终给出答案的层统计 "
+                     "(stub / keyword / cache / ngram / similarity / llm / fallback)", ("tier",))
+_HTTP_TIME = timer("llm_http_seconds", "单次大模型 HTTP 请求的耗时", ("outcome",))
+_RETRIES = counter("llm_retries_total", "大模型请求的重试次数")
+_FALLBACKS = counter("llm_fallbacks_total", "大模型没有给出可用答案、降级到本地匹配的次数 "
+                     "(reason=no_reply 请求失败 / unparsable 回复映射不到候选项)", ("reason",))
+
 
 class LLMClient:
-    def __init__(self, use_stub=False):
+    def __init__(self, use_stub=False, intent_cache=None, cascade=None,
+                 base_url=None, model=None, api_key=None, hedge=None, priority=None, cassette=None):
+        """
+        :param use_stub: 是否使用本地测试桩
+        :param intent_cache: 意图识别缓存 (IntentCache)，默认按环境变量创建；传 False 关闭缓存
+        :param cascade: Real 模式下请求大模型之前依次尝试的本地识别层 (IntentCascade)，默认按环境变量创建
+        :param base_url / model / api_key: 覆盖 LLM_BASE_URL / LLM_MODEL / LLM_API_KEY
+        :param hedge: 是否启用对冲请求，默认取 LLM_HEDGE
+        :param priority: 限流排队时的优先级 ("interactive" / "batch")，默认取 LLM_PRIORITY
+        :param cassette: 录制 / 回放大模型调用的磁带 (llm.cassette.Cassette)，默认按 LLM_CASSETTE 创建；传 False 关闭
+        """
         load_dotenv()
         env_mode = os.getenv("RUN_MODE", "real").lower()
         self.use_stub = use_stub or (env_mode == "stub")
 
-        self.api_key = os.getenv("LLM_API_KEY")
-        self.base_url = os.getenv("LLM_BASE_URL", "https://api.siliconflow.cn/v1")
-        self.model = os.getenv("LLM_MODEL", "deepseek-ai/DeepSeek-V3")
+        self.api_key = api_key or os.getenv("LLM_API_KEY")
+        self.base_url = base_url or os.getenv("LLM_BASE_URL", "https://api.siliconflow.cn/v1")
+        self.model = model or os.getenv("LLM_MODEL", "deepseek-ai/DeepSeek-V3")
 
         if "/v1" in self.base_url:
             self.api_url = self.base_url.rstrip("/") + "/chat/completions"
         else:
             self.api_url = self.base_url.rstrip("/") + "/v1/chat/completions"
 
+        # 容错：单次请求超时、每轮总预算、退避重试，以及同一地址共用的熔断器
+        self.request_timeout = float(os.getenv("LLM_REQUEST_TIMEOUT", "10"))
+        self.turn_budget = float(os.getenv("LLM_TURN_BUDGET", "15"))
+        self.retry_policy = RetryPolicy(max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")))
+        self.breaker = get_breaker(self.api_url,
+                                   failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                                   recovery_timeout=float(os.getenv("LLM_BREAKER_RECOVERY", "30")))
+        self.last_error = None
+
+        # 限流：LLM_RPM / LLM_TPM 是服务商的每分钟请求数 / token 数配额，同一地址的客户端共用一个限流器；
+        # 线上对话 (interactive) 排在批量回归 (batch) 前面
+        self.rate_limiter = get_rate_limiter(self.api_url,
+                                             requests_per_minute=float(os.getenv("LLM_RPM", "0")),
+                                             tokens_per_minute=float(os.getenv("LLM_TPM", "0")))
+        self.priority = PRIORITIES[(priority or os.getenv("LLM_PRIORITY", "interactive")).lower()]
+
+        # 每次调用的 token 用量；意图识别的输出上限 (只需要回答一个编号)
+        self.token_stats = TokenStats()
+        self.intent_max_tokens = int(os.getenv("LLM_INTENT_MAX_TOKENS", str(INTENT_MAX_TOKENS)))
+
+        # 流式模式：意图识别改用 stream: true，累计的文本能确定唯一候选项时立即断开，不等完整回复
+        self.stream = os.getenv("LLM_STREAM", "0").lower() in ("1", "true", "yes")
+        self.streams_cut_short = 0  # 提前断开的流式请求数
+
+        # keep-alive 连接池 (线程安全)，代理只对本客户端生效
         self.proxy_url = os.getenv("http_proxy")
-        if self.proxy_url:
-            proxy_handler = urllib.request.ProxyHandler({
-                'http': self.proxy_url,
-                'https': self.proxy_url
-            })
-            opener = urllib.request.build_opener(proxy_handler)
-            urllib.request.install_opener(opener)
+        self.transport = HTTPTransport(self.api_url, proxy=self.proxy_url,
+                                       pool_size=int(os.getenv("LLM_POOL_SIZE", "8")), timeout=self.request_timeout)
+        # 异步接口用的连接池，单个事件循环可以同时挂起大量请求
+        self.async_transport = AsyncHTTPTransport(self.api_url, proxy=self.proxy_url,
+                                                  pool_size=int(os.getenv("LLM_ASYNC_POOL_SIZE", "64")),
+                                                  timeout=self.request_timeout)
+
+        # Real 模式下相同的 (说法, 候选) 不重复请求大模型
+        # LLM_INTENT_CACHE_DB 指向一个 SQLite 文件时，缓存可以跨重启、跨进程共享
+        if intent_cache is None:
+            cache_size = int(os.getenv("LLM_INTENT_CACHE_SIZE", "1024"))
+            cache_ttl = float(os.getenv("LLM_INTENT_CACHE_TTL", "3600"))
+            intent_cache = IntentCache(cache_size, cache_ttl, os.getenv("LLM_INTENT_CACHE_DB")) if cache_size > 0 else False
+        self.intent_cache = intent_cache if intent_cache is not False else None
+
+        # 分层识别：LLM_CASCADE 指定本地层的顺序，例如 "keyword,cache,ngram"；设为空串则每轮都请求大模型
+        if cascade is None:
+            thresholds = {
+                "keyword": _env_float("LLM_KEYWORD_THRESHOLD"),
+                "ngram": _env_float("LLM_NGRAM_THRESHOLD"),
+                "similarity": _env_float("LLM_SIMILARITY_THRESHOLD"),
+            }
+            cascade = build_cascade(os.getenv("LLM_CASCADE", "keyword,cache"), self.intent_cache, thresholds)
+        self.cascade = cascade
+
+        # 录制 / 回放：LLM_CASSETTE 指向磁带文件，LLM_CASSETTE_MODE 为 record / replay / passthrough
+        if cassette is None:
+            cassette = cassette_from_env()
+        self.cassette = cassette if cassette is not False else None
+
+        # 对冲请求：主请求超过近期延迟的 p 百分位还没返回时，再向备用地址/模型 (默认同一个) 发一次
+        if hedge is None:
+            hedge = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+        self.hedge_policy = None
+        self.secondary = None
+        if hedge and not self.use_stub:
+            self.hedge_policy = HedgePolicy(percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+                                            initial_delay=float(os.getenv("LLM_HEDGE_DELAY", "1.0")))
+            self.secondary = LLMClient(intent_cache=False, cascade=build_cascade(""), hedge=False,
+                                       cassette=self.cassette if self.cassette is not None else False,
+                                       base_url=os.getenv("LLM_SECONDARY_BASE_URL") or self.base_url,
+                                       model=os.getenv("LLM_SECONDARY_MODEL") or self.model,
+                                       api_key=os.getenv("LLM_SECONDARY_API_KEY") or self.api_key)
+            self.secondary.priority = self.priority
+            # 只有真正发出的对冲请求占用这里的线程，主请求在调用线程里执行
+            self._hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_THREADS", "16")),
+                                                      thread_name_prefix="llm-hedge")
 
     def _local_stub_match(self, user_input, choices):
-        """本地匹配逻辑 - 修正版"""
-        for choice in choices:
-            # 1. 关键词拆分
-            keywords = choice.split('/')
-            for kw in keywords:
-                # 【核心修改】只保留单向匹配：用户输入必须包含关键词
-                # 删除了 'or user_input in kw'，防止 "感兴趣" 匹配到 "不感兴趣"
-                if kw in user_input:
-                    return choice
-
-            # 2. 数字特判 (保留)
-            if user_input.isdigit() and ("订单" in choice or "单号" in choice):
-                return choice
-        return None
+        """
+        本地匹配逻辑 - 多关键词索引版
+        每组候选项的索引只构建一次，输入只扫描一遍，取最左最长的关键词命中
+        ("不感兴趣" 不会再被 "感兴趣" 误匹配)；纯数字输入仍然特判为订单号
+        """
+        return get_matcher(choices).match(user_input)
 
-    def chat(self, prompt, retry_count=3):
-        if self.use_stub: return None
+    def prepare_script(self, script):
+        """
+        为编译好的脚本预先构建匹配索引 (关键词索引 / n-gram 矩阵)
+        可以注册为 ScriptRegistry 的加载钩子：registry.add_load_hook(client.prepare_script)
+        """
+        if self.use_stub:
+            for state in script.states:
+                if state.options:
+                    get_matcher(state.options)
+        else:
+            self.cascade.prepare_script(script)
 
+    # ---------- 同步 / 异步共用的逻辑 ----------
+    def _chat_request(self, prompt, max_tokens=None):
+        """
+        :param prompt: 提示词文本，或者完整的 messages 列表
+        :param max_tokens: 输出 token 上限，None 表示不限制
+        """
         headers = {
-            "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
         data = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "temperature": 0.1
         }
+        if max_tokens is not None:
+            data["max_tokens"] = max_tokens
+        return headers, data
 
-        for attempt in range(retry_count):
-            try:
-                if attempt > 0: time.sleep(1.5)
-                req = urllib.request.Request(
-                    self.api_url,
-                    data=json.dumps(data).encode('utf-8'),
-                    headers=headers
-                )
-                with urllib.request.urlopen(req, timeout=60) as response:
-                    res_json = json.loads(response.read().decode('utf-8'))
-                    return res_json['choices'][0]['message']['content'].strip()
-            except Exception:
-                pass
-        return None
+    def _reply_content(self, res_json):
+        self.token_stats.record(res_json.get('usage'))
+        return res_json['choices'][0]['message']['content'].strip()
 
-    def recognize_intent(self, user_input, choices):
-        # 1. Stub 模式
+    def _stream_result(self, acc):
+        self.token_stats.record(acc.usage)  # 提前断开时服务端还没来得及发 usage
+        if acc.cut_short:
+            self.streams_cut_short += 1
+        return acc.text.strip(), acc.usage
+
+    def _post(self, data, headers, timeout, until, cancel=None):
+        """
+        发送一次请求
+        :param until: 流式模式下 until(累计文本) 为真时提前断开；None 表示不走流式
+        :param cancel: CancelToken，用于对冲分出胜负后关闭落败的请求
+        :return: (回复文本, usage)
+        """
+        if until is None or not self.stream:
+            res_json = self.transport.post_json(data, headers=headers, timeout=timeout, cancel=cancel)
+            return self._reply_content(res_json), res_json.get('usage')
+        acc = StreamAccumulator(until)
+        lines = self.transport.post_stream(dict(data, stream=True), headers=headers, timeout=timeout, cancel=cancel)
+        try:
+            for line in lines:
+                if acc.feed(line):
+                    break
+        finally:
+            lines.close()  # 提前结束时关闭连接
+        return self._stream_result(acc)
+
+    async def _apost(self, data, headers, timeout, until):
+        if until is None or not self.stream:
+            res_json = await self.async_transport.post_json(data, headers=headers, timeout=timeout)
+            return self._reply_content(res_json), res_json.get('usage')
+        acc = StreamAccumulator(until)
+        lines = self.async_transport.post_stream(dict(data, stream=True), headers=headers, timeout=timeout)
+
+        async def consume():
+            async for line in lines:
+                if acc.feed(line):
+                    break
+
+        try:
+            # 整个流共用一个超时，不会因为服务端隔一会儿吐一个 token 而无限拖长
+            await asyncio.wait_for(consume(), timeout)
+        finally:
+            await lines.aclose()
+        return self._stream_result(acc)
+
+    # ---------- 意图识别的三个步骤 ----------
+    # recognize_intent = resolve_locally -> chat(intent_messages) -> resolve_reply
+    # (异步版本是 aresolve_locally -> achat -> aresolve_reply，意图缓存的 SQLite 读写不占事件循环)
+    # 分开暴露出来，IntentBatcher 这类自己决定怎么请求大模型的调用方可以复用前后两步
+
+    @staticmethod
+    def intent_messages(user_input, choices):
+        """:return: 单条意图识别的 messages 列表"""
+        return build_intent_messages(user_input, choices)
+
+    def resolve_locally(self, user_input, choices):
+        """
+        不需要请求大模型就能给出的答案 (Stub 模式 / 本地分层识别命中)
+        :return: 候选项 (Stub 模式下没有匹配时为 "unknown")；None 表示需要继续请求大模型
+        """
+        t0 = time.perf_counter()
+        if self.use_stub:
+            return self._stub_answer(user_input, choices, t0)
+        # 本地分层识别 (关键词 / 缓存 / 相似度)，有把握就不请求大模型
+        match, tier = self.cascade.classify(user_input, choices)
+        return self._local_answer(user_input, match, tier, t0)
+
+    async def aresolve_locally(self, user_input, choices):
+        """resolve_locally 的 asyncio 版本：意图缓存的 SQLite 查询放到线程池里，不阻塞事件循环"""
+        t0 = time.perf_counter()
         if self.use_stub:
-            match = self._local_stub_match(user_input, choices)
-            if match:
-                print(f"   (⚡ Stub命中: '{user_input}' -> '{match}')")
-                return match
-            return "unknown"
+            return self._stub_answer(user_input, choices, t0)
+        match, tier = await self.cascade.aclassify(user_input, choices)
+        return self._local_answer(user_input, match, tier, t0)
 
-        # 2. Real 模式
-        print(f"   (🧠 大模型正在思考: '{user_input}'...)")
+    def _stub_answer(self, user_input, choices, t0):
+        match = self._local_stub_match(user_input, choices)
+        _INTENT_TIME.observe(time.perf_counter() - t0, "stub")
+        if match:
+            log.info("   (⚡ Stub命中: '%s' -> '%s')", user_input, match)
+            return match
+        return "unknown"
+
+    def _local_answer(self, user_input, match, tier, t0):
+        if match is not None:
+            _INTENT_TIME.observe(time.perf_counter() - t0, tier)
+            log.info("   (⚡ %s层命中: '%s' -> '%s')", tier, user_input, match)
+            return match
+        log.info("   (🧠 大模型正在思考: '%s'...)", user_input)
+        return None
 
-        prompt = f"用户输入:'{user_input}'\n候选:{choices}\n请选出最匹配的一项，只返回文字。"
-        ai_result = self.chat(prompt)
+    def resolve_reply(self, user_input, choices, ai_result, seconds=0.0):
+        """
+        把大模型的回复映射到候选项上 (映射上的答案写入意图缓存)，映射不上时降级到本地匹配
+        :param ai_result: 大模型的回复，请求失败时为 None
+        :param seconds: 这次大模型调用的耗时，计入分层统计
+        :return: 候选项，都匹配不上时为 "unknown"
+        """
+        match = self._reply_match(choices, ai_result, seconds)
+        if match is None:
+            return self._fallback(user_input, choices, ai_result, seconds)
+        # 只缓存大模型给出的答案，降级匹配的结果不缓存
+        if self.intent_cache is not None:
+            self.intent_cache.put(user_input, choices, match)
+        return match
 
-        if ai_result:
-            for choice in choices:
-                if choice in ai_result:
-                    return choice
+    async def aresolve_reply(self, user_input, choices, ai_result, seconds=0.0):
+        """resolve_reply 的 asyncio 版本：意图缓存的 SQLite 写入放到线程池里"""
+        match = self._reply_match(choices, ai_result, seconds)
+        if match is None:
+            return self._fallback(user_input, choices, ai_result, seconds)
+        if self.intent_cache is not None:
+            await self.intent_cache.aput(user_input, choices, match)
+        return match
 
-        # 4. 降级
+    def _reply_match(self, choices, ai_result, seconds):
+        match = parse_index_answer(ai_result, choices)
+        self.cascade.record("llm", match is not None, seconds)
+        if match is not None:
+            _INTENT_TIME.observe(seconds, "llm")
+        return match
+
+    def _fallback(self, user_input, choices, ai_result, seconds):
+        _INTENT_TIME.observe(seconds, "fallback")
+        _FALLBACKS.inc("no_reply" if ai_result is None else "unparsable")
+        log.warning("大模型没有给出可用答案，降级到本地匹配: '%s' (%s)", user_input,
+                    "请求失败" if ai_result is None else f"回复: {ai_result!r}")
         fallback_match = self._local_stub_match(user_input, choices)
         if fallback_match:
             return fallback_match
 
         return "unknown"
 
+    def _next_delay(self, attempt, deadline, error):
+        """
+        第 attempt 次重试前应等待的时间；不该再重试 (致命错误 / 预算不够) 时返回 None
+        """
+        if not is_retryable(error):
+            return None
+        delay = self.retry_policy.backoff(attempt)
+        retry_after = getattr(error, "headers", {}).get("retry-after", "")
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        # 等完之后至少还要留一点时间给下一次请求
+        if delay + 0.05 >= deadline.remaining():
+            return None
+        return delay
+
+    def _record_error(self, error):
+        self.last_error = error
+        # 只有服务端不可用类的错误才计入熔断；鉴权失败、响应格式不对这类错误说明服务端有应答，
+        # 按成功处理 (半开状态下的探测请求也就此结束，不会一直占着探测名额)
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        # 限流器放行了但服务端仍然限流：按 Retry-After 暂停放行，避免排队的请求接着撞上 429
+        if self.rate_limiter is not None and isinstance(error, HTTPStatusError) and error.status == 429:
+            retry_after = error.headers.get("retry-after", "")
+            self.rate_limiter.penalize(float(retry_after) if retry_after.isdigit() else None)
+
+    @staticmethod
+    def _estimate_tokens(data):
+        """放行前预估的 token 数：提示词按一个字符一个 token 粗略估计 (中文大致如此，英文偏高)，加上输出上限"""
+        return sum(len(m["content"]) for m in data["messages"]) + data.get("max_tokens", 256)
+
+    def _throttle(self, deadline, tokens):
+        """排队等待限流器放行；本轮预算内等不到时返回 False"""
+        if self.rate_limiter is None:
+            return True
+        try:
+            self.rate_limiter.acquire(self.priority, tokens, timeout=deadline.remaining())
+            return True
+        except RateLimitExceeded as e:
+            self.last_error = e
+            return False
+
+    async def _athrottle(self, deadline, tokens):
+        if self.rate_limiter is None:
+            return True
+        try:
+            await self.rate_limiter.acquire_async(self.priority, tokens, timeout=deadline.remaining())
+            return True
+        except RateLimitExceeded as e:
+            self.last_error = e
+            return False
+
+    def _settle(self, estimated, usage):
+        if self.rate_limiter is not None and usage:
+            actual = usage.get("total_tokens") or (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+            self.rate_limiter.settle(estimated, actual)
+
+    # ---------- 同步接口 ----------
+    def chat(self, prompt, retry_count=None, budget=None, max_tokens=None, until=None, cancel=None):
+        """
+        :param prompt: 提示词文本，或者完整的 messages 列表
+        :param retry_count: 最多尝试次数，默认取重试策略的配置
+        :param budget: 本次调用的总时间预算 (秒)，默认 LLM_TURN_BUDGET
+        :param max_tokens: 输出 token 上限
+        :param until: 流式模式 (LLM_STREAM) 下，until(已收到的文本) 为真时不再等待剩余的回复
+        :param cancel: CancelToken，被取消 (对冲输掉) 时关闭连接、返回 None，不计入熔断器
+        :return: 模型回复文本，失败 (含熔断中) 返回 None
+        :raises CassetteMiss: 磁带处于 replay 模式且没有录过这次调用
+        """
+        if self.use_stub: return None
+
+        headers, data = self._chat_request(prompt, max_tokens)
+        if self.cassette is not None:
+            replayed = self.cassette.lookup(data)
+            if replayed is not None:
+                return replayed
+        deadline = Deadline(budget if budget is not None else self.turn_budget)
+        max_attempts = retry_count or self.retry_policy.max_attempts
+        estimate = self._estimate_tokens(data)
+        for attempt in range(1, max_attempts + 1):
+            # 限流排队超出预算、或者熔断中，直接放弃，由调用方降级到本地匹配
+            # (先排队再问熔断器，避免半开状态的探测名额被排队超时的请求占住)
+            if not self._throttle(deadline, estimate):
+                return None
+            if not self.breaker.allow_request():
+                return None
+            t0 = time.perf_counter()
+            try:
+                timeout = min(self.request_timeout, deadline.remaining())
+                result, usage = self._post(data, headers, timeout, until, cancel)
+                _HTTP_TIME.observe(time.perf_counter() - t0, "ok")
+                self.breaker.record_success()
+                self._settle(estimate, usage)
+                if self.cassette is not None:
+                    self.cassette.record(data, result)
+                return result
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    self.breaker.release_probe()  # 对冲输掉被取消，与异步版本的 CancelledError 一样处理
+                    return None
+                _HTTP_TIME.observe(time.perf_counter() - t0, "error")
+                self._record_error(e)
+                delay = self._next_delay(attempt, deadline, e) if attempt < max_attempts else None
+                if delay is None:
+                    return None
+                _RETRIES.inc()
+                time.sleep(delay)
+        return None
+
+    def recognize_intent(self, user_input, choices):
+        result = self.resolve_locally(user_input, choices)
+        if result is not None:
+            return result
+
+        prompt = self.intent_messages(user_input, choices)
+        t0 = time.perf_counter()
+        options = dict(max_tokens=self.intent_max_tokens, until=lambda text: is_decided(text, choices))
+        if self.hedge_policy is None:
+            ai_result = self.chat(prompt, **options)
+        else:
+            ai_result = hedged_call(self.hedge_policy, self._hedge_executor,
+                                    lambda cancel: self.chat(prompt, cancel=cancel, **options),
+                                    lambda cancel: self.secondary.chat(prompt, cancel=cancel, **options),
+                                    lambda result: parse_index_answer(result, choices) is not None)
+        return self.resolve_reply(user_input, choices, ai_result, time.perf_counter() - t0)
+
+    # ---------- 异步接口 (asyncio) ----------
+    # 与同步接口共用请求构造和结果解析，只有网络 I/O 和重试等待换成了非阻塞的实现
+    async def achat(self, prompt, retry_count=None, budget=None, max_tokens=None, until=None):
+        if self.use_stub: return None
+
+        headers, data = self._chat_request(prompt, max_tokens)
+        if self.cassette is not None:
+            replayed = self.cassette.lookup(data)
+            if replayed is not None:
+                return replayed
+        deadline = Deadline(budget if budget is not None else self.turn_budget)
+        max_attempts = retry_count or self.retry_policy.max_attempts
+        estimate = self._estimate_tokens(data)
+        for attempt in range(1, max_attempts + 1):
+            if not await self._athrottle(deadline, estimate):
+                return None
+            if not self.breaker.allow_request():
+                return None
+            t0 = time.perf_counter()
+            try:
+                timeout = min(self.request_timeout, deadline.remaining())
+                result, usage = await self._apost(data, headers, timeout, until)
+                _HTTP_TIME.observe(time.perf_counter() - t0, "ok")
+                self.breaker.record_success()
+                self._settle(estimate, usage)
+                if self.cassette is not None:
+                    self.cassette.record(data, result)
+                return result
+            except asyncio.CancelledError:
+                self.breaker.release_probe()  # 被取消 (对冲输掉、会话关闭)，归还探测名额
+                raise
+            except Exception as e:
+                _HTTP_TIME.observe(time.perf_counter() - t0, "error")
+                self._record_error(e)
+                delay = self._next_delay(attempt, deadline, e) if attempt < max_attempts else None
+                if delay is None:
+                    return None
+                _RETRIES.inc()
+                await asyncio.sleep(delay)
+        return None
+
+    async def recognize_intent_async(self, user_input, choices):
+        result = await self.aresolve_locally(user_input, choices)
+        if result is not None:
+            return result
+
+        prompt = self.intent_messages(user_input, choices)
+        t0 = time.perf_counter()
+        options = dict(max_tokens=self.intent_max_tokens, until=lambda text: is_decided(text, choices))
+        if self.hedge_policy is None:
+            ai_result = await self.achat(prompt, **options)
+        else:
+            ai_result = await hedged_call_async(self.hedge_policy,
+                                                lambda: self.achat(prompt, **options),
+                                                lambda: self.secondary.achat(prompt, **options),
+                                                lambda result: parse_index_answer(result, choices) is not None)
+        return await self.aresolve_reply(user_input, choices, ai_result, time.perf_counter() - t0)
+
+    def close(self):
+        """释放连接池和缓存占用的资源"""
+        self.transport.close()
+        if self.intent_cache is not None:
+            self.intent_cache.close()
+        if self.secondary is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self.secondary.close()
+
+    async def aclose(self):
+        """释放异步连接池 (需要在使用它的事件循环里调用)"""
+        await self.async_transport.close()
+        if self.secondary is not None:
+            await self.secondary.aclose()
+
+
+def _env_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
 
 def get_llm_client(use_stub=False):
     return LLMClient(use_stub=use_stub)
\ No newline at end of file
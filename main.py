@@ -14,6 +14,9 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 from dsl.executor import DSLExecutor
+from dsl.registry import default_registry
+from dsl.reload import ScriptWatcher
+from metrics.log import setup_logging
 from llm.wrapper import LLMClient
 
 
@@ -24,6 +27,8 @@ def list_scripts(script_dir):
 
 
 def main():
+    # 意图识别的命中情况 (⚡ Stub命中 / 🧠 大模型正在思考) 以 INFO 日志输出
+    setup_logging("INFO")
     print("==========================================")
     print("   基于领域特定语言(DSL)的智能Agent系统")
     print("==========================================")
@@ -33,6 +38,8 @@ def main():
     try:
         # 使用配置区的开关
         llm_client = LLMClient(use_stub=USE_STUB)
+        # 脚本加载时顺带构建意图识别索引
+        default_registry.add_load_hook(llm_client.prepare_script)
 
         if USE_STUB:
             print(f"🔧 服务: Local Rule Engine (本地规则引擎)")
@@ -47,6 +54,8 @@ def main():
         return
 
     script_dir = "scripts"
+    # 对话过程中修改脚本会自动热更新，不用重启
+    ScriptWatcher(script_dir).start()
 
     while True:
         scripts = list_scripts(script_dir)
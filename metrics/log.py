@@ -0,0 +1,57 @@
+# 分级、限速的日志：取代热路径上的 print
+# 同一条日志 (logger 名 + 格式串) 每个周期最多输出 burst 条，超出的只计数，下一条放行时附上被略过的条数；
+# 低于日志级别的调用在 logging 内部就返回了，不会走到格式化和限速
+
+import time
+import logging
+import threading
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst=10, period=1.0):
+        """
+        :param burst: 每个周期内同一条日志最多输出的条数
+        :param period: 周期 (秒)
+        """
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows = {}  # {(logger 名, 格式串): [周期开始时间, 本周期已输出条数, 被略过的条数]}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                if len(self._windows) > 10000:  # 格式串里拼了变量的日志会无限增长，整体清掉
+                    self._windows.clear()
+                window = self._windows[key] = [now, 0, 0]
+            elif now - window[0] >= self.period:
+                window[0], window[1] = now, 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+
+        if suppressed:
+            record.msg = f"{record.msg} (此前 {suppressed} 条相同日志被限速略过)"
+        return True
+
+
+_filter = RateLimitFilter()
+
+
+def get_logger(name):
+    """取得带限速的 logger (同名 logger 只挂一次过滤器)"""
+    logger = logging.getLogger(name)
+    if _filter not in logger.filters:
+        logger.addFilter(_filter)
+    return logger
+
+
+def setup_logging(level="INFO", fmt="%(message)s"):
+    """命令行入口用的简单配置：日志输出到标准错误"""
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level, format=fmt)
@@ -0,0 +1,162 @@
+# 进程内的指标：带标签的计数器 (Counter) 和计时器 (Timer，按桶统计的直方图)
+# 各模块在导入时通过 counter() / timer() 声明自己的指标，热路径上只做一次字典累加；
+# snapshot() 得到可以 JSON 序列化的快照，由 metrics.sinks 输出成 Prometheus 文本或 JSON 文件
+#
+# 累加不加锁 (每轮对话要更新好几个指标，加锁的开销和执行器查表本身差不多)：
+# 事件循环里是单线程的，不会有问题；多线程并发累加同一个样本时极少数情况下可能丢一次计数，对统计指标可以接受
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# 默认的计时桶 (秒)：覆盖从本地匹配到大模型请求的范围
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 微秒级操作 (查表、状态流转) 用的计时桶
+FAST_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=()):
+        """
+        :param labels: 标签名，inc 时按相同顺序传入标签值
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # {标签值元组: 累计值}
+
+    def inc(self, *label_values, amount=1):
+        values = self._values
+        values[label_values] = values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def snapshot(self):
+        # list(dict.items()) 是一次原子的拷贝，不会遇到 "dictionary changed size during iteration"
+        samples = [[list(k), v] for k, v in list(self._values.items())]
+        return {"type": self.kind, "help": self.help, "labels": list(self.labels), "samples": samples}
+
+    def reset(self):
+        self._values = {}
+
+
+class Timer:
+    kind = "timer"
+
+    def __init__(self, name, help="", labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: 直方图各个桶的上界 (秒)，从小到大
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # {标签值元组: [次数, 总耗时, 各个桶的计数 (最后一个是超出所有上界的)]}
+
+    def observe(self, seconds, *label_values):
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values.setdefault(label_values, [0, 0.0, [0] * (len(self.buckets) + 1)])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        """with timer.time("label"): ...  记录代码块的耗时"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *label_values)
+
+    def count(self, *label_values):
+        entry = self._values.get(label_values)
+        return entry[0] if entry else 0
+
+    def snapshot(self):
+        samples = [[list(k), n, total, list(counts)] for k, (n, total, counts) in list(self._values.items())]
+        return {"type": self.kind, "help": self.help, "labels": list(self.labels),
+                "buckets": list(self.buckets), "samples": samples}
+
+    def reset(self):
+        self._values = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}  # {指标名: Counter / Timer}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已经以 {metric.kind} 类型注册过")
+            return metric
+
+    def counter(self, name, help="", labels=()):
+        """声明 (或取回已经声明过的) 计数器"""
+        return self._get_or_create(Counter, name, help, labels)
+
+    def timer(self, name, help="", labels=(), buckets=DEFAULT_BUCKETS):
+        """声明 (或取回已经声明过的) 计时器"""
+        return self._get_or_create(Timer, name, help, labels, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def snapshot(self):
+        """所有指标的快照 {指标名: {...}}，可以直接 JSON 序列化"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+def merge_snapshots(snapshots):
+    """合并多个进程的快照 (多进程模式下汇总各个 worker)，相同标签的样本相加"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                merged[name] = dict(metric, samples=[list(s) for s in metric["samples"]])
+                continue
+            index = {tuple(s[0]): s for s in target["samples"]}
+            for sample in metric["samples"]:
+                existing = index.get(tuple(sample[0]))
+                if existing is None:
+                    sample = list(sample)
+                    target["samples"].append(sample)
+                    index[tuple(sample[0])] = sample
+                elif metric["type"] == "counter":
+                    existing[1] += sample[1]
+                else:
+                    existing[1] += sample[1]
+                    existing[2] += sample[2]
+                    existing[3] = [a + b for a, b in zip(existing[3], sample[3])]
+    return merged
+
+
+# 进程内默认的指标注册表
+default_metrics = MetricsRegistry()
+
+
+def counter(name, help="", labels=()):
+    return default_metrics.counter(name, help, labels)
+
+
+def timer(name, help="", labels=(), buckets=DEFAULT_BUCKETS):
+    return default_metrics.timer(name, help, labels, buckets)
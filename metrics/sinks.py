@@ -0,0 +1,133 @@
+# 指标的输出：Prometheus 文本格式 (/metrics 接口)、定期写 JSON 文件、定期写日志
+# sink 只需要实现 emit(快照)，由 PeriodicReporter 定期调用；快照格式见 MetricsRegistry.snapshot
+
+import os
+import json
+import time
+import logging
+import threading
+
+from .registry import default_metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(snapshot=None):
+    """
+    Prometheus 文本格式 (计时器输出成 histogram)
+    :param snapshot: 指标快照，默认取进程内默认注册表的当前快照
+    """
+    snapshot = default_metrics.snapshot() if snapshot is None else snapshot
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        names = metric["labels"]
+        kind = "counter" if metric["type"] == "counter" else "histogram"
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample in metric["samples"]:
+            values = sample[0]
+            if kind == "counter":
+                lines.append(f"{name}{_labels(names, values)} {_number(sample[1])}")
+                continue
+            count, total, buckets = sample[1], sample[2], sample[3]
+            cumulative = 0
+            for bound, n in zip(metric["buckets"], buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(names, values, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(names, values, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_labels(names, values)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, values)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def summarize(snapshot):
+    """精简的 JSON 视图：计数器给出各标签的值，计时器给出次数和平均耗时 (毫秒)"""
+    summary = {}
+    for name, metric in snapshot.items():
+        rows = {}
+        for sample in metric["samples"]:
+            key = ",".join(f"{n}={v}" for n, v in zip(metric["labels"], sample[0])) or "total"
+            if metric["type"] == "counter":
+                rows[key] = sample[1]
+            else:
+                rows[key] = {"count": sample[1], "avg_ms": sample[2] / sample[1] * 1000 if sample[1] else 0.0}
+        summary[name] = rows
+    return summary
+
+
+class JSONFileSink:
+    """每次 emit 把快照原子地写入一个 JSON 文件 (外部采集程序可以定期读取)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, snapshot):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"time": time.time(), "metrics": snapshot}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class LogSink:
+    """每次 emit 往日志里写一行精简的 JSON"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("metrics")
+        self.level = level
+
+    def emit(self, snapshot):
+        self.logger.log(self.level, "指标: %s", json.dumps(summarize(snapshot), ensure_ascii=False))
+
+
+class PeriodicReporter:
+    """后台线程每隔 interval 秒把注册表的快照交给各个 sink"""
+
+    def __init__(self, sinks, interval=60.0, registry=None):
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.registry = registry if registry is not None else default_metrics
+        self._stop = threading.Event()
+        self._thread = None
+
+    def report(self):
+        snapshot = self.registry.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.emit(snapshot)
+            except Exception as e:
+                logging.getLogger("metrics").error("指标输出失败 %s: %s", type(sink).__name__, e)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        """停止并最后输出一次"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.report()
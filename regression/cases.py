@@ -0,0 +1,80 @@
+# 回归用例：测试数据文件的格式和 "脚本 × 测试数据" 的声明式映射
+#
+# 测试数据文件每一行是一步交互：   用户输入 ||| 期望回复里包含的关键词   (# 开头的是注释)
+# 映射写在 tests/test_data/manifest.json：{"脚本文件名": ["测试数据文件名或通配符", ...]}
+
+import os
+import json
+import glob
+import fnmatch
+
+MANIFEST_NAME = "manifest.json"
+
+
+class CaseStep:
+    __slots__ = ('line', 'user_input', 'expected')
+
+    def __init__(self, line, user_input, expected):
+        self.line = line  # 在测试数据文件里的行号
+        self.user_input = user_input
+        self.expected = expected
+
+
+class Case:
+    """一个测试数据文件 = 一次完整的对话"""
+
+    __slots__ = ('name', 'script_path', 'case_path', 'steps')
+
+    def __init__(self, script_path, case_path, steps):
+        self.script_path = script_path
+        self.case_path = case_path
+        self.name = os.path.basename(case_path)
+        self.steps = steps
+
+    @property
+    def script_name(self):
+        return os.path.basename(self.script_path)
+
+
+def parse_case_file(case_path):
+    steps = []
+    with open(case_path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            if '|||' not in line or line.strip().startswith('#'):
+                continue
+            user_input, expected = line.split('|||', 1)
+            steps.append(CaseStep(line_num, user_input.strip(), expected.strip()))
+    return steps
+
+
+def discover(script_dir, data_dir, manifest_path=None):
+    """
+    按映射找出所有 (脚本, 测试数据) 组合
+    映射里写了但不存在的脚本 / 测试数据也生成用例，运行时报错 (steps 为 None 表示测试数据不存在)
+    :param manifest_path: 映射文件，默认是 data_dir 下的 manifest.json
+    :return: (用例列表, 警告列表)；警告是没有被任何脚本认领的测试数据、没有测试数据的脚本
+    """
+    manifest_path = manifest_path or os.path.join(data_dir, MANIFEST_NAME)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    data_files = sorted(os.path.basename(p) for p in glob.glob(os.path.join(data_dir, "*"))
+                        if os.path.isfile(p) and os.path.basename(p) != os.path.basename(manifest_path))
+    cases, claimed = [], set()
+    for script_name, patterns in manifest.items():
+        script_path = os.path.join(script_dir, script_name)
+        for pattern in patterns:
+            matched = fnmatch.filter(data_files, pattern)
+            if not matched:
+                cases.append(Case(script_path, os.path.join(data_dir, pattern), None))
+            for name in matched:
+                claimed.add(name)
+                case_path = os.path.join(data_dir, name)
+                cases.append(Case(script_path, case_path, parse_case_file(case_path)))
+
+    warnings = [f"测试数据没有对应的脚本 (需要在 {MANIFEST_NAME} 里声明): {name}"
+                for name in data_files if name not in claimed]
+    warnings += [f"脚本没有测试数据: {os.path.basename(path)}"
+                 for path in sorted(glob.glob(os.path.join(script_dir, "*.rsl")))
+                 if os.path.basename(path) not in manifest]
+    return cases, warnings
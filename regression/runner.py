@@ -0,0 +1,312 @@
+# 并行回归测试：按 tests/test_data/manifest.json 的映射跑完所有 "脚本 × 测试数据" 组合
+#
+# - 脚本经 ScriptRegistry 只解析一次，所有用例共享；整个进程只建一个 LLMClient (连接池、缓存复用)
+# - 用例之间并发执行：Real 模式默认在一个事件循环上跑 (等大模型的时间重叠，可选微批合并请求)，
+#   Stub 模式是纯 CPU 工作，可以用线程池或进程池
+# - 每一步记录耗时；结果可以输出成 JSON / JUnit XML，有失败时退出码非 0
+#
+# 用法: python -m regression.runner [--real] [--pool async|thread|process] [--json 路径] [--junit 路径]
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from xml.etree import ElementTree
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import default_registry
+from llm.cassette import Cassette, CassetteMiss
+from regression.cases import discover
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+DATA_DIR = os.path.join(project_root, "tests", "test_data")
+
+
+class StepResult:
+    __slots__ = ('line', 'user_input', 'expected', 'reply', 'passed', 'seconds')
+
+    def __init__(self, step, reply, seconds):
+        self.line = step.line
+        self.user_input = step.user_input
+        self.expected = step.expected
+        self.reply = reply or "（无回复）"
+        self.passed = step.expected in self.reply
+        self.seconds = seconds
+
+    def as_dict(self):
+        return {"line": self.line, "input": self.user_input, "expected": self.expected,
+                "reply": self.reply, "passed": self.passed, "seconds": self.seconds}
+
+
+class CaseResult:
+    def __init__(self, case):
+        self.script = case.script_name
+        self.case = case.name
+        self.opening = None
+        self.steps = []
+        self.error = None  # 脚本 / 测试数据加载失败等，用例没能跑完
+        self.seconds = 0.0
+
+    @property
+    def passed(self):
+        return self.error is None and all(s.passed for s in self.steps)
+
+    def as_dict(self):
+        return {"script": self.script, "case": self.case, "passed": self.passed, "error": self.error,
+                "seconds": self.seconds, "opening": self.opening, "steps": [s.as_dict() for s in self.steps]}
+
+
+# ---------- 执行单个用例 ----------
+def _open(case, result):
+    """加载脚本并新建会话；加载失败时记录错误返回 None"""
+    if case.steps is None:
+        result.error = f"缺少测试数据: {case.name}"
+        return None
+    if not os.path.isfile(case.script_path):
+        result.error = f"缺少脚本: {case.script_name}"
+        return None
+    try:
+        session = default_registry.open_session(case.script_path)
+    except SyntaxError as e:
+        result.error = f"脚本解析失败: {e}"
+        return None
+    result.opening = session.start()
+    return session
+
+
+def run_case(case, client):
+    """同步执行一个用例 (线程池 / 进程池里用)"""
+    result = CaseResult(case)
+    t0 = time.perf_counter()
+    session = _open(case, result)
+    if session is not None:
+        try:
+            for step in case.steps:
+                t1 = time.perf_counter()
+                reply = session.step(step.user_input, client.recognize_intent)
+                result.steps.append(StepResult(step, reply, time.perf_counter() - t1))
+        except CassetteMiss as e:
+            result.error = str(e)
+    result.seconds = time.perf_counter() - t0
+    return result
+
+
+async def run_case_async(case, recognizer):
+    """在事件循环上执行一个用例，等待大模型时让出给其他用例"""
+    result = CaseResult(case)
+    t0 = time.perf_counter()
+    session = _open(case, result)
+    if session is not None:
+        try:
+            for step in case.steps:
+                t1 = time.perf_counter()
+                reply = await session.astep(step.user_input, recognizer.recognize_intent_async)
+                result.steps.append(StepResult(step, reply, time.perf_counter() - t1))
+        except CassetteMiss as e:
+            result.error = str(e)
+    result.seconds = time.perf_counter() - t0
+    return result
+
+
+# ---------- 进程池 ----------
+_worker_client = None
+
+
+def _make_client(use_stub, cassette):
+    """:param cassette: (磁带文件, 模式) 或 None (按环境变量 LLM_CASSETTE)"""
+    from llm.wrapper import LLMClient
+    return LLMClient(use_stub=use_stub, priority="batch",  # 限流排队时让线上对话先走
+                     cassette=Cassette(*cassette) if cassette else None)
+
+
+def _init_worker(use_stub, cassette):
+    global _worker_client
+    _worker_client = _make_client(use_stub, cassette)
+    default_registry.add_load_hook(_worker_client.prepare_script)
+
+
+def _run_in_worker(case):
+    return run_case(case, _worker_client)
+
+
+def _preload(cases, client):
+    """提前把用到的脚本编译好 (进程池 fork 之后子进程直接共享)"""
+    default_registry.add_load_hook(client.prepare_script)
+    for path in {case.script_path for case in cases}:
+        try:
+            default_registry.get(path)
+        except (OSError, SyntaxError):
+            pass  # 运行用例时再报错
+
+
+# ---------- 并发执行所有用例 ----------
+def run_all(cases, use_stub=True, pool=None, workers=8, batch_window=0.0, cassette=None):
+    """
+    :param pool: "async" (事件循环) / "thread" (线程池) / "process" (进程池)；
+                 默认 Real 模式用 async，Stub 模式用 thread
+    :param workers: 线程 / 进程数，async 模式下是同时进行的用例数
+    :param batch_window: async 模式下意图识别微批处理的时间窗口 (秒)，0 表示不合并
+    :param cassette: (磁带文件, 模式)，录制 / 回放大模型调用 (见 llm.cassette)；进程池里每个进程各自打开
+    :return: 与 cases 顺序一致的 CaseResult 列表
+    """
+    pool = pool or ("thread" if use_stub else "async")
+    client = _make_client(use_stub, cassette)
+    _preload(cases, client)
+    try:
+        if pool == "process":
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(use_stub, cassette)) as executor:
+                return list(executor.map(_run_in_worker, cases))
+        if pool == "thread":
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(lambda case: run_case(case, client), cases))
+        if pool == "async":
+            return asyncio.run(_run_all_async(cases, client, workers, batch_window))
+        raise ValueError(f"未知的执行方式: {pool}")
+    finally:
+        client.close()
+
+
+async def _run_all_async(cases, client, concurrency, batch_window):
+    from llm.batcher import IntentBatcher
+    recognizer = IntentBatcher(client, window=batch_window) if batch_window > 0 else client
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(case):
+        async with semaphore:
+            return await run_case_async(case, recognizer)
+
+    try:
+        return await asyncio.gather(*(limited(case) for case in cases))
+    finally:
+        await client.aclose()
+
+
+# ---------- 报告 ----------
+def print_report(results, out=None):
+    """与原来 tests/test_batch.py 相同风格的逐步输出"""
+    out = out or sys.stdout
+    for r in results:
+        print(f"\n📄 {r.script} / {r.case}  ({r.seconds * 1000:.1f}ms)", file=out)
+        if r.error:
+            print(f"   ❌ {r.error}", file=out)
+            continue
+        print(f"   🤖 Bot开场: {r.opening}", file=out)
+        for s in r.steps:
+            print(f"   [{s.line}] {'✅' if s.passed else '❌'} 输入: {s.user_input:<10} | 预期: {s.expected:<6}"
+                  f" | {s.seconds * 1000:.2f}ms", file=out)
+            if not s.passed:
+                print(f"      L--> 实际回复: {s.reply}", file=out)
+        print(f"   📊 结果: {sum(s.passed for s in r.steps)}/{len(r.steps)} 通过", file=out)
+
+
+def summarize(results, seconds):
+    passed = sum(r.passed for r in results)
+    errors = sum(r.error is not None for r in results)
+    return {"cases": len(results), "passed": passed, "failed": len(results) - passed - errors,
+            "errors": errors, "seconds": seconds}
+
+
+def write_json(path, results, summary, mode):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(summary, mode=mode, results=[r.as_dict() for r in results]), f, ensure_ascii=False, indent=2)
+
+
+def junit_xml(results, summary):
+    """每个脚本一个 testsuite，每份测试数据一个 testcase"""
+    root = ElementTree.Element("testsuites", tests=str(summary["cases"]), failures=str(summary["failed"]),
+                               errors=str(summary["errors"]), time=f"{summary['seconds']:.3f}")
+    suites = {}
+    for r in results:
+        suite = suites.get(r.script)
+        if suite is None:
+            suite = suites[r.script] = ElementTree.SubElement(root, "testsuite", name=r.script)
+        testcase = ElementTree.SubElement(suite, "testcase", classname=r.script, name=r.case, time=f"{r.seconds:.3f}")
+        if r.error:
+            ElementTree.SubElement(testcase, "error", message=r.error)
+        elif not r.passed:
+            failed = [s for s in r.steps if not s.passed]
+            failure = ElementTree.SubElement(testcase, "failure", message=f"{len(failed)}/{len(r.steps)} 步未通过")
+            failure.text = "\n".join(f"第 {s.line} 行 输入: {s.user_input} 预期包含: {s.expected} 实际回复: {s.reply}"
+                                     for s in failed)
+    for suite in suites.values():
+        cases = list(suite)
+        suite.set("tests", str(len(cases)))
+        suite.set("failures", str(sum(c.find("failure") is not None for c in cases)))
+        suite.set("errors", str(sum(c.find("error") is not None for c in cases)))
+        suite.set("time", f"{sum(float(c.get('time')) for c in cases):.3f}")
+    return ElementTree.tostring(root, encoding="unicode")
+
+
+def write_junit(path, results, summary):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n' + junit_xml(results, summary))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DSL 脚本并行回归测试")
+    parser.add_argument("--real", action="store_true", help="使用真实大模型 (默认使用本地测试桩)")
+    parser.add_argument("--pool", choices=("async", "thread", "process"), default=None,
+                        help="并发方式，默认 Real 模式用 async、Stub 模式用 thread")
+    parser.add_argument("--workers", type=int, default=8, help="线程 / 进程数，async 模式下是同时进行的用例数")
+    parser.add_argument("--batch-window", type=float, default=0.0, help="async 模式下意图识别微批处理的时间窗口 (秒)")
+    parser.add_argument("--cassette", default=None,
+                        help="大模型调用的磁带文件 (.jsonl)，用于离线回放真实模型的判断，隐含 --real")
+    parser.add_argument("--cassette-mode", choices=("record", "replay", "passthrough"), default="replay",
+                        help="record 录制 / replay 只回放 (未录过的调用算出错) / passthrough 回放并补录")
+    parser.add_argument("--scripts", default=SCRIPT_DIR, help="脚本目录")
+    parser.add_argument("--data", default=DATA_DIR, help="测试数据目录 (含 manifest.json)")
+    parser.add_argument("--manifest", default=None, help="脚本与测试数据的映射文件，默认是测试数据目录下的 manifest.json")
+    parser.add_argument("--json", default=None, help="把结果写成 JSON 文件")
+    parser.add_argument("--junit", default=None, help="把结果写成 JUnit XML 文件")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出汇总")
+    args = parser.parse_args(argv)
+    if args.cassette:
+        args.real = True
+        if args.batch_window > 0:
+            parser.error("--cassette 不能和 --batch-window 一起用 (微批合并的提示词取决于时序，回放时对不上)")
+    return args
+
+
+def main(argv=None):
+    """:return: 退出码，全部通过为 0"""
+    args = parse_args(argv)
+    mode = "real" if args.real else "stub"
+    if args.cassette:
+        mode = f"cassette-{args.cassette_mode}"
+    cases, warnings = discover(args.scripts, args.data, args.manifest)
+
+    print("=" * 60)
+    label = f"磁带/{args.cassette_mode}" if args.cassette else ("Real/大模型" if args.real else "Stub/测试桩")
+    print(f"🚀 全场景自动化回归测试 (模式: {label}, 用例: {len(cases)})")
+    print("=" * 60)
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+
+    t0 = time.perf_counter()
+    results = run_all(cases, use_stub=not args.real, pool=args.pool, workers=args.workers,
+                      batch_window=args.batch_window,
+                      cassette=(args.cassette, args.cassette_mode) if args.cassette else None)
+    summary = summarize(results, time.perf_counter() - t0)
+
+    if not args.quiet:
+        print_report(results)
+    print(f"\n🏁 {summary['passed']}/{summary['cases']} 个用例通过 (失败 {summary['failed']}，出错 {summary['errors']})，"
+          f"耗时 {summary['seconds']:.2f}s")
+
+    if args.json:
+        write_json(args.json, results, summary, mode)
+    if args.junit:
+        write_junit(args.junit, results, summary)
+    return 0 if summary["passed"] == summary["cases"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import os
+import sys
+import asyncio
+import argparse
+
+# 路径适配
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from dsl.registry import default_registry
+from metrics.log import setup_logging
+from metrics.sinks import JSONFileSink, PeriodicReporter
+from llm.wrapper import LLMClient
+from llm.batcher import IntentBatcher
+from server.app import ConversationServer
+from server.cluster import ClusterManager
+from server.sessions import SessionManager
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="DSL 对话服务 (HTTP + WebSocket)")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8080")))
+    parser.add_argument("--scripts", default=os.path.join(current_dir, "scripts"), help="脚本目录")
+    parser.add_argument("--stub", action="store_true", help="使用本地测试桩，不请求大模型")
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="意图识别微批处理的时间窗口 (秒)，0 表示不合并请求")
+    parser.add_argument("--idle-timeout", type=float, default=1800, help="会话空闲多久后彻底删除 (秒)")
+    parser.add_argument("--spill-after", type=float, default=300, help="会话空闲多久后从内存落盘 (秒)")
+    parser.add_argument("--max-live", type=int, default=10000, help="内存里最多保留的会话数 (多进程模式下是每个 worker)")
+    parser.add_argument("--session-db", default=os.getenv("SESSION_DB"),
+                        help="会话落盘用的 SQLite 文件，重启后会话可以接着聊；不指定则重启后丢失")
+    parser.add_argument("--reload-interval", type=float, default=1.0,
+                        help="脚本目录的轮询间隔 (秒)，脚本修改后不重启即可生效；0 表示关闭热更新")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "WARNING"),
+                        help="日志级别 (DEBUG / INFO / WARNING / ERROR)，INFO 会输出每轮的意图识别命中情况 (限速)")
+    parser.add_argument("--metrics-dump", default=None, help="定期把指标快照写入这个 JSON 文件 (/metrics 接口始终可用)")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="写 JSON 指标快照的间隔 (秒)")
+    parser.add_argument("--history", action="store_true", help="会话记录对话历史 (随快照一起保存)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="多进程模式的 worker 数 (会话按 ID 分片到各个进程，0 表示等于 CPU 核数)；不指定则单进程运行")
+    return parser.parse_args()
+
+
+def start_reporter(args):
+    if args.metrics_dump:
+        # 多进程模式下只包含前端进程的指标，完整的汇总见 /metrics
+        PeriodicReporter([JSONFileSink(args.metrics_dump)], args.metrics_interval).start()
+
+
+def main():
+    args = parse_args()
+    setup_logging(args.log_level)
+    if args.workers is not None:
+        run_cluster(args)
+        return
+
+    llm_client = LLMClient(use_stub=args.stub)
+    default_registry.add_load_hook(llm_client.prepare_script)
+    recognizer = IntentBatcher(llm_client, window=args.batch_window) if args.batch_window > 0 else llm_client
+    start_reporter(args)
+
+    manager = SessionManager(recognizer, args.scripts, idle_timeout=args.idle_timeout, max_live=args.max_live,
+                             db_path=args.session_db, spill_after=args.spill_after, keep_history=args.history,
+                             reload_interval=args.reload_interval)
+    server = ConversationServer(manager=manager)
+    print(f"🚀 对话服务启动: http://{args.host}:{args.port} (模式: {'Stub/本地桩' if llm_client.use_stub else 'Real/大模型'})")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 服务已停止")
+
+
+def run_cluster(args):
+    cluster = ClusterManager(args.scripts, workers=args.workers or None, use_stub=args.stub,
+                             idle_timeout=args.idle_timeout, max_live=args.max_live, db_path=args.session_db,
+                             spill_after=args.spill_after, keep_history=args.history,
+                             reload_interval=args.reload_interval)
+    # fork 必须在事件循环启动之前，也必须在启动任何线程 (指标上报) 之前
+    cluster.start_workers()
+    start_reporter(args)
+    server = ConversationServer(manager=cluster)
+    print(f"🚀 对话服务启动: http://{args.host}:{args.port} ({cluster.num_workers} 个 worker 进程, "
+          f"模式: {'Stub/本地桩' if args.stub else 'Real/大模型'})")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 服务已停止")
+
+
+if __name__ == "__main__":
+    main()
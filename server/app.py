@@ -0,0 +1,221 @@
+# 对话服务：一个事件循环上同时挂着大量会话，脚本经 ScriptRegistry 只解析一次、所有会话共享
+# 会话本身由 manager 管理：单进程模式是 SessionManager，多进程模式是按会话 ID 分片的 ClusterManager
+#
+# HTTP 接口 (请求 / 响应都是 JSON)：
+#   GET    /scripts                     可用的脚本列表
+#   GET    /stats                       会话数、轮次数等统计
+#   GET    /metrics                     Prometheus 文本格式的指标 (?format=json 输出 JSON 快照)
+#   POST   /sessions                    {"script": "ecommerce_dsl.rsl"} -> {"session_id", "reply", "finished"}
+#   POST   /sessions/{id}/turns         {"input": "..."} -> {"reply", "finished"}
+#   GET    /sessions/{id}               {"session_id", "script", "state", "finished", "stale"}
+#   DELETE /sessions/{id}
+# WebSocket：
+#   /ws?script=ecommerce_dsl.rsl        新建会话，先推送开场白
+#   /sessions/{id}/ws                   接入已有会话
+#   每条消息是 {"input": "..."} 或者纯文本，回复 {"session_id", "reply", "finished"}，流程结束后服务端关闭连接
+# reply / finished 与 DSLExecutor.run / step / is_finished 的语义一致
+# stale 表示脚本热更新后会话所在的状态已被删掉，会话仍按旧版本脚本执行
+
+import re
+import json
+import asyncio
+
+from metrics.log import get_logger
+from metrics.registry import counter
+from metrics.sinks import prometheus_text
+from .protocol import HTTPError, internal_error, read_request, encode_response
+from .sessions import SessionManager
+from .websocket import WebSocket, is_upgrade, handshake_response
+
+log = get_logger("server")
+
+_REQUESTS = counter("server_requests_total", "HTTP 请求数", ("method", "status"))
+
+
+class ConversationServer:
+    def __init__(self, llm_client=None, script_dir="scripts", registry=None, idle_timeout=1800, max_live=10000,
+                 db_path=None, manager=None):
+        """
+        :param llm_client: 所有会话共用的意图识别客户端 (LLMClient / IntentBatcher)，需要提供 recognize_intent_async
+        :param script_dir: 允许加载的脚本目录
+        :param registry: 脚本注册表，默认使用进程内共享的 default_registry
+        :param idle_timeout: 会话空闲多久后回收 (秒)
+        :param max_live: 内存里最多保留的会话数，超出后最久没活动的会话落盘
+        :param db_path: 会话落盘用的 SQLite 文件，为 None 时重启后会话丢失
+        :param manager: 会话管理器，默认在本进程内管理会话 (SessionManager)；多进程模式传入 ClusterManager
+        """
+        if manager is None:
+            manager = SessionManager(llm_client, script_dir, registry, idle_timeout, max_live, db_path)
+        self.manager = manager
+        self._server = None
+        self.port = None
+        self.requests = 0
+
+        self._routes = [
+            ("GET", re.compile(r"^/scripts$"), self._list_scripts),
+            ("GET", re.compile(r"^/stats$"), self._stats),
+            ("GET", re.compile(r"^/metrics$"), self._metrics),
+            ("POST", re.compile(r"^/sessions$"), self._create_session),
+            ("POST", re.compile(r"^/sessions/(\w+)/turns$"), self._post_turn),
+            ("GET", re.compile(r"^/sessions/(\w+)$"), self._get_session),
+            ("DELETE", re.compile(r"^/sessions/(\w+)$"), self._delete_session),
+        ]
+
+    @property
+    def sessions(self):
+        """本进程内的会话存储 SessionStore (单进程模式)"""
+        return self.manager.sessions
+
+    # ---------- 生命周期 ----------
+    async def start(self, host="127.0.0.1", port=8080):
+        """开始监听；port 为 0 时由系统分配端口 (见 self.port)"""
+        await self.manager.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self, host="127.0.0.1", port=8080):
+        await self.start(host, port)
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.manager.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.manager.close()
+
+    # ---------- HTTP 路由 ----------
+    async def _list_scripts(self, request):
+        return 200, {"scripts": await self.manager.scripts()}
+
+    async def _stats(self, request):
+        stats = await self.manager.stats()
+        stats["requests"] = self.requests
+        return 200, stats
+
+    async def _metrics(self, request):
+        snapshot = await self.manager.metrics()
+        if request.query.get("format") == "json":
+            return 200, snapshot
+        return 200, prometheus_text(snapshot)
+
+    async def _create_session(self, request):
+        return 201, await self.manager.open(request.json().get("script"))
+
+    async def _post_turn(self, request, session_id):
+        user_input = request.json().get("input")
+        if not isinstance(user_input, str):
+            raise HTTPError(400, "缺少 input 字段")
+        return 200, await self.manager.turn(session_id, user_input)
+
+    async def _get_session(self, request, session_id):
+        return 200, await self.manager.info(session_id)
+
+    async def _delete_session(self, request, session_id):
+        await self.manager.delete(session_id)
+        return 204, None
+
+    async def dispatch(self, request):
+        """
+        :return: (状态码, 响应体)
+        """
+        allowed = False
+        for method, pattern, handler in self._routes:
+            m = pattern.match(request.path)
+            if m is None:
+                continue
+            if method == request.method:
+                return await handler(request, *m.groups())
+            allowed = True
+        raise HTTPError(405 if allowed else 404)
+
+    # ---------- 连接处理 ----------
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = None
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    self.requests += 1
+                    if is_upgrade(request):
+                        await self._serve_websocket(request, reader, writer)
+                        return
+                    status, payload = await self.dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, e.payload
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception:
+                    e = internal_error(log, f"{request.method} {request.path}" if request is not None else "读取请求")
+                    status, payload = e.status, e.payload
+
+                _REQUESTS.inc(request.method if request is not None else "-", status)
+                # 请求本身没读成功的话，连接上剩下的数据已经不可信，回完错误就关闭
+                keep_alive = request is not None and request.keep_alive
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_websocket(self, request, reader, writer):
+        m = re.match(r"^/sessions/(\w+)/ws$", request.path)
+        if m is not None:
+            session = await self.manager.info(m.group(1))
+            opening = None
+        elif request.path == "/ws":
+            session = opening = await self.manager.open(request.query.get("script"))
+        else:
+            raise HTTPError(404)
+
+        session_id, finished = session["session_id"], session["finished"]
+        writer.write(handshake_response(request))
+        ws = WebSocket(reader, writer)
+        if opening is not None:
+            await ws.send(_dumps(opening))
+
+        try:
+            while not finished:
+                message = await ws.recv()
+                if message is None:
+                    return
+                result = await self.manager.turn(session_id, _ws_input(message))
+                finished = result["finished"]
+                await ws.send(_dumps(dict(result, session_id=session_id)))
+            await ws.close()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            # 对话途中会话被删除、无法恢复等：把错误告诉客户端后关闭
+            await ws.send(_dumps(e.payload))
+            await ws.close()
+        except Exception:
+            # 和 HTTP 接口一样：完整异常只记日志，客户端拿到请求编号
+            e = internal_error(log, f"WebSocket 会话 {session_id}")
+            await ws.send(_dumps(e.payload))
+            await ws.close(1011)  # 服务端内部错误
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _ws_input(message):
+    """WebSocket 消息可以是 {"input": "..."}，也可以直接是用户输入的文本"""
+    if message.startswith("{"):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return message
+        if isinstance(data, dict) and isinstance(data.get("input"), str):
+            return data["input"]
+    return message
@@ -0,0 +1,334 @@
+# 多进程模式：前端进程负责 HTTP / WebSocket，会话按 ID 一致性哈希分片到各个 worker 进程
+#
+# - 预加载 + fork：前端在 fork 之前把脚本目录下的脚本全部编译好、意图识别索引也建好，
+#   worker 通过写时复制直接共享这些只读数据，不用各自再解析一遍；
+# - 会话 ID 由前端分配，同一个会话的所有轮次都落在同一个 worker 上 (会话状态只在那个进程里)；
+#   一致性哈希保证调整 worker 数量时只有少部分会话换主；
+# - 前端和 worker 之间是 socketpair 上的换行分隔 JSON 消息，同一轮事件循环里产生的消息合并成一次写入；
+# - worker 意外退出时，发给它的请求立即返回 503，前端稍后用 spawn 重新拉起一个 (事件循环已经在运行，
+#   不能再 fork)；配置了 db_path 时新 worker 打开同一个文件，已经落盘的会话仍然可以恢复。
+# 关键词匹配、解析这类 CPU 工作因此可以分摊到多个核上。
+
+import os
+import json
+import uuid
+import socket
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+
+from dsl.registry import default_registry
+from metrics.log import get_logger
+from metrics.registry import default_metrics, merge_snapshots
+from .protocol import HTTPError, internal_error
+from .sessions import SessionManager, list_scripts, script_path
+
+log = get_logger("server.cluster")
+
+
+class HashRing:
+    """一致性哈希环，每个节点放 replicas 个虚拟节点让分布更均匀"""
+
+    def __init__(self, nodes, replicas=100):
+        self._ring = sorted((self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def node_for(self, key):
+        i = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[i][1]
+
+
+class _Channel:
+    """进程间的消息通道：换行分隔的 JSON，同一轮事件循环里发出的消息合并成一次写入"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._buffer = []
+
+    def send(self, message):
+        if not self._buffer:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._buffer.append(json.dumps(message, ensure_ascii=False))
+
+    def _flush(self):
+        if self._buffer and not self.writer.is_closing():
+            self.writer.write(("\n".join(self._buffer) + "\n").encode("utf-8"))
+        self._buffer = []
+
+    async def recv(self):
+        line = await self.reader.readline()
+        return json.loads(line) if line else None
+
+    @classmethod
+    async def open(cls, sock):
+        reader, writer = await asyncio.open_connection(sock=sock, limit=1 << 22)
+        return cls(reader, writer)
+
+
+# ---------- worker 进程 ----------
+# 前端可以调用的 SessionManager 方法
+_WORKER_OPS = frozenset({"open", "turn", "info", "delete", "stats", "metrics"})
+
+
+async def _serve_worker(sock, manager):
+    channel = await _Channel.open(sock)
+    await manager.start()
+    tasks = set()
+
+    async def handle(message):
+        try:
+            if message["op"] not in _WORKER_OPS:
+                raise HTTPError(400, f"未知操作: {message['op']}")
+            op = getattr(manager, message["op"])
+            result = {"id": message["id"], "ok": await op(*message["args"])}
+        except HTTPError as e:
+            result = {"id": message["id"], "error": [e.status, e.message, e.request_id]}
+        except Exception:
+            e = internal_error(log, f"worker 执行 {message['op']}")
+            result = {"id": message["id"], "error": [e.status, e.message, e.request_id]}
+        channel.send(result)
+
+    while True:
+        message = await channel.recv()
+        if message is None:  # 前端进程退出了
+            break
+        # 每条消息一个任务：等待大模型的轮次不会挡住其他会话
+        task = asyncio.ensure_future(handle(message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await manager.close()
+
+
+def _worker_main(sock, inherited, script_dir, use_stub, options):
+    # fork 继承了前端和其他 worker 的通道，只保留自己的
+    for other in inherited:
+        other.close()
+    # fork 时前端进程已经累计的指标也被复制过来了，清零后 /metrics 汇总时才不会重复计算
+    default_metrics.reset()
+    from llm.wrapper import LLMClient
+
+    # 连接池、线程池这类资源不能跨 fork 共享，每个 worker 自己创建客户端；
+    # 脚本和匹配索引是 fork 前建好的，这里的加载钩子只会命中缓存
+    llm_client = LLMClient(use_stub=use_stub)
+    default_registry.add_load_hook(llm_client.prepare_script)
+    manager = SessionManager(llm_client, script_dir, default_registry, **options)
+    try:
+        asyncio.run(_serve_worker(sock, manager))
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------- 前端进程 ----------
+class ClusterManager:
+    """
+    与 SessionManager 接口相同，会话操作按会话 ID 转发给负责它的 worker
+    使用方式：先调用 start_workers() (必须在事件循环启动之前，fork 不能带着运行中的事件循环)，
+    再把它交给 ConversationServer(manager=...)
+    """
+
+    def __init__(self, script_dir="scripts", workers=None, use_stub=False, idle_timeout=1800, max_live=10000,
+                 db_path=None, request_timeout=60.0, respawn_delay=1.0, **options):
+        """
+        :param workers: worker 进程数，默认等于 CPU 核数
+        :param use_stub: worker 是否使用本地测试桩
+        :param max_live: 每个 worker 内存里最多保留的会话数
+        :param db_path: 会话落盘用的 SQLite 文件前缀，每个 worker 一个文件 ({db_path}.{序号})；
+                        会话按 ID 分配给 worker，worker 数不变时重启后会话仍然落在原来的文件上
+        :param request_timeout: 等待 worker 回复的上限 (秒)，超时返回 504
+        :param respawn_delay: worker 退出后隔多久重新拉起 (秒)
+        :param options: 透传给各 worker 的 SessionManager 的其他参数 (spill_after / keep_history / reload_interval)
+        """
+        self.script_dir = os.path.abspath(script_dir)
+        self.num_workers = workers or os.cpu_count() or 1
+        self.use_stub = use_stub
+        self.db_path = db_path
+        self.request_timeout = request_timeout
+        self.respawn_delay = respawn_delay
+        self.options = dict(options, idle_timeout=idle_timeout, max_live=max_live)
+
+        self.ring = HashRing(range(self.num_workers))
+        self._processes = []
+        self._sockets = []  # 前端这一侧的 socket
+        self._channels = []
+        self._pending = {}  # {消息 ID: (Future, worker 序号)}
+        self._ids = 0
+        self._readers = []
+        self._alive = []  # 各 worker 当前是否可用 (退出后到重新拉起之前为 False)
+        self._closing = False
+        self.respawns = 0
+
+    def preload(self):
+        """编译脚本目录下的所有脚本并建好意图识别索引，fork 之后 worker 直接共享"""
+        from llm.wrapper import LLMClient
+        warmup = LLMClient(use_stub=self.use_stub, intent_cache=False, hedge=False)
+        default_registry.add_load_hook(warmup.prepare_script)
+        for name in list_scripts(self.script_dir):
+            try:
+                default_registry.get(script_path(self.script_dir, name))
+            except SyntaxError as e:
+                log.error("❌ 脚本解析失败 %s: %s", name, e)
+        warmup.close()
+
+    def _spawn(self, i, ctx):
+        """启动第 i 个 worker，返回 (进程, 前端这一侧的 socket)"""
+        parent, child = socket.socketpair()
+        options = dict(self.options, db_path=f"{self.db_path}.{i}" if self.db_path else None)
+        # fork 继承了前端已经打开的所有通道，交给 worker 关掉；spawn 什么都不继承
+        inherited = list(self._sockets) + [parent] if ctx.get_start_method() == "fork" else []
+        process = ctx.Process(target=_worker_main, daemon=True,
+                              args=(child, inherited, self.script_dir, self.use_stub, options))
+        process.start()
+        child.close()
+        return process, parent
+
+    def start_workers(self):
+        self.preload()
+        # fork 让 worker 共享预加载的脚本；不支持 fork 的平台退回 spawn (worker 各自加载，有磁盘缓存兜底)
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        for i in range(self.num_workers):
+            process, sock = self._spawn(i, ctx)
+            self._processes.append(process)
+            self._sockets.append(sock)
+
+    async def start(self):
+        if not self._processes:
+            raise RuntimeError("需要先在事件循环之外调用 start_workers()")
+        self._channels = [await _Channel.open(sock) for sock in self._sockets]
+        self._alive = [True] * self.num_workers
+        loop = asyncio.get_running_loop()
+        self._readers = [loop.create_task(self._supervise(i)) for i in range(self.num_workers)]
+
+    async def close(self):
+        self._closing = True
+        for task in self._readers:
+            task.cancel()
+        for channel in self._channels:
+            channel.writer.close()  # worker 读到 EOF 后自行退出
+        for channel in self._channels:
+            try:
+                await channel.writer.wait_closed()
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    async def _read_replies(self, worker):
+        """把 worker 的回复分发给等待的请求，直到 worker 退出"""
+        channel = self._channels[worker]
+        while True:
+            try:
+                message = await channel.recv()
+            except OSError:  # 向已经退出的 worker 写入时连接被重置
+                break
+            if message is None:
+                break
+            future, _ = self._pending.pop(message["id"], (None, None))
+            if future is None or future.done():
+                continue
+            if "error" in message:
+                future.set_exception(HTTPError(*message["error"]))
+            else:
+                future.set_result(message["ok"])
+
+    async def _supervise(self, worker):
+        """读 worker 的回复；worker 退出后让等待它的请求失败，再重新拉起"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._read_replies(worker)
+            self._alive[worker] = False
+            for msg_id, (future, owner) in list(self._pending.items()):
+                if owner == worker:
+                    del self._pending[msg_id]
+                    if not future.done():
+                        future.set_exception(HTTPError(503, "worker 进程已退出"))
+            if self._closing:
+                return
+
+            old = self._processes[worker]
+            await loop.run_in_executor(None, old.join, 5)
+            if old.is_alive():  # 通道断了但进程还卡着
+                old.terminate()
+            log.error("❌ worker %d 退出 (exitcode=%s)，%.1fs 后重新拉起", worker, old.exitcode, self.respawn_delay)
+            self._channels[worker].writer.close()
+            while not self._closing:
+                await asyncio.sleep(self.respawn_delay)
+                try:
+                    # 事件循环已经在运行，fork 会把前端的连接、线程一起带过去，这里改用 spawn
+                    process, sock = await loop.run_in_executor(
+                        None, self._spawn, worker, multiprocessing.get_context("spawn"))
+                    self._channels[worker] = await _Channel.open(sock)
+                except OSError as e:
+                    log.error("❌ worker %d 重新拉起失败: %s", worker, e)
+                    continue
+                self._processes[worker] = process
+                self._sockets[worker] = sock
+                self._alive[worker] = True
+                self.respawns += 1
+                log.warning("🔄 worker %d 已重新拉起", worker)
+                break
+
+    async def _call(self, worker, op, *args):
+        if not self._alive[worker]:
+            raise HTTPError(503, "worker 进程正在重启，请稍后再试")
+        self._ids += 1
+        msg_id = self._ids
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = (future, worker)
+        self._channels[worker].send({"id": msg_id, "op": op, "args": args})
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "worker 处理超时") from None
+        finally:
+            self._pending.pop(msg_id, None)
+
+    async def _call_all(self, op):
+        """向所有 worker 发同一个请求，跳过不可用的 worker"""
+        replies = await asyncio.gather(*(self._call(i, op) for i in range(self.num_workers)), return_exceptions=True)
+        for reply in replies:
+            if not isinstance(reply, (dict, HTTPError)):
+                raise reply
+        return [reply for reply in replies if isinstance(reply, dict)]
+
+    def worker_for(self, session_id):
+        return self.ring.node_for(session_id)
+
+    # ---------- 与 SessionManager 相同的接口 ----------
+    async def scripts(self):
+        return list_scripts(self.script_dir)
+
+    async def open(self, script_name, session_id=None):
+        session_id = session_id or uuid.uuid4().hex
+        return await self._call(self.worker_for(session_id), "open", script_name, session_id)
+
+    async def turn(self, session_id, user_input):
+        return await self._call(self.worker_for(session_id), "turn", session_id, user_input)
+
+    async def info(self, session_id):
+        return await self._call(self.worker_for(session_id), "info", session_id)
+
+    async def delete(self, session_id):
+        return await self._call(self.worker_for(session_id), "delete", session_id)
+
+    async def metrics(self):
+        """前端进程 (HTTP 请求计数) 和各个 worker (对话、意图识别) 的指标合在一起"""
+        return merge_snapshots([default_metrics.snapshot()] + await self._call_all("metrics"))
+
+    async def stats(self):
+        per_worker = await self._call_all("stats")
+        stats = {key: sum(s[key] for s in per_worker)
+                 for key in ("sessions", "live", "spills", "restores", "turns", "expired", "reloads", "migrated", "stale")}
+        stats["workers"] = per_worker
+        stats["workers_down"] = self.num_workers - len(per_worker)
+        stats["respawns"] = self.respawns
+        return stats
@@ -0,0 +1,127 @@
+# 服务端用的最小 HTTP/1.1 实现：读请求、写响应，支持 keep-alive
+# 只覆盖对话接口需要的部分 (Content-Length 请求体、JSON 响应)，不依赖任何第三方框架
+
+import json
+import uuid
+from urllib.parse import urlsplit, parse_qs
+
+MAX_BODY = 1 << 20  # 请求体上限 (1MB)
+
+REASONS = {
+    101: "Switching Protocols", 200: "OK", 201: "Created", 204: "No Content",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    """处理请求时需要直接返回给客户端的错误"""
+
+    def __init__(self, status, message="", request_id=None):
+        """
+        :param request_id: 内部错误的编号，对应服务端日志里记录的那条异常
+        """
+        self.status = status
+        self.message = message or REASONS.get(status, "")
+        self.request_id = request_id
+        super().__init__(f"{status} {self.message}")
+
+    @property
+    def payload(self):
+        """返回给客户端的 JSON"""
+        if self.request_id is None:
+            return {"error": self.message}
+        return {"error": self.message, "request_id": self.request_id}
+
+
+def internal_error(log, what):
+    """
+    在 except 块里调用：把完整的异常记到日志里，返回一个只带请求编号的 500 错误，
+    异常内容 (可能含路径、配置、用户数据) 不回给客户端
+    :param what: 日志里说明是哪个请求出的错
+    """
+    request_id = uuid.uuid4().hex[:12]
+    log.exception("❌ %s 出错 (request_id=%s)", what, request_id)
+    return HTTPError(500, "服务器内部错误", request_id)
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'keep_alive')
+
+    def __init__(self, method, path, query, headers, body, keep_alive):
+        self.method = method
+        self.path = path
+        self.query = query  # {参数名: 第一个值}
+        self.headers = headers  # 键为小写
+        self.body = body
+        self.keep_alive = keep_alive
+
+    def json(self):
+        """解析 JSON 请求体，空请求体视为 {}"""
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            raise HTTPError(400, "请求体不是合法的 JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求体必须是 JSON 对象")
+        return data
+
+
+async def read_request(reader):
+    """
+    读取一个请求
+    :return: Request；连接在请求之间正常关闭时返回 None
+    :raises HTTPError: 请求格式不对
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "请求行格式错误")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        raise HTTPError(400, "不支持 chunked 请求体")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Content-Length 格式错误")
+    if length > MAX_BODY:
+        raise HTTPError(413)
+    body = await reader.readexactly(length) if length else b""
+
+    parts = urlsplit(target)
+    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return Request(method.upper(), parts.path, query, headers, body, keep_alive)
+
+
+def encode_response(status, payload=None, keep_alive=True, headers=None):
+    """
+    :param payload: 会被编码成 JSON 的响应体；字符串原样作为纯文本发送；None 表示没有响应体
+    """
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4; charset=utf-8"  # Prometheus 文本格式也用这个类型
+    else:
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        content_type = "application/json; charset=utf-8"
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}"]
+    if payload is not None:
+        lines.append(f"Content-Type: {content_type}")
+    if not keep_alive:
+        lines.append("Connection: close")
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
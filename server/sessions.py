@@ -0,0 +1,234 @@
+# 进程内的会话表：创建会话、推进轮次、回收空闲会话
+# ConversationServer (单进程) 直接使用它；多进程模式下每个 worker 各持有一个，只管自己分到的那部分会话
+# 会话放在 SessionStore 里：热会话在内存，空闲会话落到 SQLite，下一轮访问时透明恢复
+
+import os
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+
+from dsl.registry import default_registry
+from dsl.reload import ScriptWatcher
+from dsl.session import Session, SnapshotError
+from dsl.store import SessionStore
+from llm.cassette import CassetteMiss
+from metrics.log import get_logger
+from metrics.registry import default_metrics, timer
+from .protocol import HTTPError
+
+log = get_logger("server")
+
+_TURN_TIME = timer("session_turn_seconds", "服务端处理一轮对话的耗时 (含排队、恢复落盘会话和意图识别)")
+
+
+def list_scripts(script_dir):
+    return sorted(f for f in os.listdir(script_dir) if f.endswith(".rsl"))
+
+
+def script_path(script_dir, name):
+    """只允许加载脚本目录下的 .rsl 文件"""
+    if not isinstance(name, str) or not name.endswith(".rsl") or os.path.basename(name) != name:
+        raise HTTPError(404, f"脚本不存在: {name}")
+    path = os.path.join(script_dir, name)
+    if not os.path.isfile(path):
+        raise HTTPError(404, f"脚本不存在: {name}")
+    return path
+
+
+class SessionManager:
+    """
+    会话操作都是协程并返回可以直接编码成 JSON 的字典，出错时抛 HTTPError；
+    多进程模式的 ClusterManager 提供同样的接口，ConversationServer 不区分两者
+    """
+
+    def __init__(self, llm_client, script_dir="scripts", registry=None, idle_timeout=1800, max_live=10000,
+                 db_path=None, spill_after=300, keep_history=False, reload_interval=None):
+        """
+        :param llm_client: 所有会话共用的意图识别客户端 (LLMClient / IntentBatcher)，需要提供 recognize_intent_async
+        :param script_dir: 允许加载的脚本目录
+        :param registry: 脚本注册表，默认使用进程内共享的 default_registry
+        :param idle_timeout: 会话空闲多久后彻底删除 (秒)
+        :param max_live: 内存里最多保留的会话数，超出后最久没活动的会话落盘
+        :param db_path: 会话落盘用的 SQLite 文件，为 None 时使用内存数据库 (重启后会话丢失)
+        :param spill_after: 会话空闲多久后落盘 (秒)
+        :param keep_history: 会话是否记录对话历史 (随快照一起保存)
+        :param reload_interval: 脚本目录的轮询间隔 (秒)，脚本修改后热更新；为 None 或 0 时不监视
+        """
+        self.llm = llm_client
+        self.script_dir = os.path.abspath(script_dir)
+        self.registry = registry if registry is not None else default_registry
+        self.idle_timeout = idle_timeout
+        self.spill_after = spill_after
+        self.keep_history = keep_history
+        self.reload_interval = reload_interval
+
+        self.sessions = SessionStore(self.registry, max_live, db_path)
+        self._locks = {}  # {会话 ID: [asyncio.Lock, 等待者数量]}，只为正在进行轮次的会话保留
+        self._sweeper = None
+        self._watcher = None
+        self._loop = None
+        self.turns = 0
+        self.expired = 0
+        self.reloads = 0
+        self.migrated = 0
+        self.stale = 0
+
+    # ---------- 生命周期 ----------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._sweeper = self._loop.create_task(self._sweep_idle())
+        self.registry.add_reload_hook(self._on_reload)
+        if self.reload_interval:
+            self._watcher = ScriptWatcher(self.script_dir, self.registry, self.reload_interval).start()
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        self.registry.remove_reload_hook(self._on_reload)
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        # 持久化到文件时把内存里的会话全部写盘，重启后接着聊
+        await asyncio.get_running_loop().run_in_executor(None, self.sessions.close)
+
+    async def _sweep_idle(self):
+        # 批量序列化、写 SQLite 放到线程池里做；存储写盘时不持有内存锁，轮次最多等一批序列化
+        interval = max(1.0, min(60.0, self.spill_after / 2, self.idle_timeout / 2))
+        while True:
+            await asyncio.sleep(interval)
+            await self._loop.run_in_executor(None, self.sessions.spill_idle, self.spill_after)
+            self.expired += await self._loop.run_in_executor(None, self.sessions.expire, self.idle_timeout)
+
+    # ---------- 脚本热更新 ----------
+    def _on_reload(self, path, old, new):
+        # 注册表的钩子在监视线程里调用，迁移放到事件循环里做，和轮次处理不会交错
+        try:
+            self._loop.call_soon_threadsafe(self._migrate, path, new)
+        except RuntimeError:  # 事件循环已经关闭
+            pass
+
+    def _migrate(self, path, script):
+        """
+        内存里的会话切到新版本脚本的同名状态；状态已经不存在的会话标记为 stale，按旧版本继续执行
+        落盘的会话不用处理，恢复时本来就按状态名对应到当前版本
+        """
+        migrated = stale = 0
+        for entry in self.sessions.live():
+            if entry.script_path != path or entry.session.script is script:
+                continue
+            if entry.session.rebind(script):
+                entry.stale = False
+                migrated += 1
+            elif not entry.stale:
+                entry.stale = True
+                stale += 1
+        self.reloads += 1
+        self.migrated += migrated
+        self.stale += stale
+        if stale:
+            log.warning("⚠️ %s 热更新后有 %d 个会话所在的状态已不存在，继续按旧版本执行", os.path.basename(path), stale)
+
+    # ---------- 会话操作 ----------
+    @asynccontextmanager
+    async def _turn_lock(self, session_id):
+        """同一会话的轮次串行执行"""
+        slot = self._locks.get(session_id)
+        if slot is None:
+            slot = self._locks[session_id] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._locks[session_id]
+
+    async def _run_blocking(self, func, *args):
+        """读写 SQLite、解析脚本这类阻塞操作放到线程池里，不占事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _get(self, session_id):
+        """取出会话：在内存里直接返回，落盘的会话到线程池里恢复"""
+        entry = self.sessions.get_live(session_id)
+        if entry is not None:
+            return entry
+        try:
+            entry = await self._run_blocking(self.sessions.get, session_id)
+        except (SnapshotError, SyntaxError) as e:
+            raise HTTPError(409, f"会话无法恢复: {e}")
+        if entry is None:
+            raise HTTPError(404, f"会话不存在: {session_id}")
+        return entry
+
+    async def scripts(self):
+        return list_scripts(self.script_dir)
+
+    async def open(self, script_name, session_id=None):
+        """
+        新建会话
+        :param session_id: 指定会话 ID (多进程模式下由前端进程分配)，默认随机生成
+        :return: {"session_id", "reply" (开场白), "finished"}
+        """
+        path = script_path(self.script_dir, script_name)
+        script = self.registry.current(path)
+        if script is None:  # 首次加载要解析、编译脚本
+            try:
+                script = await self._run_blocking(self.registry.get, path)
+            except SyntaxError as e:
+                raise HTTPError(500, f"脚本解析失败: {e}")
+        session = Session(script, self.keep_history)
+        session_id = session_id or uuid.uuid4().hex
+        reply = session.start()
+        await self._run_blocking(self.sessions.add, session_id, path, session)  # 可能查盘、换出别的会话
+        return {"session_id": session_id, "reply": reply, "finished": session.is_finished}
+
+    async def turn(self, session_id, user_input):
+        """
+        推进一轮对话
+        :return: {"reply", "finished"}
+        """
+        t0 = time.perf_counter()
+        async with self._turn_lock(session_id):
+            while True:
+                await self._get(session_id)  # 不存在 / 无法恢复时抛 HTTPError
+                # 只查内存的 checkout 不读盘；恢复后又马上被换出时 (极少见) 重新恢复一次
+                with self.sessions.checkout(session_id, restore=False) as entry:
+                    if entry is None:
+                        continue
+                    session = entry.session
+                    try:
+                        reply = await session.astep(user_input, self.llm.recognize_intent_async)
+                    except CassetteMiss as e:
+                        # 回放模式的服务碰到没录过的调用：会话状态不动，不当成服务端内部错误
+                        log.error("❌ 会话 %s 大模型回放未命中: %s", session_id, e)
+                        raise HTTPError(503, "大模型回放未命中 (磁带里没有这次调用)")
+                    break
+        self.turns += 1
+        _TURN_TIME.observe(time.perf_counter() - t0)
+        return {"reply": reply, "finished": session.is_finished}
+
+    async def info(self, session_id):
+        entry = await self._get(session_id)
+        state = entry.session.state
+        return {"session_id": session_id, "script": os.path.basename(entry.script_path),
+                "state": state.name if state else None, "finished": entry.session.is_finished,
+                "stale": entry.stale}
+
+    async def delete(self, session_id):
+        async with self._turn_lock(session_id):  # 不和进行中的轮次、恢复交错
+            deleted = await self._run_blocking(self.sessions.delete, session_id)
+        if not deleted:
+            raise HTTPError(404, f"会话不存在: {session_id}")
+
+    async def metrics(self):
+        """本进程的指标快照 (见 metrics.registry)"""
+        return default_metrics.snapshot()
+
+    async def stats(self):
+        stats = self.sessions.stats
+        stats.update(turns=self.turns, expired=self.expired, reloads=self.reloads, migrated=self.migrated,
+                     stale=self.stale)
+        return stats
@@ -0,0 +1,179 @@
+# 最小的 WebSocket (RFC 6455) 实现：握手、文本帧、分片、ping/pong、关闭
+# 服务端和测试 / 压测用的客户端共用，客户端发出的帧需要加掩码
+
+import os
+import base64
+import struct
+import asyncio
+import hashlib
+
+from .protocol import HTTPError
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE = 1 << 20  # 单条消息上限 (1MB)
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    """对端已经关闭连接"""
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode("ascii")).digest()).decode("ascii")
+
+
+def is_upgrade(request):
+    return (request.headers.get("upgrade", "").lower() == "websocket"
+            and "upgrade" in request.headers.get("connection", "").lower())
+
+
+def handshake_response(request):
+    """校验升级请求，返回 101 响应"""
+    key = request.headers.get("sec-websocket-key")
+    if request.method != "GET" or not key:
+        raise HTTPError(400, "WebSocket 握手请求不完整")
+    return (
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+    ).encode("latin-1")
+
+
+def encode_frame(opcode, payload, mask=False):
+    head = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    n = len(payload)
+    if n < 126:
+        head.append(mask_bit | n)
+    elif n < 1 << 16:
+        head.append(mask_bit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(mask_bit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        head += key
+        payload = _apply_mask(payload, key)
+    return bytes(head) + payload
+
+
+def _apply_mask(payload, key):
+    # 按整数异或比逐字节循环快得多
+    n = len(payload)
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(n, "big")
+
+
+async def read_frame(reader):
+    """
+    :return: (fin, opcode, payload)
+    """
+    b1, b2 = await reader.readexactly(2)
+    fin, opcode = bool(b1 & 0x80), b1 & 0x0F
+    masked, n = bool(b2 & 0x80), b2 & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_MESSAGE:
+        raise WebSocketClosed("消息过大")
+    key = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(n) if n else b""
+    if key is not None and payload:
+        payload = _apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+class WebSocket:
+    def __init__(self, reader, writer, client=False):
+        """
+        :param client: 是否为客户端 (客户端发出的帧必须加掩码)
+        """
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+        self.closed = False
+
+    async def send(self, text):
+        if self.closed:
+            raise WebSocketClosed()
+        self.writer.write(encode_frame(OP_TEXT, text.encode("utf-8"), self.client))
+        await self.writer.drain()
+
+    async def recv(self):
+        """
+        接收一条文本消息 (分片会被拼起来)，自动回应 ping
+        :return: 消息文本；对端关闭时返回 None
+        """
+        parts = []
+        size = 0
+        while True:
+            try:
+                fin, opcode, payload = await read_frame(self.reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return None
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload, self.client))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                await self.close(_close_code(payload))
+                return None
+            size += len(payload)
+            if size > MAX_MESSAGE:
+                await self.close(1009)
+                return None
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8", errors="replace")
+
+    async def close(self, code=1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, struct.pack("!H", code), self.client))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+
+def _close_code(payload):
+    return struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else 1000
+
+
+async def connect(host, port, path):
+    """以客户端身份建立 WebSocket 连接 (测试和压测用)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write((
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    ).encode("latin-1"))
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if b" 101 " not in status_line or headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise ConnectionError(f"WebSocket 握手失败: {status_line!r}")
+    return WebSocket(reader, writer, client=True)
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.wrapper import LLMClient
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """
+    创建 Real 模式、不用意图缓存的 LLMClient，测试结束后环境变量自动还原
+    make_client(server, LLM_STREAM="1", ...)
+    :param server: 假的大模型服务 (FakeLLMServer)，为 None 时不设置 LLM_BASE_URL
+    :param env: 额外覆盖的环境变量
+    """
+    def make(server=None, **env):
+        monkeypatch.setenv("RUN_MODE", "real")
+        if server is not None:
+            monkeypatch.setenv("LLM_BASE_URL", server.url)
+        monkeypatch.delenv("http_proxy", raising=False)
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        return LLMClient(intent_cache=False)
+
+    return make
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.executor import DSLExecutor
+from llm.intent_recognizer import IntentRecognizer
+from benchmarks.fake_llm import FakeLLMServer
+
+ECOMMERCE = os.path.join(project_root, "scripts", "ecommerce_dsl.rsl")
+
+
+def test_achat_reuses_connections(make_client):
+    with FakeLLMServer(reply="你好") as server:
+        client = make_client(server)
+
+        async def main():
+            replies = [await client.achat("hi") for _ in range(3)]
+            await client.aclose()
+            return replies
+
+        assert asyncio.run(main()) == ["你好"] * 3
+        assert client.async_transport.connections_created == 1
+
+
+def test_many_conversations_share_one_event_loop(make_client):
+    # 每个请求固定 0.2s，50 个会话如果串行需要 10s 以上
+    with FakeLLMServer(reply="申请退款/退货/退款", latency=0.2) as server:
+        client = make_client(server)
+
+        async def conversation():
+            executor = DSLExecutor(ECOMMERCE, client)
+            executor.run()
+            return await executor.astep("东西不想要了")
+
+        async def main():
+            try:
+                return await asyncio.gather(*(conversation() for _ in range(50)))
+            finally:
+                await client.aclose()
+
+        t0 = time.perf_counter()
+        replies = asyncio.run(main())
+        elapsed = time.perf_counter() - t0
+
+    assert all("退款原因" in r for r in replies)
+    assert elapsed < 5
+
+
+def test_intent_recognizer_async(make_client):
+    with FakeLLMServer(reply="query_order") as server:
+        recognizer = IntentRecognizer(make_client(server))
+        candidates = [{"intent": "query_order", "desc": "查订单"}, {"intent": "refund", "desc": "退款"}]
+        assert asyncio.run(recognizer.recognize_async("我的单到哪了", candidates)) == "query_order"
+
+
+def test_read_chunked_response():
+    from llm.transport import _read_response
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                         b"3\r\nabc\r\n2;ext=1\r\nde\r\n0\r\n\r\n")
+        return await _read_response(reader)
+
+    status, headers, body, will_close = asyncio.run(main())
+    assert (status, body, will_close) == (200, b"abcde", False)
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.parser import parse_code
+from dsl.compiler import compile_script
+from llm.prompts import build_intent_messages
+from benchmarks.synthetic import generate_script
+from benchmarks.suite import compare, main
+from benchmarks.fake_llm import keyword_reply
+
+
+@pytest.mark.parametrize("charset", ["zh", "ascii", "mixed"])
+def test_synthetic_script_options(charset):
+    script = compile_script(parse_code(generate_script(40, branching=4, keywords=25, charset=charset)))
+    assert len(script.states) == 40
+    start = script.start_state
+    assert len(start.options) == 4 and all(len(option.split("/")) == 25 for option in start.options)
+    if charset == "ascii":
+        assert all(option.isascii() for option in start.options)
+
+
+def test_keyword_reply_picks_matching_option():
+    body = {"messages": build_intent_messages("帮我查一下物流", ["退款/退货", "查询/物流"])}
+    assert keyword_reply(body) == "2"
+    body = {"messages": build_intent_messages("今天天气不错", ["退款/退货", "查询/物流"])}
+    assert keyword_reply(body) == "0"
+
+
+def test_regression_threshold(tmp_path):
+    baseline = {"stub_turns_per_s": 1000.0, "stub_p99_us": 10.0}
+    rows = {row[0]: row for row in compare({"stub_turns_per_s": 700.0, "stub_p99_us": 11.0}, baseline, 20)}
+    assert rows["stub_turns_per_s"][3] == pytest.approx(30.0) and rows["stub_turns_per_s"][4]
+    assert rows["stub_p99_us"][3] == pytest.approx(10.0) and not rows["stub_p99_us"][4]
+
+    path = str(tmp_path / "baselines.json")
+    args = ["--only", "parse", "--states", "200", "--repeat", "3", "--baseline", path]
+    assert main(args + ["--save"]) == 0
+    assert main(args + ["--threshold", "1000"]) == 0
+    # 基线吞吐改成不可能达到的值，应该判定为退化
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["metrics"]["parse_states_per_s"] = 1e12
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    assert main(args) == 1
+    # 只跑一次的结果不和基线比较，也不会覆盖基线
+    once = ["--only", "parse", "--states", "200", "--repeat", "1", "--baseline", path]
+    assert main(once) == 0 and main(once + ["--save"]) == 0
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)["metrics"]["parse_states_per_s"] == 1e12
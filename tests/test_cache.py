@@ -0,0 +1,56 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import dsl.cache
+from dsl.cache import load_script
+
+SCRIPT = 'domain "测试"\nstate start:\n    response "你好"\n    end\n'
+
+
+def test_warm_load_skips_parsing(tmp_path, monkeypatch):
+    path = tmp_path / "a.rsl"
+    path.write_text(SCRIPT, encoding='utf-8')
+    cold = load_script(str(path))
+    assert os.listdir(tmp_path / "__rslcache__")
+
+    def no_parse(code):
+        raise AssertionError("缓存命中时不应该再解析")
+
+    monkeypatch.setattr(dsl.cache, "parse_code", no_parse)
+    warm = load_script(str(path))
+    assert warm.domain == "测试" and warm.source_hash == cold.source_hash
+
+
+def test_changed_content_invalidates_entry(tmp_path):
+    path = tmp_path / "a.rsl"
+    path.write_text(SCRIPT, encoding='utf-8')
+    load_script(str(path))
+
+    path.write_text(SCRIPT.replace("你好", "再见"), encoding='utf-8')
+    script = load_script(str(path))
+    assert script.states["start"].response == "再见"
+    # 旧条目被清理，只剩下最新内容对应的缓存
+    assert len(os.listdir(tmp_path / "__rslcache__")) == 1
+
+
+def test_same_name_in_different_dirs_keeps_both_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("DSL_CACHE_DIR", str(tmp_path / "cache"))
+    for name, text in (("a", "你好"), ("b", "再见")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "main.rsl").write_text(SCRIPT.replace("你好", text), encoding='utf-8')
+    load_script(str(tmp_path / "a" / "main.rsl"))
+    load_script(str(tmp_path / "b" / "main.rsl"))
+    # 统一缓存目录里同名脚本的条目互不清理
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+    def no_parse(code):
+        raise AssertionError("缓存命中时不应该再解析")
+
+    monkeypatch.setattr(dsl.cache, "parse_code", no_parse)
+    assert load_script(str(tmp_path / "a" / "main.rsl")).states["start"].response == "你好"
+    assert load_script(str(tmp_path / "b" / "main.rsl")).states["start"].response == "再见"
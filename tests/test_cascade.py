@@ -0,0 +1,90 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.cascade import IntentCascade, KeywordTier, SimilarityTier, build_cascade
+from llm.wrapper import LLMClient
+
+UPGRADE = ("不需要/太贵/不感兴趣/不用/再见", "想办/办理/好/可以/不错/感兴趣")
+
+
+def fake_model(monkeypatch, client, reply):
+    """大模型固定回复 reply，返回记录提示词的列表"""
+    calls = []
+
+    def fake_chat(prompt, **kwargs):
+        calls.append(prompt)
+        return reply
+
+    monkeypatch.setattr(client, "chat", fake_chat)
+    return calls
+
+
+def test_unambiguous_keyword_never_calls_model(monkeypatch, make_client):
+    client = make_client()
+    calls = fake_model(monkeypatch, client, UPGRADE[1])
+    assert client.recognize_intent("不感兴趣", UPGRADE) == UPGRADE[0]
+    assert calls == []
+    assert client.cascade.stats["keyword"]["hits"] == 1
+
+
+def test_ambiguous_keyword_goes_to_model(monkeypatch, make_client):
+    client = make_client()
+    calls = fake_model(monkeypatch, client, UPGRADE[0])
+    # 同时命中两个候选的关键词，交给大模型判断
+    assert client.recognize_intent("好吧，还是太贵了", UPGRADE) == UPGRADE[0]
+    assert len(calls) == 1
+    stats = client.cascade.stats
+    assert stats["keyword"]["hits"] == 0 and stats["llm"]["hits"] == 1
+
+
+def test_empty_cascade_always_calls_model(monkeypatch, make_client):
+    client = make_client(LLM_CASCADE="")
+    calls = fake_model(monkeypatch, client, UPGRADE[1])
+    client.recognize_intent("感兴趣", UPGRADE)
+    assert len(calls) == 1
+
+
+def test_similarity_tier_handles_near_misses():
+    cascade = IntentCascade([KeywordTier(), SimilarityTier(threshold=0.5)])
+    choices = ("无法上网/没网", "蓝屏/死机")
+    assert cascade.classify("没有网", choices) == (choices[0], "similarity")
+    assert cascade.classify("今天天气怎么样", choices) == (None, None)
+    assert cascade.stats["similarity"]["calls"] == 2
+
+
+def test_similarity_confidence_is_scaled_by_margin():
+    tier = SimilarityTier(min_margin=0.15)
+    # 两个候选都很像 (0.857 / 0.8)：差距不足 min_margin 时置信度按差距打折
+    choice, confidence = tier.classify("没网了", ("没网", "没有网了"))
+    assert choice == "没有网了"
+    assert abs(confidence - (6 / 7) * (6 / 7 - 0.8) / 0.15) < 1e-9
+    # 差距足够时直接取最高分
+    assert tier.classify("没网了", ("没网", "没有网络")) == ("没网", 0.8)
+
+
+def test_ngram_tier_catches_paraphrases():
+    cascade = build_cascade("keyword,ngram")
+    choices = ("蓝屏/死机", "无法上网/没网", "黑屏/开不了机")
+    assert cascade.classify("网络断了", choices) == (choices[1], "ngram")
+    # 两个候选得分接近时不硬选，交给大模型
+    assert cascade.classify("上不了网", choices) == (None, None)
+
+
+def test_prepare_script_builds_indexes_on_load(monkeypatch):
+    from dsl.registry import ScriptRegistry
+
+    monkeypatch.setenv("RUN_MODE", "real")
+    monkeypatch.setenv("LLM_CASCADE", "keyword,ngram")
+    client = LLMClient(intent_cache=False)
+    prepared = []
+    monkeypatch.setattr(client.cascade.tiers[1], "prepare", prepared.append)
+
+    registry = ScriptRegistry(use_cache=False)
+    registry.add_load_hook(client.prepare_script)
+    script = registry.get(os.path.join(project_root, "scripts", "tech_support_dsl.rsl"))
+    assert prepared == [s.options for s in script.states if s.options]
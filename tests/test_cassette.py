@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.loadgen import ExecutorTarget, load_dialogues, run_load
+from dsl.executor import DSLExecutor
+from dsl.registry import ScriptRegistry
+from llm.cassette import Cassette, CassetteMiss
+from llm.wrapper import LLMClient
+from regression.cases import discover
+from regression.runner import DATA_DIR, SCRIPT_DIR, run_all
+from server.protocol import HTTPError
+from server.sessions import SessionManager
+from benchmarks.fake_llm import FakeLLMServer, keyword_reply
+
+CHOICES = ("查询物流/查快递", "申请退款/退货/退款")
+OFFLINE_URL = "http://127.0.0.1:9/v1"  # 没有服务在监听，回放时不应该发出任何请求
+
+
+@pytest.fixture
+def real_env(monkeypatch):
+    monkeypatch.setenv("RUN_MODE", "real")
+    monkeypatch.setenv("LLM_CASCADE", "")
+    monkeypatch.setenv("LLM_INTENT_CACHE_SIZE", "0")
+    monkeypatch.setenv("LLM_MAX_ATTEMPTS", "1")
+    monkeypatch.delenv("http_proxy", raising=False)
+    monkeypatch.delenv("LLM_CASSETTE", raising=False)
+    return monkeypatch
+
+
+def test_record_then_replay_offline(real_env, tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    with FakeLLMServer(reply=keyword_reply) as server:
+        recorder = LLMClient(base_url=server.url, cassette=Cassette(path, "record"))
+        assert recorder.recognize_intent("帮我查快递", CHOICES) == CHOICES[0]
+        assert recorder.recognize_intent("我要退货", CHOICES) == CHOICES[1]
+        assert len(server.requests) == 2
+    with open(path, "r", encoding="utf-8") as f:
+        assert [json.loads(line)["response"] for line in f] == ["1", "2"]
+
+    replay = LLMClient(base_url=OFFLINE_URL, cassette=Cassette(path, "replay"))
+    assert replay.recognize_intent("我要退货", CHOICES) == CHOICES[1]
+    assert asyncio.run(replay.recognize_intent_async("帮我查快递", CHOICES)) == CHOICES[0]
+    assert replay.cassette.stats == {"entries": 2, "hits": 2, "misses": 0, "recorded": 0}
+
+    # 没录过的调用：replay 模式直接报错，不降级
+    with pytest.raises(CassetteMiss):
+        replay.recognize_intent("发票怎么开", CHOICES)
+    # 换了模型也算没录过
+    with pytest.raises(CassetteMiss):
+        LLMClient(base_url=OFFLINE_URL, model="other", cassette=Cassette(path, "replay")).chat("你好")
+
+
+def test_passthrough_records_misses(real_env, tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    with FakeLLMServer(reply="OK") as server:
+        client = LLMClient(base_url=server.url, cassette=Cassette(path, "passthrough"))
+        assert client.chat("你好") == "OK"
+        assert client.chat("你好") == "OK"
+        assert len(server.requests) == 1
+        assert client.cassette.stats == {"entries": 1, "hits": 1, "misses": 1, "recorded": 1}
+    # 请求失败不录
+    client = LLMClient(base_url=OFFLINE_URL, cassette=Cassette(path, "passthrough"))
+    assert client.chat("再见") is None and len(client.cassette) == 1
+
+
+def test_regression_replays_recorded_run(real_env, tmp_path):
+    path = str(tmp_path / "batch.jsonl")
+    cases, _ = discover(SCRIPT_DIR, DATA_DIR)
+    with FakeLLMServer(reply=keyword_reply) as server:
+        real_env.setenv("LLM_BASE_URL", server.url)
+        recorded = run_all(cases, use_stub=False, cassette=(path, "record"))
+        calls = len(server.requests)
+    assert calls > 0
+
+    real_env.setenv("LLM_BASE_URL", OFFLINE_URL)
+    replayed = run_all(cases, use_stub=False, pool="thread", cassette=(path, "replay"))
+    assert [[s.reply for s in r.steps] for r in replayed] == [[s.reply for s in r.steps] for r in recorded]
+    assert all(r.error is None for r in replayed)
+
+
+def test_replay_miss_is_reported_by_callers(real_env, tmp_path):
+    def offline_client():
+        return LLMClient(base_url=OFFLINE_URL, cassette=Cassette(str(tmp_path / "empty.jsonl"), "replay"))
+
+    registry = ScriptRegistry(use_cache=False)
+    # 命令行 / 页面用的执行器：状态不动，返回提示，原因记在 last_error 里
+    executor = DSLExecutor(os.path.join(SCRIPT_DIR, "telecom_dsl.rsl"), offline_client(), registry)
+    executor.run()
+    assert "回放未命中" in executor.step("升级")
+    assert isinstance(executor.last_error, CassetteMiss) and executor.current_state_name == "start"
+
+    # 服务端：503，而不是 500
+    async def turn():
+        manager = SessionManager(offline_client(), SCRIPT_DIR, registry)
+        await manager.start()
+        try:
+            session_id = (await manager.open("telecom_dsl.rsl"))["session_id"]
+            with pytest.raises(HTTPError) as e:
+                await manager.turn(session_id, "升级")
+            return e.value.status
+        finally:
+            await manager.close()
+
+    assert asyncio.run(turn()) == 503
+
+    # 压测：计为出错的对话，不中断整个压测
+    stats = asyncio.run(run_load(ExecutorTarget(offline_client(), registry), load_dialogues(), conversations=7))
+    assert stats.summary()["errors"] == 7
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.transport import AsyncHTTPTransport
+from metrics.registry import counter
+from server.app import ConversationServer
+from server.cluster import ClusterManager, HashRing
+from server.protocol import HTTPError
+from server.websocket import connect
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+
+
+def test_hash_ring_moves_few_keys_when_a_node_is_added():
+    keys = [f"session-{i}" for i in range(2000)]
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+    counts = [sum(1 for k in keys if before.node_for(k) == n) for n in range(4)]
+    assert min(counts) > 300  # 大致均匀
+    moved = sum(1 for k in keys if before.node_for(k) != after.node_for(k))
+    assert moved < len(keys) * 0.3  # 理想情况是 1/5
+
+
+def test_sessions_are_sharded_across_workers():
+    cluster = ClusterManager(SCRIPT_DIR, workers=2, use_stub=True)
+    cluster.start_workers()
+
+    async def main():
+        server = ConversationServer(manager=cluster)
+        await server.start(port=0)
+        base = f"http://127.0.0.1:{server.port}"
+        create = AsyncHTTPTransport(base + "/sessions")
+        try:
+            async def conversation(i):
+                session = await create.post_json({"script": "ecommerce_dsl.rsl"})
+                sid = session["session_id"]
+                turns = AsyncHTTPTransport(f"{base}/sessions/{sid}/turns")
+                first = await turns.post_json({"input": "我要退款"})
+                second = await turns.post_json({"input": "我不想要了"})
+                await turns.close()
+                return sid, first, second
+
+            results = await asyncio.gather(*(conversation(i) for i in range(40)))
+            for sid, first, second in results:
+                assert "退款原因" in first["reply"] and not first["finished"]
+                assert "自动审核" in second["reply"] and second["finished"]
+
+            # WebSocket 也经前端转发
+            ws = await connect("127.0.0.1", server.port, "/ws?script=ecommerce_dsl.rsl")
+            await ws.recv()
+            await ws.send("我要查快递")
+            assert "订单号" in json.loads(await ws.recv())["reply"]
+            await ws.close()
+
+            stats = await cluster.stats()
+            assert stats["sessions"] == 41 and stats["turns"] == 81
+            assert all(w["sessions"] > 0 for w in stats["workers"])
+
+            status, _, data = await AsyncHTTPTransport(f"{base}/sessions/nope/turns").request(
+                "POST", b'{"input": "hi"}')
+            assert status == 404
+        finally:
+            await create.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_front_metrics_are_not_counted_again_by_workers():
+    probe = counter("test_cluster_fork_probe", "fork 前在前端进程里累计的计数")
+    probe.inc(amount=5)
+    cluster = ClusterManager(SCRIPT_DIR, workers=2, use_stub=True)
+    cluster.start_workers()
+
+    async def main():
+        await cluster.start()
+        try:
+            return await cluster.metrics()
+        finally:
+            await cluster.close()
+
+    try:
+        merged = asyncio.run(main())
+    finally:
+        probe.reset()
+    # worker 是 fork 出来的，启动时清零了继承的指标，汇总后只算前端进程的一份
+    assert merged["test_cluster_fork_probe"]["samples"] == [[[], 5]]
+
+
+def test_dead_worker_fails_fast_and_is_respawned(tmp_path):
+    cluster = ClusterManager(SCRIPT_DIR, workers=1, use_stub=True, db_path=str(tmp_path / "sessions.db"),
+                             request_timeout=0.5, respawn_delay=0.1)
+    cluster.start_workers()
+
+    async def main():
+        await cluster.start()
+        try:
+            session = await cluster.open("ecommerce_dsl.rsl")
+            sid = session["session_id"]
+
+            # worker 卡住：请求在 request_timeout 后返回 504，而不是一直挂着
+            os.kill(cluster._processes[0].pid, signal.SIGSTOP)
+            with pytest.raises(HTTPError) as e:
+                await asyncio.wait_for(cluster.turn(sid, "我要退款"), 3)
+            assert e.value.status == 504
+            os.kill(cluster._processes[0].pid, signal.SIGCONT)
+
+            # worker 退出：立即 503，随后被重新拉起
+            cluster._processes[0].kill()
+            with pytest.raises(HTTPError) as e:
+                await asyncio.wait_for(cluster.turn(sid, "我要退款"), 3)
+            assert e.value.status == 503
+            for _ in range(100):
+                if cluster.respawns:
+                    break
+                await asyncio.sleep(0.1)
+            assert cluster.respawns == 1
+
+            session = await asyncio.wait_for(cluster.open("ecommerce_dsl.rsl"), 10)
+            reply = await asyncio.wait_for(cluster.turn(session["session_id"], "我要退款"), 10)
+            assert "退款原因" in reply["reply"]
+            assert (await cluster.stats())["workers_down"] == 0
+        finally:
+            await cluster.close()
+
+    asyncio.run(main())
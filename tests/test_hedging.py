@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.hedging import HedgePolicy, hedged_call, hedged_call_async
+from benchmarks.fake_llm import FakeLLMServer
+
+HEDGE_ENV = {"LLM_HEDGE": "1", "LLM_HEDGE_DELAY": "0.05", "LLM_CASCADE": ""}
+
+
+def test_delay_follows_latency_percentile():
+    policy = HedgePolicy(percentile=90, initial_delay=1.0, min_delay=0.01, min_samples=10)
+    assert policy.delay() == 1.0
+    for i in range(1, 101):
+        policy.latency.add(i / 1000)
+    assert abs(policy.delay() - 0.091) < 1e-9
+
+
+def test_fast_primary_sends_no_hedge():
+    policy = HedgePolicy(initial_delay=0.5)
+    with ThreadPoolExecutor(2) as executor:
+        result = hedged_call(policy, executor, lambda cancel: "A", lambda cancel: "B", lambda r: True)
+    assert result == "A"
+    assert policy.stats["hedges_sent"] == 0
+
+
+def test_primary_runs_on_the_calling_thread():
+    policy = HedgePolicy(initial_delay=0.5)
+    threads = []
+    with ThreadPoolExecutor(1) as executor:
+        hedged_call(policy, executor, lambda cancel: threads.append(threading.current_thread()),
+                    lambda cancel: None, lambda r: True)
+    assert threads == [threading.current_thread()]
+
+
+def test_invalid_answer_waits_for_the_other_request():
+    policy = HedgePolicy(initial_delay=0.01)
+
+    def slow_valid(cancel):
+        time.sleep(0.1)
+        return "查快递"
+
+    def fast_invalid(cancel):
+        return None
+
+    with ThreadPoolExecutor(2) as executor:
+        result = hedged_call(policy, executor, slow_valid, fast_invalid, lambda r: r is not None)
+    assert result == "查快递"
+    assert policy.primary_wins == 1 and policy.hedge_wins == 0
+
+
+def test_hedge_beats_slow_primary(make_client):
+    with FakeLLMServer(reply="退货", latency=1.0) as slow, FakeLLMServer(reply="退货") as fast:
+        client = make_client(slow, LLM_SECONDARY_BASE_URL=fast.url, **HEDGE_ENV)
+        t0 = time.perf_counter()
+        assert client.recognize_intent("我要退货", ["查快递", "退货"]) == "退货"
+        assert time.perf_counter() - t0 < 0.8
+        assert client.hedge_policy.stats["hedge_wins"] == 1
+        assert len(fast.requests) == 1
+        # 落败的主请求被关闭，不计入延迟样本，也不算熔断器的失败
+        assert len(client.hedge_policy.latency) == 0
+        assert client.breaker.failures == 0
+        client.close()
+
+
+def test_async_hedge_cancels_the_loser(make_client):
+    with FakeLLMServer(reply="退货", latency=1.0) as slow, FakeLLMServer(reply="退货") as fast:
+        client = make_client(slow, LLM_SECONDARY_BASE_URL=fast.url, **HEDGE_ENV)
+
+        async def run():
+            try:
+                t0 = time.perf_counter()
+                result = await client.recognize_intent_async("我要退货", ["查快递", "退货"])
+                return result, time.perf_counter() - t0
+            finally:
+                await client.aclose()
+
+        result, elapsed = asyncio.run(run())
+        assert result == "退货" and elapsed < 0.8
+        stats = client.hedge_policy.stats
+        assert stats["hedges_sent"] == 1 and stats["hedge_wins"] == 1
+        # 被取消的主请求不计入延迟样本
+        assert len(client.hedge_policy.latency) == 0
+        client.close()
+
+
+def test_async_primary_answer_is_used_when_hedge_is_invalid():
+    policy = HedgePolicy(initial_delay=0.01)
+
+    async def primary():
+        await asyncio.sleep(0.05)
+        return "退货"
+
+    async def secondary():
+        return "不知道"
+
+    result = asyncio.run(hedged_call_async(policy, primary, secondary, lambda r: r == "退货"))
+    assert result == "退货" and policy.primary_wins == 1
+
+
+def test_async_caller_cancelled_during_hedge_delay():
+    policy = HedgePolicy(initial_delay=1.0)
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("primary")
+            raise
+
+    async def secondary():
+        return "退货"
+
+    async def run():
+        call = asyncio.ensure_future(hedged_call_async(policy, primary, secondary, bool))
+        await asyncio.sleep(0.05)  # 还在等对冲延迟
+        call.cancel()
+        try:
+            await call
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert cancelled == ["primary"] and policy.hedges_sent == 0
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.cache import IntentCache
+from llm.wrapper import LLMClient
+
+CHOICES = ("申请退款/退货/退款", "查询物流/查快递/物流")
+
+
+def test_normalized_inputs_share_an_entry():
+    cache = IntentCache()
+    cache.put("我要退款！", CHOICES, CHOICES[0])
+    assert cache.get(" 我要退款 ", CHOICES) == CHOICES[0]
+    assert cache.get("我要退款", CHOICES[:1]) is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = IntentCache(maxsize=2, ttl=10)
+    cache.put("a", CHOICES, CHOICES[0])
+    cache.put("b", CHOICES, CHOICES[0])
+    cache.get("a", CHOICES)
+    cache.put("c", CHOICES, CHOICES[1])
+    assert cache.get("b", CHOICES) is None  # 最久未使用的被淘汰
+    assert cache.get("a", CHOICES) == CHOICES[0]
+
+    now = time.time()
+    monkeypatch.setattr("llm.cache.time.time", lambda: now + 60)
+    assert cache.get("a", CHOICES) is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    db = str(tmp_path / "intents.db")
+    IntentCache(db_path=db).put("查快递", CHOICES, CHOICES[1])
+
+    other = IntentCache(db_path=db)
+    assert other.get("查快递", CHOICES) == CHOICES[1]
+    assert other.stats["disk_hits"] == 1
+
+
+def test_memory_hits_do_not_wait_for_disk_reads(tmp_path):
+    cache = IntentCache(db_path=str(tmp_path / "intents.db"))
+    cache.put("查快递", CHOICES, CHOICES[1])
+
+    # 占住数据库锁模拟很慢的磁盘：查盘的线程卡住时，内存命中照样立即返回
+    cache._db_lock.acquire()
+    reader = threading.Thread(target=cache.get, args=("退款", CHOICES))
+    reader.start()
+    try:
+        reader.join(0.1)
+        assert reader.is_alive()
+        assert cache.get("查快递", CHOICES) == CHOICES[1]
+    finally:
+        cache._db_lock.release()
+    reader.join()
+    assert cache.stats["misses"] == 1
+
+
+def test_client_only_calls_model_once_per_phrase(monkeypatch):
+    monkeypatch.setenv("RUN_MODE", "real")
+    client = LLMClient(intent_cache=IntentCache())
+    calls = []
+    monkeypatch.setattr(client, "chat", lambda prompt, **kwargs: calls.append(prompt) or CHOICES[0])
+
+    assert client.recognize_intent("东西坏了想退", CHOICES) == CHOICES[0]
+    assert client.recognize_intent("东西坏了想退。", CHOICES) == CHOICES[0]
+    assert len(calls) == 1
+
+
+def test_async_path_keeps_sqlite_off_the_event_loop(monkeypatch, tmp_path):
+    monkeypatch.setenv("RUN_MODE", "real")
+    cache = IntentCache(db_path=str(tmp_path / "intents.db"))
+    client = LLMClient(intent_cache=cache)
+    disk_threads = []
+
+    def on_thread(method):
+        def wrapper(*args):
+            disk_threads.append(threading.current_thread())
+            return method(*args)
+        return wrapper
+
+    monkeypatch.setattr(cache, "_lookup_disk", on_thread(cache._lookup_disk))
+    monkeypatch.setattr(cache, "_store", on_thread(cache._store))
+
+    async def achat(prompt, **kwargs):
+        return "1"
+
+    monkeypatch.setattr(client, "achat", achat)
+
+    async def run():
+        first = await client.recognize_intent_async("东西坏了想退", CHOICES)
+        cache._entries.clear()  # 只剩 SQLite 里的条目
+        second = await client.recognize_intent_async("东西坏了想退", CHOICES)
+        return first, second
+
+    assert asyncio.run(run()) == (CHOICES[0], CHOICES[0])
+    assert cache.stats["disk_hits"] == 1
+    # 查询、写入 SQLite 都不在事件循环所在的线程上
+    assert len(disk_threads) == 3 and threading.current_thread() not in disk_threads
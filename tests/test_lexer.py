@@ -0,0 +1,41 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.lexer import Lexer
+
+
+def lex(text):
+    return [(t.type, t.value, t.line) for t in Lexer(text).tokenize()]
+
+
+def test_keywords_symbols_and_comments():
+    text = 'domain "客服"\n# 注释 state x\nstate start:\n    transition a_1 \'退款\' -> end_2\n    end\n'
+    assert lex(text) == [
+        ('DOMAIN', 'domain', 1), ('STRING', '客服', 1),
+        ('STATE', 'state', 3), ('ID', 'start', 3), ('COLON', ':', 3),
+        ('TRANSITION', 'transition', 4), ('ID', 'a_1', 4), ('STRING', '退款', 4),
+        ('ARROW', '->', 4), ('ID', 'end_2', 4),
+        ('END', 'end', 5),
+    ]
+
+
+def test_newlines_inside_strings_do_not_advance_line():
+    # 与逐字符实现保持一致：只有字符串外的换行计入行号
+    assert lex('response "a\nb"\nend') == [
+        ('RESPONSE', 'response', 1), ('STRING', 'a\nb', 1), ('END', 'end', 2),
+    ]
+
+
+def test_unknown_chars_skipped_and_unterminated_string():
+    assert lex('123 - @ 中文ID "未闭合') == [('ID', '中文ID', 1), ('STRING', '未闭合', 1)]
+
+
+def test_iter_tokens_is_lazy():
+    tokens = Lexer('state a: state b:').iter_tokens()
+    assert next(tokens).type == 'STATE'
+    assert [t.value for t in tokens] == ['a', ':', 'state', 'b', ':']
@@ -0,0 +1,62 @@
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import ScriptRegistry
+from llm.wrapper import LLMClient
+from benchmarks.loadgen import ExecutorTarget, ServerTarget, load_dialogues, main, random_walks, run_load
+from server.app import ConversationServer
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+
+
+def test_stub_load_on_test_data():
+    registry = ScriptRegistry(use_cache=False)
+    dialogues = load_dialogues()
+    assert len(dialogues) == 7
+    stats = asyncio.run(run_load(ExecutorTarget(LLMClient(use_stub=True), registry), dialogues,
+                                 concurrency=5, conversations=70))
+    summary = stats.summary()
+    assert summary["conversations"] == 70 and summary["errors"] == 0 and summary["mismatches"] == 0
+    assert summary["turns"] == 10 * sum(len(d.turns) for d in dialogues)
+    assert summary["latency"]["llm"]["p99"] == 0.0
+
+
+def test_random_walks_follow_transitions():
+    registry = ScriptRegistry(use_cache=False)
+    path = os.path.join(SCRIPT_DIR, "telecom_dsl.rsl")
+    walks = random_walks(path, 20, registry, noise=0.0)
+    assert all(walk.turns for walk in walks)
+    # 不加噪声时每一步都能匹配上跳转，游走总是走到结束状态
+    stats = asyncio.run(run_load(ExecutorTarget(LLMClient(use_stub=True), registry), walks,
+                                 concurrency=4, rate=2000, conversations=20))
+    assert stats.summary()["turns"] == sum(len(walk.turns) for walk in walks)
+
+
+def test_fake_llm_time_is_split_out(monkeypatch):
+    monkeypatch.delenv("http_proxy", raising=False)
+    monkeypatch.delenv("LLM_CASSETTE", raising=False)
+    summary = main(["--fake-llm", "0.01", "--llm-only", "--conversations", "14", "--concurrency", "7"])
+    latency = summary["latency"]
+    assert latency["llm"]["p50"] >= 0.01
+    assert latency["match"]["p50"] < latency["llm"]["p50"]
+
+
+def test_server_target():
+    async def scenario():
+        server = ConversationServer(LLMClient(use_stub=True), SCRIPT_DIR, registry=ScriptRegistry(use_cache=False))
+        await server.start(port=0)
+        try:
+            return await run_load(ServerTarget(f"http://127.0.0.1:{server.port}"), load_dialogues(),
+                                  concurrency=7, conversations=14)
+        finally:
+            await server.close()
+
+    summary = asyncio.run(scenario()).summary()
+    assert summary["errors"] == 0 and summary["mismatches"] == 0
+    assert summary["server"]["turns"] == summary["turns"]
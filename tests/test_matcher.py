@@ -0,0 +1,39 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.matcher import KeywordMatcher, get_matcher
+
+UPGRADE = ("不需要/太贵/不感兴趣/不用/再见", "想办/办理/好/可以/不错/感兴趣")
+
+
+def test_longest_match_wins_over_substring():
+    matcher = KeywordMatcher(UPGRADE)
+    assert matcher.match("不感兴趣") == UPGRADE[0]
+    assert matcher.match("感兴趣") == UPGRADE[1]
+
+
+def test_leftmost_match_wins():
+    matcher = KeywordMatcher(UPGRADE)
+    assert matcher.find("可以，但是太贵") == (UPGRADE[1], 0, 2)
+    assert matcher.match("随便问问") is None
+
+
+def test_nested_keywords_prefer_longest():
+    matcher = KeywordMatcher(("ab/abc", "abcd"))
+    assert matcher.find("xabcdy") == ("abcd", 1, 5)
+    assert matcher.find("xabcy") == ("ab/abc", 1, 4)
+
+
+def test_digit_input_maps_to_order_choice():
+    matcher = KeywordMatcher(("退款", "订单号/订单/单号"))
+    assert matcher.match("123456") == "订单号/订单/单号"
+    assert KeywordMatcher(("退款",)).match("123456") is None
+
+
+def test_matcher_is_built_once_per_choice_set():
+    assert get_matcher(list(UPGRADE)) is get_matcher(UPGRADE)
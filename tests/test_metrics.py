@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import ScriptRegistry
+from llm.transport import AsyncHTTPTransport
+from llm.wrapper import LLMClient
+from metrics.log import RateLimitFilter
+from metrics.registry import MetricsRegistry, default_metrics, merge_snapshots
+from metrics.sinks import JSONFileSink, PeriodicReporter, prometheus_text
+from server.app import ConversationServer
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "请求数", ("path",))
+    latency = registry.timer("latency_seconds", "耗时", buckets=(0.1, 1.0))
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3.0)
+
+    text = prometheus_text(registry.snapshot())
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{path="/a\\"b"} 3' in text
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text and 'latency_seconds_sum 3.55' in text
+
+
+def test_merge_snapshots_adds_matching_samples():
+    a, b = MetricsRegistry(), MetricsRegistry()
+    for registry, n in ((a, 1), (b, 2)):
+        registry.counter("turns_total", labels=("state",)).inc("start", amount=n)
+        registry.timer("turn_seconds", buckets=(1.0,)).observe(0.5)
+    b.counter("turns_total", labels=("state",)).inc("end")
+
+    merged = merge_snapshots([a.snapshot(), b.snapshot()])
+    assert sorted(merged["turns_total"]["samples"]) == [[["end"], 1], [["start"], 3]]
+    assert merged["turn_seconds"]["samples"] == [[[], 2, 1.0, [2, 0]]]
+
+
+def test_rate_limited_logging():
+    records = []
+    logger = logging.getLogger("test.ratelimit")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    logger.addFilter(RateLimitFilter(burst=3, period=0.05))
+
+    for i in range(10):
+        logger.info("命中: %s", i)
+    assert len(records) == 3
+    time.sleep(0.06)
+    logger.info("命中: %s", "again")
+    assert len(records) == 4 and "7 条相同日志" in records[-1].getMessage()
+
+
+def test_json_file_sink(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("events_total").inc()
+    path = tmp_path / "metrics.json"
+    reporter = PeriodicReporter([JSONFileSink(str(path))], interval=60, registry=registry).start()
+    reporter.stop()  # 停止时输出最后一次
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["metrics"]["events_total"]["samples"] == [[[], 1]]
+
+
+def test_metrics_endpoint_covers_turns():
+    async def main():
+        default_metrics.reset()
+        server = ConversationServer(LLMClient(use_stub=True), SCRIPT_DIR, registry=ScriptRegistry(use_cache=False))
+        await server.start(port=0)
+        base = f"http://127.0.0.1:{server.port}"
+        try:
+            create = AsyncHTTPTransport(base + "/sessions")
+            _, _, data = await create.request("POST", json.dumps({"script": "ecommerce_dsl.rsl"}).encode())
+            sid = json.loads(data)["session_id"]
+            turns = AsyncHTTPTransport(f"{base}/sessions/{sid}/turns")
+            await turns.request("POST", json.dumps({"input": "我要退款"}).encode())
+            await turns.request("POST", json.dumps({"input": "今天天气不错"}).encode())
+
+            metrics = AsyncHTTPTransport(base + "/metrics")
+            status, headers, data = await metrics.request("GET")
+            text = data.decode("utf-8")
+            assert status == 200 and headers["content-type"].startswith("text/plain")
+            assert 'dsl_transitions_total{script="电商客服机器人",source="start",target="ask_refund_reason"} 1' in text
+            assert 'dsl_fallbacks_total{script="电商客服机器人",state="ask_refund_reason"} 1' in text
+            assert 'intent_recognition_seconds_count{tier="stub"} 2' in text
+            assert 'session_turn_seconds_count 2' in text
+            assert 'server_requests_total{method="POST",status="201"} 1' in text
+
+            as_json = AsyncHTTPTransport(base + "/metrics?format=json")
+            _, _, data = await as_json.request("GET")
+            assert json.loads(data)["dsl_state_seconds"]["samples"][0][1] == 2
+            for transport in (create, turns, metrics, as_json):
+                await transport.close()
+        finally:
+            await server.close()
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.intent_recognizer import IntentRecognizer
+from llm.prompts import TokenStats, build_intent_messages, parse_index_answer
+from benchmarks.fake_llm import FakeLLMServer
+
+CHOICES = ("查询物流/查快递", "申请退款/退货/退款")
+
+
+def test_parse_index_answer():
+    assert parse_index_answer("2", CHOICES) == CHOICES[1]
+    assert parse_index_answer(" 1。", CHOICES) == CHOICES[0]
+    assert parse_index_answer("0", CHOICES) is None
+    assert parse_index_answer("3", CHOICES) is None
+    # 模型没按编号作答时按原文查找
+    assert parse_index_answer("申请退款/退货/退款", CHOICES) == CHOICES[1]
+    assert parse_index_answer("", CHOICES) is None
+
+
+def test_parse_index_answer_with_digits_in_choices():
+    plans = ["升级5G套餐", "办理2号卡", "查询话费"]
+    # 复述的候选项里带数字，不能把其中的数字当成编号
+    assert parse_index_answer("升级5G套餐", plans) == "升级5G套餐"
+    assert parse_index_answer("办理2号卡", plans) == "办理2号卡"
+    assert parse_index_answer("您应该是想办理2号卡", plans) == "办理2号卡"
+    assert parse_index_answer("2、", plans) == "办理2号卡"
+    assert parse_index_answer(" 3) ", plans) == "查询话费"
+    # 编号越界时同样按原文查找
+    assert parse_index_answer("5", ["4G套餐", "5"]) == "5"
+    assert parse_index_answer("7", plans) is None
+
+
+def test_prefix_is_shared_and_input_comes_last():
+    a = build_intent_messages("我要退货", CHOICES)
+    b = build_intent_messages("快递到哪了", CHOICES)
+    assert a[0] == b[0]
+    assert a[1]["content"].startswith("候选:\n1) 查询物流/查快递\n2) 申请退款/退货/退款\n")
+    assert a[1]["content"].endswith("我要退货")
+
+
+def test_client_asks_for_an_index_and_counts_tokens(make_client):
+    with FakeLLMServer(reply="2") as server:
+        client = make_client(server, LLM_CASCADE="")
+        assert client.recognize_intent("东西不想要了", CHOICES) == CHOICES[1]
+        body = server.requests[0]
+        assert body["max_tokens"] == client.intent_max_tokens
+        assert body["messages"][0]["role"] == "system"
+        assert client.token_stats.stats["prompt_tokens"] == 10
+        assert client.token_stats.stats["completion_tokens"] == 1
+        client.close()
+
+
+def test_recognizer_maps_index_to_intent(make_client):
+    candidates = [{"intent": "logistics", "desc": "查快递"}, {"intent": "refund", "desc": "退款"}]
+    with FakeLLMServer(reply="2") as server:
+        recognizer = IntentRecognizer(make_client(server, LLM_CASCADE=""))
+        assert recognizer.recognize("不想要了", candidates) == "refund"
+        assert "1) logistics：查快递" in server.requests[0]["messages"][-1]["content"]
+
+
+def test_cached_tokens_from_either_provider_format():
+    stats = TokenStats()
+    stats.record({"prompt_tokens": 100, "completion_tokens": 1, "prompt_tokens_details": {"cached_tokens": 64}})
+    stats.record({"prompt_tokens": 100, "completion_tokens": 1, "prompt_cache_hit_tokens": 64})
+    stats.record(None)
+    assert stats.stats["calls"] == 3
+    assert stats.stats["cached_tokens"] == 128
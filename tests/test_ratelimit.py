@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.ratelimit import BATCH, INTERACTIVE, RateLimiter, RateLimitExceeded
+from llm.wrapper import LLMClient
+from benchmarks.fake_llm import FakeLLMServer
+
+
+def drained(requests_per_minute):
+    """桶里的突发额度已经用完的限流器"""
+    limiter = RateLimiter(requests_per_minute=requests_per_minute)
+    while limiter._requests.wait_time(1, time.monotonic()) == 0:
+        limiter.acquire()
+    return limiter
+
+
+def test_requests_are_paced_at_the_quota():
+    limiter = drained(1200)  # 每秒 20 个
+    t0 = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire()
+    assert 0.2 < time.perf_counter() - t0 < 0.5
+    assert limiter.stats["max_wait"] > 0
+
+
+def test_interactive_turns_outrank_batch_runs():
+    limiter = drained(600)  # 每 0.1 秒补充一个
+    order = []
+
+    def worker(priority, name):
+        limiter.acquire(priority)
+        order.append(name)
+
+    batch = threading.Thread(target=worker, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_waiting_past_the_timeout_is_rejected():
+    limiter = drained(60)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(timeout=0.1)
+    assert limiter.stats["rejected"] == 1
+    assert limiter.stats["queue_depth"] == 0
+
+
+def test_async_acquire_and_penalty():
+    limiter = RateLimiter(requests_per_minute=6000)
+    limiter.penalize(retry_after=0.2)
+
+    async def run():
+        t0 = time.perf_counter()
+        await asyncio.gather(*(limiter.acquire_async() for _ in range(5)))
+        return time.perf_counter() - t0
+
+    assert asyncio.run(run()) >= 0.15
+    assert limiter.stats["granted"] == 5 and limiter.stats["throttled"] == 1
+
+
+def test_client_gives_up_when_queue_exceeds_turn_budget(monkeypatch):
+    with FakeLLMServer(reply="OK") as server:
+        monkeypatch.setenv("LLM_BASE_URL", server.url)
+        monkeypatch.setenv("RUN_MODE", "real")
+        monkeypatch.setenv("LLM_RPM", "60")
+        monkeypatch.delenv("http_proxy", raising=False)
+        client = LLMClient(intent_cache=False)
+        replies = [client.chat("hi", budget=0.2) for _ in range(7)]
+
+        # 突发额度 5 个，之后每秒才补 1 个，0.2 秒的预算等不到
+        assert replies[:5] == ["OK"] * 5
+        assert replies[5:] == [None, None]
+        assert isinstance(client.last_error, RateLimitExceeded)
+        assert len(server.requests) == 5
+        assert client.rate_limiter.stats["rejected"] == 2
+        client.close()
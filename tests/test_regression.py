@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+from xml.etree import ElementTree
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from regression.cases import discover
+from regression.runner import DATA_DIR, SCRIPT_DIR, main, run_all
+
+
+def test_manifest_covers_all_test_data():
+    cases, warnings = discover(SCRIPT_DIR, DATA_DIR)
+    assert warnings == []
+    assert len(cases) == 7 and all(case.steps for case in cases)
+
+
+@pytest.mark.parametrize("pool", ["thread", "process", "async"])
+def test_stub_run_passes(pool):
+    cases, _ = discover(SCRIPT_DIR, DATA_DIR)
+    results = run_all(cases, use_stub=True, pool=pool, workers=4)
+    assert [r.case for r in results] == [case.name for case in cases]
+    assert all(r.passed for r in results)
+    assert all(s.seconds >= 0 for r in results for s in r.steps)
+
+
+def test_failures_reported(tmp_path, capsys):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "good.txt").write_text("我要退款 ||| 原因\n", encoding="utf-8")
+    (data_dir / "bad.txt").write_text("# 注释\n我要退款 ||| 不会出现的回复\n", encoding="utf-8")
+    (data_dir / "manifest.json").write_text(json.dumps({
+        "ecommerce_dsl.rsl": ["good.txt", "bad.txt", "missing.txt"],
+        "no_such_script.rsl": ["good.txt"],
+    }), encoding="utf-8")
+    json_path, junit_path = tmp_path / "report.json", tmp_path / "report.xml"
+
+    code = main(["--data", str(data_dir), "--json", str(json_path), "--junit", str(junit_path), "-q"])
+    assert code == 1
+
+    report = json.loads(json_path.read_text(encoding="utf-8"))
+    assert (report["cases"], report["passed"], report["failed"], report["errors"]) == (4, 1, 1, 2)
+    bad = next(r for r in report["results"] if r["case"] == "bad.txt")
+    assert bad["steps"][0]["line"] == 2 and not bad["steps"][0]["passed"]
+    assert "seconds" in bad["steps"][0]
+
+    root = ElementTree.parse(str(junit_path)).getroot()
+    assert (root.get("tests"), root.get("failures"), root.get("errors")) == ("4", "1", "2")
+    suite = root.find("testsuite[@name='ecommerce_dsl.rsl']")
+    assert suite.find("testcase[@name='bad.txt']/failure") is not None
+    assert suite.find("testcase[@name='missing.txt']/error") is not None
+    assert "脚本没有测试数据" in capsys.readouterr().out
@@ -0,0 +1,189 @@
+import os
+import sys
+import asyncio
+import shutil
+import time
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.executor import DSLExecutor
+from dsl.registry import ScriptRegistry
+from dsl.reload import ScriptWatcher
+from dsl.session import Session
+from llm.wrapper import LLMClient
+from server.sessions import SessionManager
+
+TELECOM = os.path.join(project_root, "scripts", "telecom_dsl.rsl")
+
+
+def copy_script(tmp_path):
+    path = tmp_path / "telecom_dsl.rsl"
+    shutil.copy(TELECOM, path)
+    return path
+
+
+def edit(path, old, new):
+    text = path.read_text(encoding="utf-8")
+    assert old in text
+    path.write_text(text.replace(old, new), encoding="utf-8")
+    # 保证 mtime 有变化 (有些文件系统的时间戳精度较低)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reload_swaps_only_on_real_changes(tmp_path):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    old = registry.get(str(path))
+    watcher = ScriptWatcher(str(tmp_path), registry)
+
+    # 内容没变的保存不触发替换
+    os.utime(path, ns=(0, 0))
+    assert watcher.check() == [] and registry.get(str(path)) is old
+
+    edit(path, "中国电信为您服务", "中国电信竭诚为您服务")
+    assert watcher.check() == [str(path)]
+    assert "竭诚" in registry.get(str(path)).start_state.response
+
+    # 语法错误：旧版本继续生效
+    current = registry.get(str(path))
+    edit(path, "-> upgrade_plan", "-> nowhere")
+    assert watcher.check() == [] and watcher.failures == 1
+    assert registry.get(str(path)) is current
+
+
+def test_executor_follows_reloaded_script(tmp_path):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    executor = DSLExecutor(str(path), LLMClient(use_stub=True), registry)
+    executor.run()
+    executor.step("升级")
+
+    edit(path, "感谢您的咨询", "感谢您的耐心咨询")
+    new = registry.reload(str(path))
+    assert "耐心" in executor.step("不需要")
+    assert executor.script is new and executor.is_finished
+
+
+def test_executor_stays_on_old_script_when_state_is_gone(tmp_path, monkeypatch, caplog):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    executor = DSLExecutor(str(path), LLMClient(use_stub=True), registry)
+    executor.run()
+    executor.step("报修")
+    old = executor.script
+
+    text = path.read_text(encoding="utf-8")
+    start = text.index("state check_issue:")
+    end = text.index("state auto_dispatch:")
+    path.write_text(text[:start].replace("-> check_issue", "-> auto_dispatch") + text[end:], encoding="utf-8")
+    registry.reload(str(path))
+
+    rebinds = []
+    rebind = Session.rebind
+    monkeypatch.setattr(Session, "rebind", lambda self, script: rebinds.append(script) or rebind(self, script))
+    with caplog.at_level("WARNING", logger="dsl"):
+        assert "重置" in executor.step("网速慢")
+        executor.step("不需要")
+    # 同一个新版本只尝试切换一次，告警也只有一条
+    assert executor.stale and executor.script is old and len(rebinds) == 1
+    assert sum("旧版本" in r.getMessage() for r in caplog.records) == 1
+
+
+def test_watcher_survives_unexpected_errors(tmp_path):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    registry.get(str(path))
+    calls = []
+
+    def flaky_hook(path, old, new):
+        calls.append(new)
+        if len(calls) == 1:
+            raise RuntimeError("钩子出错")
+
+    registry.add_reload_hook(flaky_hook)
+    watcher = ScriptWatcher(str(tmp_path), registry, interval=0.01).start()
+    try:
+        edit(path, "中国电信为您服务", "中国电信竭诚为您服务")
+        deadline = time.time() + 5
+        while watcher.failures == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        # 出错之后线程还在轮询，下一次修改照常生效
+        edit(path, "竭诚", "真诚")
+        while watcher.reloads == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+    assert watcher.failures == 1 and watcher.reloads == 1 and len(calls) == 2
+    assert "真诚" in registry.get(str(path)).start_state.response
+
+
+def test_live_sessions_migrate_or_get_flagged(tmp_path):
+    path = copy_script(tmp_path)
+
+    async def main():
+        registry = ScriptRegistry(use_cache=False)
+        manager = SessionManager(LLMClient(use_stub=True), str(tmp_path), registry)
+        await manager.start()
+        try:
+            keep = (await manager.open("telecom_dsl.rsl"))["session_id"]
+            lose = (await manager.open("telecom_dsl.rsl"))["session_id"]
+            await manager.turn(lose, "报修")
+            assert (await manager.info(lose))["state"] == "check_issue"
+
+            # 改开场白并删掉 check_issue 状态
+            text = path.read_text(encoding="utf-8")
+            start = text.index("state check_issue:")
+            end = text.index("state auto_dispatch:")
+            path.write_text(text[:start].replace("中国电信为您服务", "中国电信竭诚为您服务")
+                            .replace("-> check_issue", "-> auto_dispatch") + text[end:], encoding="utf-8")
+            new = registry.reload(str(path))
+            await asyncio.sleep(0)  # 迁移在事件循环里执行
+
+            assert manager.sessions.get(keep).session.script is new
+            assert (await manager.info(keep))["stale"] is False
+            info = await manager.info(lose)
+            assert info["stale"] is True and info["state"] == "check_issue"
+            # 被标记的会话按旧版本脚本继续走完
+            assert "重置" in (await manager.turn(lose, "网速慢"))["reply"]
+            stats = await manager.stats()
+            assert stats["reloads"] == 1 and stats["migrated"] == 1 and stats["stale"] == 1
+        finally:
+            await manager.close()
+
+    asyncio.run(main())
+
+
+def test_rebind_while_waiting_for_recognition(tmp_path):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    session = registry.open_session(str(path))
+    session.start()
+
+    # 新脚本在 start 前面插了一个状态，所有状态 ID 都变了
+    greeting = 'state greeting:\n    response "你好"\n    end\n\nstate start:'
+    edit(path, "state start:", greeting)
+
+    async def recognize(user_input, options):
+        assert session.rebind(registry.reload(str(path)))  # 识别期间热更新
+        return options[0]
+
+    reply = asyncio.run(session.astep("升级", recognize))
+    assert "199元" in reply and session.state is session.script.state("upgrade_plan")
+
+
+def test_reload_validates_before_swapping(tmp_path):
+    path = copy_script(tmp_path)
+    registry = ScriptRegistry(use_cache=False)
+    assert registry.reload(str(path)) is None and str(path) not in registry  # 没加载过的脚本不处理
+
+    old = registry.get(str(path))
+    edit(path, "state start:", "state begin:")
+    with pytest.raises(SyntaxError):
+        registry.reload(str(path))
+    assert registry.get(str(path)) is old
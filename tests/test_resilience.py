@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.resilience import CircuitBreaker, RetryPolicy, is_retryable
+from llm.transport import HTTPStatusError
+from benchmarks.fake_llm import FakeLLMServer
+
+
+def test_error_classification():
+    assert is_retryable(HTTPStatusError(503)) and is_retryable(HTTPStatusError(429))
+    assert not is_retryable(HTTPStatusError(401))
+    assert is_retryable(TimeoutError()) and is_retryable(ConnectionResetError())
+    assert not is_retryable(KeyError("choices"))
+
+
+def test_backoff_grows_and_is_capped():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    assert all(0 <= policy.backoff(1) <= 0.1 for _ in range(100))
+    assert all(0 <= policy.backoff(10) <= 0.3 for _ in range(100))
+
+
+def test_breaker_opens_and_probes_for_recovery():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow_request()
+
+    now[0] = 11
+    assert breaker.allow_request()  # 放行一个探测请求
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow_request()
+
+
+def test_retryable_errors_are_retried_with_backoff(make_client):
+    with FakeLLMServer(status=503) as server:
+        client = make_client(server)
+        client.retry_policy.base_delay = 0.01
+        assert client.chat("hi") is None
+        assert len(server.requests) == 3
+
+
+def test_fatal_errors_are_not_retried(make_client):
+    with FakeLLMServer(status=401) as server:
+        client = make_client(server)
+        assert client.chat("hi") is None
+        assert len(server.requests) == 1
+        assert client.breaker.state == "closed"
+
+
+def test_turn_budget_bounds_latency(make_client):
+    with FakeLLMServer(latency=1.0) as server:
+        client = make_client(server, LLM_TURN_BUDGET="0.3")
+        t0 = time.perf_counter()
+        assert client.chat("hi") is None
+        assert time.perf_counter() - t0 < 0.8
+
+
+def test_open_breaker_skips_to_local_matcher(make_client):
+    with FakeLLMServer(status=500) as server:
+        client = make_client(server, LLM_BREAKER_THRESHOLD="2", LLM_MAX_ATTEMPTS="1")
+        choices = ("申请退款/退货/退款", "查询物流/查快递/物流")
+        client.recognize_intent("东西坏了", choices)
+        client.recognize_intent("东西坏了", choices)
+        assert client.breaker.state == "open"
+
+        # 熔断期间不再请求服务端，直接走本地降级匹配
+        assert client.recognize_intent("退货还是查快递", choices) == choices[0]
+        assert len(server.requests) == 2
+
+
+def test_fatal_error_on_probe_releases_breaker(make_client):
+    with FakeLLMServer(status=500) as server:
+        client = make_client(server, LLM_BREAKER_THRESHOLD="2", LLM_BREAKER_RECOVERY="0.05",
+                             LLM_MAX_ATTEMPTS="1")
+        client.chat("hi")
+        client.chat("hi")
+        assert client.breaker.state == "open"
+
+        # 探测请求拿到 400：服务端有应答，熔断器恢复，而不是一直停在半开状态
+        time.sleep(0.06)
+        server.status = 400
+        assert client.chat("hi") is None
+        assert client.breaker.state == "closed"
+        server.status = 200
+        assert client.chat("hi") == "OK"
+
+
+def test_cancelled_probe_releases_slot(make_client):
+    with FakeLLMServer(latency=0.5) as server:
+        client = make_client(server, LLM_BREAKER_THRESHOLD="1", LLM_BREAKER_RECOVERY="0")
+        client.breaker.record_failure()
+        assert client.breaker.state == "open"
+
+        async def main():
+            probe = asyncio.ensure_future(client.achat("hi"))
+            await asyncio.sleep(0.1)
+            assert client.breaker.state == "half_open" and not client.breaker.allow_request()
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            await client.aclose()
+
+        asyncio.run(main())
+        # 取消的探测归还了名额，下一次请求可以继续探测
+        assert client.breaker.allow_request()
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import asyncio
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import ScriptRegistry
+from llm.transport import AsyncHTTPTransport
+from llm.wrapper import LLMClient
+from server.app import ConversationServer
+from server.sessions import SessionManager
+from server.websocket import connect
+
+SCRIPT_DIR = os.path.join(project_root, "scripts")
+
+
+def run_with_server(scenario):
+    """启动一个 Stub 模式的对话服务，执行 scenario(server, call)"""
+    async def main():
+        server = ConversationServer(LLMClient(use_stub=True), SCRIPT_DIR, registry=ScriptRegistry(use_cache=False))
+        await server.start(port=0)
+        base = f"http://127.0.0.1:{server.port}"
+        transports = {}
+
+        async def call(method, path, payload=None):
+            transport = transports.get(path)
+            if transport is None:
+                transport = transports[path] = AsyncHTTPTransport(base + path)
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            status, _, data = await transport.request(method, body, {"Content-Type": "application/json"})
+            return status, json.loads(data) if data else None
+
+        try:
+            return await scenario(server, call)
+        finally:
+            for transport in transports.values():
+                await transport.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_http_conversation():
+    async def scenario(server, call):
+        status, body = await call("POST", "/sessions", {"script": "ecommerce_dsl.rsl"})
+        assert status == 201 and "京东" in body["reply"] and body["finished"] is False
+        sid = body["session_id"]
+
+        status, body = await call("POST", f"/sessions/{sid}/turns", {"input": "我要退款"})
+        assert status == 200 and "退款原因" in body["reply"] and body["finished"] is False
+        status, body = await call("POST", f"/sessions/{sid}/turns", {"input": "我不想要了"})
+        assert "自动审核" in body["reply"] and body["finished"] is True
+
+        status, body = await call("GET", f"/sessions/{sid}")
+        assert body["state"] == "refund_dislike"
+        assert (await call("DELETE", f"/sessions/{sid}"))[0] == 204
+        assert (await call("GET", f"/sessions/{sid}"))[0] == 404
+        assert (await call("GET", "/stats"))[1]["turns"] == 2
+
+    run_with_server(scenario)
+
+
+def test_http_errors():
+    async def scenario(server, call):
+        assert (await call("POST", "/sessions", {"script": "../main.py"}))[0] == 404
+        assert (await call("POST", "/sessions", {"script": "missing.rsl"}))[0] == 404
+        assert (await call("POST", "/sessions/abc/turns", {"input": "hi"}))[0] == 404
+        assert (await call("PUT", "/sessions"))[0] == 405
+        status, body = await call("GET", "/scripts")
+        assert "ecommerce_dsl.rsl" in body["scripts"]
+
+        _, body = await call("POST", "/sessions", {"script": "ecommerce_dsl.rsl"})
+        assert (await call("POST", f"/sessions/{body['session_id']}/turns", {}))[0] == 400
+
+    run_with_server(scenario)
+
+
+def test_websocket_conversation():
+    async def scenario(server, call):
+        ws = await connect("127.0.0.1", server.port, "/ws?script=ecommerce_dsl.rsl")
+        opening = json.loads(await ws.recv())
+        assert "京东" in opening["reply"]
+
+        await ws.send(json.dumps({"input": "我要查快递"}))
+        assert "订单号" in json.loads(await ws.recv())["reply"]
+        await ws.send("123456")  # 纯文本也可以
+        last = json.loads(await ws.recv())
+        assert "派送中" in last["reply"] and last["finished"] is True
+        # 流程结束后服务端主动关闭
+        assert await ws.recv() is None
+        assert server.sessions.get(opening["session_id"]).session.is_finished
+
+    run_with_server(scenario)
+
+
+def test_many_sessions_share_one_script():
+    async def scenario(server, call):
+        async def conversation():
+            _, body = await call("POST", "/sessions", {"script": "ecommerce_dsl.rsl"})
+            ws = await connect("127.0.0.1", server.port, f"/sessions/{body['session_id']}/ws")
+            await ws.send("我要退款")
+            reply = json.loads(await ws.recv())["reply"]
+            await ws.close()
+            return body["session_id"], reply
+
+        results = await asyncio.gather(*(conversation() for _ in range(50)))
+        assert all("退款原因" in reply for _, reply in results)
+        scripts = {server.sessions.get(sid).session.script for sid, _ in results}
+        assert len(server.sessions) == 50 and len(scripts) == 1
+
+    run_with_server(scenario)
+
+
+def test_sessions_survive_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+
+    async def main():
+        async def call(server, method, path, payload=None):
+            transport = AsyncHTTPTransport(f"http://127.0.0.1:{server.port}{path}")
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            try:
+                status, _, data = await transport.request(method, body, {"Content-Type": "application/json"})
+            finally:
+                await transport.close()
+            return status, json.loads(data) if data else None
+
+        llm = LLMClient(use_stub=True)
+        first = await ConversationServer(llm, SCRIPT_DIR, db_path=db_path).start(port=0)
+        _, body = await call(first, "POST", "/sessions", {"script": "ecommerce_dsl.rsl"})
+        sid = body["session_id"]
+        await call(first, "POST", f"/sessions/{sid}/turns", {"input": "我要退款"})
+        await first.close()  # 关闭时内存里的会话写盘
+
+        second = await ConversationServer(llm, SCRIPT_DIR, db_path=db_path).start(port=0)
+        try:
+            status, body = await call(second, "POST", f"/sessions/{sid}/turns", {"input": "我不想要了"})
+            assert status == 200 and "自动审核" in body["reply"] and body["finished"] is True
+            _, stats = await call(second, "GET", "/stats")
+            assert stats["restores"] == 1
+        finally:
+            await second.close()
+
+    asyncio.run(main())
+
+
+def test_internal_error_hides_details(caplog):
+    async def scenario(server, call):
+        async def broken(session_id, user_input):
+            raise RuntimeError("数据库密码 hunter2 不对")
+
+        server.manager.turn = broken
+        _, body = await call("POST", "/sessions", {"script": "ecommerce_dsl.rsl"})
+        return await call("POST", f"/sessions/{body['session_id']}/turns", {"input": "hi"})
+
+    status, body = run_with_server(scenario)
+    assert status == 500
+    assert "hunter2" not in json.dumps(body, ensure_ascii=False)
+    # 异常完整地记在日志里，用请求编号对应
+    record, = [r for r in caplog.records if body["request_id"] in r.getMessage()]
+    assert "hunter2" in str(record.exc_info[1])
+
+
+def test_websocket_internal_error_is_logged_with_request_id(caplog):
+    async def scenario(server, call):
+        async def broken(session_id, user_input):
+            raise RuntimeError("数据库密码 hunter2 不对")
+
+        server.manager.turn = broken
+        ws = await connect("127.0.0.1", server.port, "/ws?script=ecommerce_dsl.rsl")
+        session_id = json.loads(await ws.recv())["session_id"]
+        await ws.send("我要查快递")
+        error = json.loads(await ws.recv())
+        assert await ws.recv() is None
+        return session_id, error
+
+    session_id, error = run_with_server(scenario)
+    assert "hunter2" not in json.dumps(error, ensure_ascii=False)
+    record, = [r for r in caplog.records if error["request_id"] in r.getMessage()]
+    assert session_id in record.getMessage() and "hunter2" in str(record.exc_info[1])
+
+
+def test_restore_runs_off_the_event_loop():
+    async def main():
+        manager = SessionManager(LLMClient(use_stub=True), SCRIPT_DIR, ScriptRegistry(use_cache=False), max_live=1)
+        await manager.start()
+        restored_in = []
+        get = manager.sessions.get
+
+        def tracked_get(session_id):
+            restored_in.append(threading.get_ident())
+            return get(session_id)
+
+        manager.sessions.get = tracked_get
+        try:
+            first = (await manager.open("telecom_dsl.rsl"))["session_id"]
+            await manager.open("telecom_dsl.rsl")  # 把第一个会话挤到磁盘上
+            assert "千兆" in (await manager.turn(first, "升级"))["reply"]
+            assert restored_in and threading.get_ident() not in restored_in
+            assert (await manager.stats())["restores"] == 1
+        finally:
+            await manager.close()
+
+    asyncio.run(main())
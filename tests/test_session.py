@@ -0,0 +1,46 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import ScriptRegistry
+
+TELECOM = os.path.join(project_root, "scripts", "telecom_dsl.rsl")
+
+
+def first_option(user_input, options):
+    return options[0]
+
+
+def test_registry_parses_each_script_once():
+    registry = ScriptRegistry()
+    a = registry.open_session(TELECOM)
+    b = registry.open_session(TELECOM)
+    assert a.script is b.script
+    assert len(registry) == 1
+
+
+def test_sessions_keep_independent_cursors():
+    registry = ScriptRegistry()
+    a = registry.open_session(TELECOM)
+    b = registry.open_session(TELECOM)
+    a.start()
+    b.start()
+
+    assert "199元" in a.step("升级", first_option)
+    assert a.state.name == "upgrade_plan"
+    assert b.state.name == "start"
+
+    a.step("不需要", first_option)
+    assert a.is_finished and not b.is_finished
+    assert a.step("还在吗", first_option) == "（会话已结束）"
+
+
+def test_unknown_intent_returns_fallback():
+    session = ScriptRegistry().open_session(TELECOM)
+    reply = session.step("今天天气不错", lambda user_input, options: "unknown")
+    assert reply.startswith("抱歉，我没听懂")
+    assert session.state.name == "start"
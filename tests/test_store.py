@@ -0,0 +1,167 @@
+import os
+import sys
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dsl.registry import ScriptRegistry
+from dsl.session import Session, SnapshotError
+from dsl.store import SessionStore
+
+TELECOM = os.path.join(project_root, "scripts", "telecom_dsl.rsl")
+
+
+def first_option(user_input, options):
+    return options[0]
+
+
+def test_snapshot_roundtrip_keeps_state_and_history():
+    registry = ScriptRegistry(use_cache=False)
+    session = registry.open_session(TELECOM, keep_history=True)
+    session.start()
+    session.step("升级", first_option)
+
+    data = session.snapshot()
+    assert len(data) < 200
+    restored = Session.restore(registry.get(TELECOM), data)
+    assert restored.state.name == "upgrade_plan" and not restored.is_finished
+    assert restored.history == [("升级", session.history[0][1])]
+
+    # 默认不记录历史
+    assert registry.open_session(TELECOM).snapshot().endswith(b",null]")
+
+
+def test_restore_after_script_change_uses_state_name(tmp_path):
+    registry = ScriptRegistry(use_cache=False)
+    session = registry.open_session(TELECOM)
+    session.start()
+    session.step("升级", first_option)
+    data = session.snapshot()
+
+    # 在前面插一个状态：状态 ID 全部变了，按名字仍然能找回
+    with open(TELECOM, encoding="utf-8") as f:
+        source = f.read()
+    changed = tmp_path / "telecom_dsl.rsl"
+    greeting = 'state greeting:\n    response "你好"\n    end\n\nstate start:'
+    changed.write_text(source.replace("state start:", greeting, 1), encoding="utf-8")
+    restored = Session.restore(registry.get(str(changed)), data)
+    assert restored.state.name == "upgrade_plan"
+
+    removed = tmp_path / "removed.rsl"
+    removed.write_text(source.replace("upgrade_plan", "upgrade_offer"), encoding="utf-8")
+    with pytest.raises(SnapshotError):
+        Session.restore(registry.get(str(removed)), data)
+
+
+def test_lru_spills_and_restores_transparently():
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry, max_live=3)
+    for i in range(10):
+        session = registry.open_session(TELECOM)
+        session.start()
+        store.add(f"s{i}", TELECOM, session)
+
+    assert store.stats == {"sessions": 10, "live": 3, "spills": 7, "restores": 0}
+    with store.checkout("s0") as entry:
+        entry.session.step("升级", first_option)
+    assert store.stats["restores"] == 1 and store.stats["live"] == 3
+
+    # 被换出再换回来，状态还在
+    for i in range(1, 10):
+        store.get(f"s{i}")
+    assert store.get("s0").session.state.name == "upgrade_plan"
+    assert store.get("missing") is None
+    assert store.delete("s0") and "s0" not in store and len(store) == 9
+
+
+def test_checkpoint_survives_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry, db_path=db_path)
+    session = registry.open_session(TELECOM)
+    session.start()
+    session.step("升级", first_option)
+    store.add("abc", TELECOM, session)
+    assert store.checkpoint() == 1
+    store.close(checkpoint=False)
+
+    reopened = SessionStore(ScriptRegistry(use_cache=False), db_path=db_path)
+    assert reopened.get("abc").session.state.name == "upgrade_plan"
+    assert reopened.stats["restores"] == 1
+    reopened.close()
+
+
+def test_idle_sessions_spill_then_expire():
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry)
+    for sid in ("a", "b"):
+        store.add(sid, TELECOM, registry.open_session(TELECOM))
+
+    with store.checkout("a"):
+        # 进行中的会话不会落盘
+        assert store.spill_idle(0) == 1
+    assert store.stats["live"] == 1
+    assert store.expire(-1) == 2 and len(store) == 0
+
+
+def test_session_count_is_tracked_without_queries():
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry, max_live=2)
+    for i in range(5):
+        store.add(f"s{i}", TELECOM, registry.open_session(TELECOM))
+    store.get("s0")  # 恢复到内存，磁盘上还留着旧快照
+    store.checkpoint()
+    assert len(store) == 5
+    assert store.spill_idle(-1, chunk=1) == 2 and len(store) == 5
+    store.get("s1")
+    assert store.delete("s1") and store.delete("s2") and len(store) == 3
+
+    # 之后不碰数据库也能给出会话数
+    store._db.close()
+    assert store.stats == {"sessions": 3, "live": 0, "spills": 6, "restores": 2}
+
+
+def test_count_after_expire_and_reopen(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry, db_path=db_path)
+    for sid in ("a", "b", "c"):
+        store.add(sid, TELECOM, registry.open_session(TELECOM))
+    store.checkpoint()
+    with store.checkout("a"):
+        assert store.expire(-1) == 2  # 进行中的会话只删磁盘上的旧快照
+    assert len(store) == 1
+    store.close()
+
+    reopened = SessionStore(ScriptRegistry(use_cache=False), db_path=db_path)
+    assert len(reopened) == 1
+    reopened.add("a", TELECOM, registry.open_session(TELECOM))  # 同 ID 覆盖磁盘上的会话
+    assert len(reopened) == 1
+    reopened.close()
+
+
+def test_disk_writes_do_not_hold_the_memory_lock():
+    registry = ScriptRegistry(use_cache=False)
+    store = SessionStore(registry)
+    for sid in ("a", "b"):
+        store.add(sid, TELECOM, registry.open_session(TELECOM))
+
+    # 占住数据库锁模拟很慢的磁盘：落盘线程卡在写盘上，内存里的会话照样能取
+    store._db_lock.acquire()
+    spiller = threading.Thread(target=store.spill_idle, args=(-1,))
+    spiller.start()
+    try:
+        spiller.join(0.2)
+        assert spiller.is_alive()
+        assert store._lock.acquire(timeout=1)
+        store._lock.release()
+        assert store.get_live("a") is not None
+    finally:
+        store._db_lock.release()
+    spiller.join()
+    assert store.stats["live"] == 0 and len(store) == 2
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.streaming import StreamAccumulator, is_decided, parse_sse_line
+from llm.transport import AsyncHTTPTransport, HTTPTransport
+from benchmarks.fake_llm import FakeLLMServer
+
+CHOICES = ("查询物流/查快递", "申请退款/退货/退款", "人工客服")
+# 话多的模型：答案在最前面，后面跟着一大段解释
+CHATTY = "2。用户说东西不想要了，这属于退货退款的诉求，因此选择第二项。"
+STREAM_ENV = {"LLM_CASCADE": "", "LLM_STREAM": "1"}
+
+
+def test_is_decided():
+    assert not is_decided("", CHOICES)
+    assert is_decided("2", CHOICES)  # 只有 3 项，不可能是两位数
+    assert not is_decided("1", tuple(str(i) for i in range(12)))  # 可能是 10 / 11
+    assert is_decided("1。", tuple(str(i) for i in range(12)))
+    assert is_decided("0", CHOICES)
+    assert not is_decided("答案是", CHOICES)
+    assert is_decided("人工客服", CHOICES)
+    assert not is_decided("退货", ("退货", "退货退款"))  # 还可能继续写成 "退货退款"
+    assert is_decided("退货，", ("退货", "退货退款"))
+    # 数字后面紧跟其他文字时是在复述候选项，不是编号
+    plans = ("升级5G套餐", "办理2号卡")
+    assert not is_decided("升级5", plans)
+    assert not is_decided("5G", plans)
+    assert is_decided("升级5G套餐", plans)
+    # 只收到数字时，有候选项以它开头就还不能确定
+    assert not is_decided("5", ("5G套餐", "宽带", "话费"))
+    assert not is_decided("1", ("1号线路", "2号线路"))
+    assert is_decided("1。", ("1号线路", "2号线路"))
+    assert not is_decided("5", CHOICES)  # 越界的编号也不提前结束
+
+
+def test_accumulator_reads_text_and_usage():
+    acc = StreamAccumulator()
+    for line in [b": keep-alive\n", b'data: {"choices":[{"delta":{"content":"1"}}]}\n', b"\n",
+                 b'data: {"choices":[],"usage":{"prompt_tokens":5}}\n', b"data: [DONE]\n"]:
+        assert not acc.feed(line)
+    assert acc.text == "1" and acc.usage == {"prompt_tokens": 5}
+    assert parse_sse_line("data:x") == "x" and parse_sse_line("event: y") is None
+
+
+def test_full_stream_returns_connection_to_pool():
+    with FakeLLMServer(reply="OK") as server:
+        transport = HTTPTransport(server.url + "/chat/completions")
+        for _ in range(3):
+            acc = StreamAccumulator()
+            for line in transport.post_stream({"stream": True}):
+                acc.feed(line)
+            assert acc.text == "OK"
+        assert transport.connections_created == 1
+        transport.close()
+
+
+def test_stream_stops_once_answer_is_known(make_client):
+    with FakeLLMServer(reply=CHATTY, token_delay=0.02) as server:
+        client = make_client(server, **STREAM_ENV)
+        t0 = time.perf_counter()
+        assert client.recognize_intent("东西不想要了", CHOICES) == CHOICES[1]
+        # 完整的回复需要 0.02 * len(CHATTY) ≈ 0.7s
+        assert time.perf_counter() - t0 < 0.3
+        assert server.requests[0]["stream"] is True
+        assert client.streams_cut_short == 1
+        client.close()
+
+
+def test_async_stream_stops_once_answer_is_known(make_client):
+    with FakeLLMServer(reply=CHATTY, token_delay=0.02) as server:
+        client = make_client(server, **STREAM_ENV)
+
+        async def run():
+            try:
+                t0 = time.perf_counter()
+                result = await client.recognize_intent_async("东西不想要了", CHOICES)
+                return result, time.perf_counter() - t0
+            finally:
+                await client.aclose()
+
+        result, elapsed = asyncio.run(run())
+        assert result == CHOICES[1] and elapsed < 0.3
+        assert client.streams_cut_short == 1
+        assert server.streams_completed == 0
+
+
+def test_stream_keeps_reading_when_a_choice_starts_with_the_digit(make_client):
+    # 假服务逐字发送，"5" 是单独的一个 SSE 事件
+    choices = ("5G套餐", "宽带", "话费")
+    with FakeLLMServer(reply="5G套餐", token_delay=0.01) as server:
+        client = make_client(server, **STREAM_ENV)
+        assert client.recognize_intent("我想换5G", choices) == "5G套餐"
+        client.close()
+
+
+def test_async_full_stream_reuses_connection(make_client):
+    with FakeLLMServer(reply="OK") as server:
+        client = make_client(server, **STREAM_ENV)
+
+        async def run():
+            try:
+                return [await client.achat("hi", until=lambda text: False) for _ in range(3)]
+            finally:
+                await client.aclose()
+
+        assert asyncio.run(run()) == ["OK"] * 3
+        assert client.async_transport.connections_created == 1
+        assert client.token_stats.stats["prompt_tokens"] == 30
+
+
+def test_stream_timeout_covers_the_whole_stream():
+    # 每个字之间只隔 0.05s，按单次读取计时永远不会超时；整个流要 1s 以上
+    with FakeLLMServer(reply="慢" * 25, token_delay=0.05) as server:
+        transport = HTTPTransport(server.url + "/chat/completions")
+        t0 = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            for _ in transport.post_stream({"stream": True}, timeout=0.3):
+                pass
+        assert time.perf_counter() - t0 < 0.6
+        transport.close()
+
+        async def run():
+            transport = AsyncHTTPTransport(server.url + "/chat/completions")
+            try:
+                t0 = time.perf_counter()
+                with pytest.raises(asyncio.TimeoutError):
+                    async for _ in transport.post_stream({"stream": True}, timeout=0.3):
+                        pass
+                return time.perf_counter() - t0
+            finally:
+                await transport.close()
+
+        assert asyncio.run(run()) < 0.6
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from llm.transport import HTTPTransport, HTTPStatusError
+from llm.wrapper import LLMClient
+from benchmarks.fake_llm import FakeLLMServer
+
+
+def test_connections_are_reused():
+    with FakeLLMServer() as server:
+        transport = HTTPTransport(server.url + "/chat/completions")
+        for _ in range(5):
+            assert transport.post_json({"n": 1})["choices"][0]["message"]["content"] == "OK"
+        assert transport.connections_created == 1
+        assert len(set(server.client_ports)) == 1
+        transport.close()
+
+
+def test_pool_is_thread_safe():
+    with FakeLLMServer(latency=0.01) as server:
+        transport = HTTPTransport(server.url + "/chat/completions", pool_size=4)
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(10):
+                    transport.post_json({})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        assert not errors
+        assert len(server.requests) == 40
+        assert transport.connections_created <= 4
+
+
+def test_error_status_raises():
+    with FakeLLMServer(status=500) as server:
+        transport = HTTPTransport(server.url + "/chat/completions")
+        with pytest.raises(HTTPStatusError) as info:
+            transport.post_json({})
+        assert info.value.status == 500
+
+
+def test_client_chat_uses_pooled_transport(monkeypatch):
+    with FakeLLMServer(reply="申请退款/退货/退款") as server:
+        monkeypatch.setenv("LLM_BASE_URL", server.url)
+        monkeypatch.delenv("http_proxy", raising=False)
+        client = LLMClient(intent_cache=False)
+        assert client.chat("hi") == "申请退款/退货/退款"
+        assert client.chat("hi again") == "申请退款/退货/退款"
+        assert server.requests[0]["messages"][0]["content"] == "hi"
+        assert client.transport.connections_created == 1
+        client.close()